@@ -0,0 +1,52 @@
+"""Compare sequential `get_links` against the concurrent `get_links_many` engine.
+
+python -m benchmarks.bench_fetch --pages 200 --latency 0.05
+"""
+
+import argparse
+import time
+
+from benchmarks import _django
+from benchmarks.server import FixtureServer
+
+_django.setup()
+
+from scraper import fetch, services  # noqa: E402
+
+
+def run(pages: int, latency: float, links: int, concurrency: int, per_host: int):
+    with FixtureServer(latency=latency) as server:
+        urls = [f"{server.base_url}/page/{i}?links={links}" for i in range(pages)]
+
+        start = time.perf_counter()
+        for url in urls:
+            services.get_links(url)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = list(
+            fetch.get_links_many(urls, concurrency=concurrency, per_host=per_host)
+        )
+        concurrent = time.perf_counter() - start
+        assert len(results) == pages
+
+    print(f"{pages} pages, {links} links each, {latency * 1000:.0f}ms latency")
+    print(f"sequential: {pages / sequential:8.1f} pages/sec")
+    print(
+        f"concurrent: {pages / concurrent:8.1f} pages/sec ({sequential / concurrent:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--links", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-host", type=int, default=32)
+    args = parser.parse_args()
+    run(args.pages, args.latency, args.links, args.concurrency, args.per_host)
+
+
+if __name__ == "__main__":
+    main()
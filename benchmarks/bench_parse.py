@@ -0,0 +1,71 @@
+"""Compare the BeautifulSoup and streaming link parsers on large synthetic pages.
+
+python -m benchmarks.bench_parse --links 10000 100000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks import _django
+
+_django.setup()
+
+from scraper.parsers import SoupLinkParser, StreamingLinkParser  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def generate_chunks(links: int):
+    """Yield a synthetic listing page in ~64KB chunks without building it whole."""
+    yield "<html><head><title>Synthetic listing</title></head><body><ul>"
+    buffer = []
+    size = 0
+    for i in range(links):
+        item = f'<li><a href="/item/{i}?ref=listing">Item number {i}</a> <span>description {i}</span></li>'
+        buffer.append(item)
+        size += len(item)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    buffer.append("</ul></body></html>")
+    yield "".join(buffer)
+
+
+def run(parser_class, links: int) -> int:
+    parser = parser_class("https://www.example.com/")
+    # Count without keeping the links so only the parser's own memory shows.
+    return sum(1 for _ in parser.iter_links(generate_chunks(links)))
+
+
+def measure(parser_class, links: int) -> tuple[float, int, int]:
+    start = time.perf_counter()
+    count = run(parser_class, links)
+    elapsed = time.perf_counter() - start
+
+    # Separate pass, tracemalloc slows allocation-heavy code down a lot.
+    tracemalloc.start()
+    run(parser_class, links)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--links", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'parser':<22}{'links':>10}{'seconds':>10}{'links/sec':>12}{'peak MB':>10}")
+    for links in args.links:
+        for parser_class in (SoupLinkParser, StreamingLinkParser):
+            elapsed, peak, count = measure(parser_class, links)
+            assert count == links
+            print(
+                f"{parser_class.__name__:<22}{links:>10}{elapsed:>10.2f}"
+                f"{links / elapsed:>12.0f}{peak / 2**20:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare storing a page's links as one list against the batched streaming path.
+
+python -m benchmarks.bench_persist --links 100000 250000
+
+Runs against a throwaway test database created from the configured one,
+in memory for SQLite. On PostgreSQL the streaming path uses COPY.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks import _django
+
+_django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+
+from benchmarks.bench_parse import generate_chunks  # noqa: E402
+from scraper.models import Link, Page, Url  # noqa: E402
+from scraper.parsers import StreamingLinkParser  # noqa: E402
+from scraper.services import build_links, save_links  # noqa: E402
+
+
+def iter_links(links: int):
+    parser = StreamingLinkParser("https://www.example.com/")
+    return parser.iter_links(generate_chunks(links))
+
+
+def store_list(page: Page, links: int):
+    Link.objects.bulk_create(build_links(page, list(iter_links(links))))
+
+
+def store_stream(page: Page, links: int):
+    save_links(page, iter_links(links))
+
+
+def reset():
+    with connection.cursor() as cursor:
+        for model in (Link, Page, Url):
+            cursor.execute(f"DELETE FROM {model._meta.db_table}")
+
+
+def run(store, user: User, links: int):
+    reset()
+    with transaction.atomic():
+        page = Page.objects.create(url="https://www.example.com/", created_by=user)
+        store(page, links)
+    return page.link_set.count()
+
+
+def measure(store, user: User, links: int) -> tuple[float, int, int]:
+    start = time.perf_counter()
+    count = run(store, user, links)
+    elapsed = time.perf_counter() - start
+
+    # Separate pass, tracemalloc slows allocation-heavy code down a lot.
+    tracemalloc.start()
+    run(store, user, links)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--links", type=int, nargs="+", default=[100_000, 250_000])
+    args = parser.parse_args()
+
+    # With DEBUG every query is kept in memory and would show up as growth.
+    settings.DEBUG = False
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create(username="benchmark")
+        print(
+            f"{'store':<10}{'links':>10}{'seconds':>10}{'links/sec':>12}{'peak MB':>10}"
+        )
+        for links in args.links:
+            for store in (store_list, store_stream):
+                elapsed, peak, count = measure(store, user, links)
+                assert count == links
+                name = store.__name__.removeprefix("store_")
+                print(
+                    f"{name:<10}{links:>10}{elapsed:>10.2f}"
+                    f"{links / elapsed:>12.0f}{peak / 2**20:>10.1f}"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Measure how link extraction throughput scales with process pool workers.
+
+python -m benchmarks.bench_pool --pages 200 --links 2000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks import _django
+from benchmarks.server import render_page
+
+_django.setup()
+
+from scraper.pool import parse_body, parse_many  # noqa: E402
+
+PARSER = "scraper.parsers.SoupLinkParser"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--links", type=int, default=2000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--parser", default=PARSER)
+    args = parser.parse_args()
+
+    items = [
+        (f"http://127.0.0.1/page/{i}", render_page(f"/page/{i}", args.links), "utf-8")
+        for i in range(args.pages)
+    ]
+    print(f"{args.pages} pages, {args.links} links each, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    for url, body, encoding in items:
+        parse_body(args.parser, url, body, encoding)
+    inline = args.pages / (time.perf_counter() - start)
+    print(f"{'inline':>10}: {inline:8.1f} pages/sec")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        count = sum(
+            1 for _ in parse_many(items, workers=workers, parser_path=args.parser)
+        )
+        rate = count / (time.perf_counter() - start)
+        print(f"{workers:>10}: {rate:8.1f} pages/sec ({rate / inline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
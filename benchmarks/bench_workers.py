@@ -0,0 +1,143 @@
+"""Measure how scrape job throughput scales with the number of worker processes.
+
+python -m benchmarks.bench_workers --jobs 400 --latency 0.05 --workers 1 2 4 8
+
+Every worker is a separate process claiming leased batches from the same
+database, as on separate nodes. SQLite serializes writers, run this against
+PostgreSQL to see how far scaling really goes.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import _django
+from benchmarks.server import FixtureServer
+
+_django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from scraper.brokers import DatabaseBroker  # noqa: E402
+from scraper.jobs import run_worker  # noqa: E402
+from scraper.models import Page, ScrapeJob  # noqa: E402
+
+
+def sqlite_immediate_transactions() -> None:
+    # SQLite fails at once, instead of waiting, when a transaction that has
+    # read tries to write while another process writes. Taking the write lock
+    # up front makes processes queue instead (the "IMMEDIATE" transaction_mode
+    # option in Django 5.1+).
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+
+    def begin_immediate(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
+
+    DatabaseWrapper._start_transaction_under_autocommit = begin_immediate
+
+
+def run_workers(database: str, concurrency: int) -> None:
+    """Entry point of the worker processes."""
+    connection.close()
+    connection.settings_dict["NAME"] = database
+    if connection.vendor == "sqlite":
+        connection.settings_dict["OPTIONS"]["timeout"] = 60
+        sqlite_immediate_transactions()
+    processed = run_worker(
+        broker=DatabaseBroker(), concurrency=concurrency, poll_interval=0.1, once=True
+    )
+    print(processed)
+
+
+def run(workers: int, jobs: int, links: int, concurrency: int, base_url: str):
+    user = User.objects.get(username="benchmark")
+    ScrapeJob.objects.bulk_create(
+        ScrapeJob(url=f"{base_url}/page/{workers}-{i}?links={links}", created_by=user)
+        for i in range(jobs)
+    )
+    connection.close()
+
+    start = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_workers",
+                "--run-workers",
+                str(connection.settings_dict["NAME"]),
+                "--concurrency",
+                str(concurrency),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    processed = [int(process.communicate()[0]) for process in processes]
+    elapsed = time.perf_counter() - start
+
+    done = ScrapeJob.objects.filter(status=ScrapeJob.Status.DONE).count()
+    assert done == jobs, f"{done} of {jobs} jobs done"
+    assert Page.objects.count() == jobs, f"{Page.objects.count()} pages"
+    ScrapeJob.objects.all().delete()
+    Page.objects.all().delete()
+    return jobs / elapsed, processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--links", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--run-workers", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    settings.DEBUG = False
+    settings.SCRAPER_CACHE_PATH = None
+    if args.run_workers:
+        run_workers(args.run_workers, args.concurrency)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if connection.vendor == "sqlite":
+            # Worker processes can't share the default in-memory test database.
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tmp, "db.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0)
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=WAL")
+        User.objects.create_user("benchmark")
+        print(
+            f"{args.jobs} jobs, {args.links} links each, "
+            f"{args.latency * 1000:.0f}ms latency, {args.concurrency} threads per worker"
+        )
+        try:
+            with FixtureServer(latency=args.latency) as server:
+                baseline = None
+                for workers in args.workers:
+                    rate, processed = run(
+                        workers,
+                        args.jobs,
+                        args.links,
+                        args.concurrency,
+                        server.base_url,
+                    )
+                    baseline = baseline or rate
+                    print(
+                        f"{workers:>3} workers: {rate:8.1f} jobs/sec "
+                        f"({rate / baseline:.2f}x), jobs per worker {processed}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
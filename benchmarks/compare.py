@@ -0,0 +1,68 @@
+"""Compare two `benchmarks.suite` JSON reports and flag regressions.
+
+python -m benchmarks.compare baseline.json results.json --threshold 0.1
+
+Exits with status 1 when a case got slower, used more memory or ran more
+queries than the baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks.suite import CASE_KEYS
+
+# Metric name and whether a higher value is better.
+METRICS = (
+    ("pages_per_sec", True),
+    ("p50_ms", False),
+    ("p99_ms", False),
+    ("peak_rss_mb", False),
+    ("queries_per_request", False),
+)
+
+
+def load(path: str) -> dict[tuple, dict]:
+    with open(path) as f:
+        report = json.load(f)
+    return {
+        tuple(result[key] for key in CASE_KEYS): result for result in report["results"]
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for case, result in current.items():
+        if case not in baseline:
+            continue
+        label = " ".join(f"{key}={value}" for key, value in zip(CASE_KEYS, case))
+        for metric, higher_is_better in METRICS:
+            old, new = baseline[case][metric], result[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            marker = "REGRESSION" if worse > threshold else ""
+            print(f"{label} {metric}: {old} -> {new} ({change:+.1%}) {marker}".rstrip())
+            if marker:
+                regressions.append(f"{label} {metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    regressions = compare(load(args.baseline), load(args.results), args.threshold)
+    if regressions:
+        print(
+            f"{len(regressions)} regressions over {args.threshold:.0%}", file=sys.stderr
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
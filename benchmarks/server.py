@@ -0,0 +1,119 @@
+"""Local HTTP stand-in for benchmarking the scraper without hitting the network.
+
+Every path returns a generated HTML page. Query parameters:
+
+- ``links``: number of ``<a href>`` elements in the page (default 50)
+- ``latency``: seconds to sleep before answering (default: server latency)
+- ``title``: one of ``TITLES`` (default ``normal``)
+- ``charset``: body encoding, ``none`` for utf-8 without a charset in the
+  Content-Type header (default ``utf-8``)
+- ``status``: answer with this status code instead of 200
+- ``error_rate``: probability of answering 500 (default: server error rate)
+"""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+TITLES = ("normal", "none", "empty", "long", "entities")
+CHARSETS = ("utf-8", "iso-8859-1", "utf-16", "none")
+
+
+def render_title(path: str, title: str) -> str:
+    if title == "none":
+        return ""
+    if title == "empty":
+        return "<title></title>"
+    if title == "long":
+        return f"<title>{'Page ' * 200}{path}</title>"
+    if title == "entities":
+        return f"<title>Caf&eacute; &amp; cr&egrave;me &#8212; {path}</title>"
+    return f"<title>Page {path}</title>"
+
+
+def render_page(
+    path: str, links: int, title: str = "normal", charset: str = "utf-8"
+) -> bytes:
+    anchors = "".join(
+        f'<li><a href="/page/{i}?links={links}">Link {i} café</a></li>'
+        for i in range(links)
+    )
+    return (
+        f"<html><head>{render_title(path, title)}</head>"
+        f"<body><ul>{anchors}</ul></body></html>"
+    ).encode("utf-8" if charset == "none" else charset)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, with Nagle on the second
+    # one waits for the client's delayed ACK on a kept-alive connection.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        latency = float(params.get("latency", [self.server.latency])[0])
+        error_rate = float(params.get("error_rate", [self.server.error_rate])[0])
+        status = int(params.get("status", [200])[0])
+        if latency:
+            time.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            status = 500
+        if status != 200:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        charset = params.get("charset", ["utf-8"])[0]
+        body = render_page(
+            parts.path,
+            int(params.get("links", [50])[0]),
+            params.get("title", ["normal"])[0],
+            charset,
+        )
+        content_type = "text/html"
+        if charset != "none":
+            content_type += f"; charset={charset}"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        super().__init__((host, port), Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
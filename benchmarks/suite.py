@@ -0,0 +1,234 @@
+"""End to end scrape benchmarks against the local fixture server, saved as JSON.
+
+python -m benchmarks.suite --output results.json
+python -m benchmarks.suite --quick --output new.json
+python -m benchmarks.compare results.json new.json
+
+Each case runs in its own process, against a fresh test database, so peak
+RSS and query counts belong to that case alone. Scenarios:
+
+- get_links: fetch and parse only
+- create_page: fetch, parse and store the page and its links
+- admin_scrape: POST to the admin scrape view, then claim and run the job
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from benchmarks.server import CHARSETS, TITLES
+
+SCENARIOS = ("get_links", "create_page", "admin_scrape")
+LINKS = [10, 1_000, 50_000, 500_000]
+QUICK_LINKS = [10, 1_000, 10_000]
+CASE_KEYS = ("scenario", "links", "title", "charset", "latency", "error_rate")
+
+
+def default_requests(links: int) -> int:
+    return max(3, min(50, 100_000 // max(links, 1)))
+
+
+def build_cases(args) -> list[dict]:
+    base = {
+        "title": "normal",
+        "charset": "utf-8",
+        "latency": args.latency,
+        "error_rate": 0.0,
+        "parser": args.parser,
+    }
+    cases = [
+        {**base, "scenario": scenario, "links": links}
+        for scenario in args.scenarios
+        for links in args.links
+    ]
+    if "get_links" in args.scenarios:
+        variant = {**base, "scenario": "get_links", "links": 1_000}
+        cases += [{**variant, "title": title} for title in TITLES if title != "normal"]
+        cases += [
+            {**variant, "charset": charset}
+            for charset in CHARSETS
+            if charset != "utf-8"
+        ]
+        cases.append({**variant, "error_rate": 0.2})
+    for case in cases:
+        case["requests"] = args.requests or default_requests(case["links"])
+    return cases
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_case(case: dict) -> dict:
+    """Run one case in this process, see `main` for the subprocess wrapper."""
+    from benchmarks import _django
+
+    _django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    from benchmarks.server import FixtureServer
+    from scraper import services
+    from scraper.brokers import get_broker
+    from scraper.jobs import run_job
+    from scraper.models import ScrapeJob
+
+    settings.DEBUG = False
+    settings.SCRAPER_CACHE_PATH = None
+    if case["parser"]:
+        settings.SCRAPER_PARSER = case["parser"]
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    user = User.objects.create_superuser("benchmark", password="benchmark")
+    client = Client()
+    client.force_login(user)
+    broker = get_broker()
+
+    def get_links(url):
+        _, status, _ = services.get_links(url)
+        return status == 200
+
+    def create_page(url):
+        _, status = services.create_page(url, user)
+        return status == 200
+
+    def admin_scrape(url):
+        client.post(reverse("admin:scraper_page_scrape"), {"url": url})
+        job = run_job(broker.claim(1)[0])
+        broker.ack(job)
+        return job.status == ScrapeJob.Status.DONE
+
+    run = {
+        "get_links": get_links,
+        "create_page": create_page,
+        "admin_scrape": admin_scrape,
+    }[case["scenario"]]
+    query = urlencode(
+        {key: case[key] for key in ("links", "title", "charset", "error_rate")}
+    )
+
+    timings, errors = [], 0
+    counter = QueryCounter()
+    try:
+        with FixtureServer(latency=case["latency"]) as server:
+            run(f"{server.base_url}/warmup?links=10")
+            start = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                for i in range(case["requests"]):
+                    url = f"{server.base_url}/page/{i}?{query}"
+                    request_start = time.perf_counter()
+                    errors += not run(url)
+                    timings.append(time.perf_counter() - request_start)
+            elapsed = time.perf_counter() - start
+    finally:
+        broker.close()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return {
+        **case,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(len(timings) / elapsed, 2),
+        "links_per_sec": round(len(timings) * case["links"] / elapsed, 1),
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p99_ms": round(percentile(timings, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "queries_per_request": round(counter.count / len(timings), 1),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--links", type=int, nargs="+", default=None)
+    parser.add_argument("--quick", action="store_true", help=f"--links {QUICK_LINKS}")
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--parser", default=None, help="Override SCRAPER_PARSER.")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    args.links = args.links or (QUICK_LINKS if args.quick else LINKS)
+    results = []
+    for case in build_cases(args):
+        label = " ".join(f"{key}={case[key]}" for key in CASE_KEYS)
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--run-case", json.dumps(case)],
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            print(f"FAILED {label}\n{process.stderr}", file=sys.stderr)
+            continue
+        result = json.loads(process.stdout.splitlines()[-1])
+        results.append(result)
+        print(
+            f"{label}: {result['pages_per_sec']} pages/sec, "
+            f"p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, "
+            f"{result['peak_rss_mb']}MB, {result['queries_per_request']} queries, "
+            f"{result['errors']} errors"
+        )
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
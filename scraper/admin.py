@@ -1,14 +1,22 @@
+from collections import defaultdict
 from collections.abc import Sequence
+from urllib.parse import urlencode
 
 from django.contrib import admin
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
 from django.http.request import HttpRequest
 from django.shortcuts import redirect
 from django.urls import path
+from django.utils import timezone
 
-from scraper.forms import scraperForm
-from scraper.models import Link, Page
-from scraper.services import create_page
+from scraper.bulk import clean_urls, existing_urls
+from scraper.forms import bulkScraperForm, scraperForm
+from scraper.jobs import enqueue_scrape
+from scraper.models import Link, Page, ScrapeJob
+from scraper.pagination import KeysetPage, parse_cursor, prefix_filter
+from scraper.search import search_filter
+from scraper.services import log_link_changes, schedule_next
 
 
 class LinkInline(admin.TabularInline):
@@ -27,8 +35,44 @@ class LinkInline(admin.TabularInline):
         return False
 
 
+class LinkCountFilter(admin.SimpleListFilter):
+    title = "total links"
+    parameter_name = "links"
+    ranges = {
+        "0": (0, 0),
+        "1-10": (1, 10),
+        "11-100": (11, 100),
+        "101-1000": (101, 1000),
+        "1000+": (1001, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, key) for key in self.ranges]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.ranges:
+            return queryset
+        low, high = self.ranges[self.value()]
+        queryset = queryset.filter(link_count__gte=low)
+        if high is not None:
+            queryset = queryset.filter(link_count__lte=high)
+        return queryset
+
+
+class FullTextSearchMixin:
+    # Only shows the search box, searches go through the full-text index
+    # instead of LIKE scans.
+    search_fields = ("name",)
+    search_help_text = "Pages or links with all these words in their name or URL."
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_filter(queryset, search_term), False
+
+
 @admin.register(Page)
-class PageAdmin(admin.ModelAdmin):
+class PageAdmin(FullTextSearchMixin, admin.ModelAdmin):
     change_list_template = "admin/scraper/page/change_list.html"
     change_form_template = "admin/scraper/page/change_form.html"
     readonly_fields = (
@@ -36,6 +80,9 @@ class PageAdmin(admin.ModelAdmin):
         "url",
         "total_links",
         "created_by",
+        "next_crawl_at",
+        "crawl_interval",
+        "duplicate_of",
     )
     fieldsets = (
         (
@@ -45,14 +92,23 @@ class PageAdmin(admin.ModelAdmin):
                     "name",
                     "url",
                     "total_links",
+                    "duplicate_of",
                 )
             },
         ),
+        ("Re-scrape", {"fields": ("priority", "next_crawl_at", "crawl_interval")}),
     )
     actions = None
+    list_filter = (LinkCountFilter,)
 
+    @admin.display(ordering="link_count")
     def total_links(self, obj):
-        return obj.link_set.count()
+        return obj.link_count
+
+    def save_model(self, request, obj, form, change):
+        if "priority" in form.changed_data:
+            schedule_next(obj, None, obj.scraped_at)
+        super().save_model(request, obj, form, change)
 
     def get_urls(self):
         urls = super().get_urls()
@@ -63,6 +119,11 @@ class PageAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.scrape),
                 name="scraper_page_scrape",
             ),
+            path(
+                "scrape/bulk/",
+                self.admin_site.admin_view(self.scrape_bulk),
+                name="scraper_page_scrape_bulk",
+            ),
         ]
         return my_urls + urls
 
@@ -71,31 +132,75 @@ class PageAdmin(admin.ModelAdmin):
             form = scraperForm(request.POST)
             if form.is_valid():
                 url = form.cleaned_data["url"]
-                message, status = create_page(url, request.user)
-                level = "success" if status == 200 else "error"
-                self.message_user(request=request, message=message, level=level)
+                enqueue_scrape([url], request.user)
+                self.message_user(
+                    request=request,
+                    message=f"Page {url} queued for scraping",
+                    level="success",
+                )
             else:
                 self.message_user(request, "Invalid URL")
         return redirect("admin:scraper_page_changelist")
 
+    def scrape_bulk(self, request):
+        if request.method == "POST":
+            form = bulkScraperForm(request.POST, request.FILES)
+            if form.is_valid():
+                urls, invalid = clean_urls(form.cleaned_data["lines"])
+                existing = existing_urls(urls)
+                pending = [url for url in urls if url not in existing]
+                enqueue_scrape(pending, request.user)
+                self.message_user(
+                    request=request,
+                    message=(
+                        f"{len(pending)} pages queued for scraping, "
+                        f"{len(existing)} already scraped, {len(invalid)} invalid URLs"
+                    ),
+                    level="success" if pending else "warning",
+                )
+                for url in invalid:
+                    self.message_user(request, f"Invalid URL {url}", level="error")
+            else:
+                self.message_user(request, "Add at least one URL", level="error")
+        return redirect("admin:scraper_page_changelist")
+
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
         extra_context["form"] = scraperForm()
+        extra_context["bulk_form"] = bulkScraperForm()
+        extra_context["jobs"] = ScrapeJob.objects.filter(created_by=request.user)[:10]
         return super().changelist_view(request, extra_context)
 
     def change_view(self, request, object_id, form_url="", extra_context=None):
         extra_context = extra_context or {}
 
         page = self.get_object(request, object_id)
+        if page is None:
+            return super().change_view(request, object_id, form_url, extra_context)
 
-        links = page.link_set.all()
-        paginator = Paginator(links, 10)
-        page_number = request.GET.get("page")
-        page_obj = paginator.get_page(page_number)
+        links = page.link_set.select_related("target")
+        search = {
+            "q": request.GET.get("q", "").strip(),
+            "domain": request.GET.get("domain", "").strip().lower(),
+        }
+        if search["q"]:
+            links = links.filter(**prefix_filter("name", search["q"]))
+        if search["domain"]:
+            links = links.filter(target__host=search["domain"])
+        page_obj = KeysetPage(
+            links,
+            per_page=10,
+            after=parse_cursor(request.GET.get("after")),
+            before=parse_cursor(request.GET.get("before")),
+        )
 
         extra_context["links"] = page_obj
         extra_context["is_paginated"] = page_obj.has_other_pages()
         extra_context["page_obj"] = page_obj
+        extra_context["link_search"] = search
+        extra_context["link_query"] = urlencode(
+            {key: value for key, value in search.items() if value}
+        )
 
         return super().change_view(request, object_id, form_url, extra_context)
 
@@ -117,10 +222,93 @@ class PageAdmin(admin.ModelAdmin):
         return default_list_display
 
 
+class LinkStatusFilter(admin.SimpleListFilter):
+    title = "link status"
+    parameter_name = "status"
+    statuses = {
+        "ok": Q(target__status_code__lt=300, target__final_url=""),
+        "redirected": Q(target__status_code__lt=400) & ~Q(target__final_url=""),
+        "broken": Q(target__status_code__gte=400),
+        "unreachable": Q(
+            target__checked_at__isnull=False, target__status_code__isnull=True
+        ),
+        "unchecked": Q(target__checked_at__isnull=True),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, key.capitalize()) for key in self.statuses]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.statuses:
+            return queryset
+        return queryset.filter(self.statuses[self.value()])
+
+
 @admin.register(Link)
-class LinkAdmin(admin.ModelAdmin):
+class LinkAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = (
         "id",
         "name",
         "page",
+        "status_code",
+        "final_url",
+        "checked_at",
+    )
+    list_filter = (LinkStatusFilter,)
+    list_select_related = ("page", "target")
+
+    @admin.display(ordering="target__status_code")
+    def status_code(self, obj):
+        return obj.target.status_code
+
+    @admin.display(description="redirects to")
+    def final_url(self, obj):
+        return obj.target.final_url
+
+    @admin.display(ordering="target__checked_at")
+    def checked_at(self, obj):
+        return obj.target.checked_at
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        log_link_changes(obj.page, [], [obj.target_id], timezone.now())
+        obj.page.update_link_count()
+
+    def delete_queryset(self, request, queryset):
+        removed = defaultdict(list)
+        for page_id, target_id in queryset.values_list("page_id", "target_id"):
+            removed[page_id].append(target_id)
+        pages = Page.objects.in_bulk(removed)
+        now = timezone.now()
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            for page_id, target_ids in removed.items():
+                log_link_changes(pages[page_id], [], target_ids, now)
+                pages[page_id].update_link_count()
+
+
+@admin.register(ScrapeJob)
+class ScrapeJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "url",
+        "status",
+        "status_code",
+        "created_by",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    readonly_fields = (
+        "url",
+        "status",
+        "status_code",
+        "message",
+        "created_by",
+        "created_at",
+        "started_at",
+        "finished_at",
     )
+
+    def has_add_permission(self, request):
+        return False
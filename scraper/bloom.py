@@ -0,0 +1,53 @@
+import hashlib
+import math
+import struct
+
+HEADER = struct.Struct(">QB")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, serializable to bytes."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        self._init(size, hashes, bytearray((size + 7) // 8))
+
+    def _init(self, size: int, hashes: int, bits: bytearray) -> None:
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        size, hashes = HEADER.unpack_from(data)
+        bloom = cls.__new__(cls)
+        bloom._init(size, hashes, bytearray(data[HEADER.size :]))
+        return bloom
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(self.size, self.hashes) + bytes(self.bits)
+
+    def _positions(self, item: str):
+        # Kirsch-Mitzenmacher double hashing from a single 128-bit digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack(">QQ", digest)
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> bool:
+        """Add `item`, returning False if it was (probably) already present."""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
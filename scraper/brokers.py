@@ -0,0 +1,202 @@
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from scraper.models import ScrapeJob
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class BaseBroker:
+    """Job state lives in the ScrapeJob table whatever the transport.
+
+    A claimed job is leased to one worker for `lease` seconds and the lease is
+    renewed by `heartbeat` while the job runs. Jobs whose lease expires, e.g.
+    because their worker died, can be claimed again, up to `max_attempts`
+    times in total before they are marked as failed.
+    """
+
+    def __init__(
+        self,
+        worker: str | None = None,
+        lease: float | None = None,
+        max_attempts: int | None = None,
+    ):
+        self.worker = worker or worker_name()
+        self.lease = lease or settings.SCRAPER_WORKER_LEASE
+        self.max_attempts = max_attempts or settings.SCRAPER_WORKER_MAX_ATTEMPTS
+        self.leased = set()
+        self.renewed_at = time.monotonic()
+
+    def enqueue(self, jobs: list[ScrapeJob]) -> None:
+        raise NotImplementedError
+
+    def claim(self, limit: int) -> list[ScrapeJob]:
+        raise NotImplementedError
+
+    def ack(self, job: ScrapeJob) -> None:
+        self.leased.discard(job.pk)
+
+    def heartbeat(self) -> None:
+        if self.leased and time.monotonic() - self.renewed_at > self.lease / 3:
+            ScrapeJob.objects.filter(
+                pk__in=self.leased, worker=self.worker, status=ScrapeJob.Status.RUNNING
+            ).update(lease_expires_at=timezone.now() + timedelta(seconds=self.lease))
+            self.renewed_at = time.monotonic()
+
+    def close(self) -> None:
+        pass
+
+    def claimable(self, now: datetime) -> Q:
+        """Queued jobs, and running ones whose worker let the lease expire."""
+        return Q(status=ScrapeJob.Status.QUEUED) | Q(
+            status=ScrapeJob.Status.RUNNING,
+            lease_expires_at__lt=now,
+            attempts__lt=self.max_attempts,
+        )
+
+    def fail_abandoned(self, now: datetime) -> int:
+        return ScrapeJob.objects.filter(
+            status=ScrapeJob.Status.RUNNING,
+            lease_expires_at__lt=now,
+            attempts__gte=self.max_attempts,
+        ).update(
+            status=ScrapeJob.Status.FAILED,
+            message=f"Lease expired {self.max_attempts} times",
+            finished_at=now,
+        )
+
+    def take(self, jobs: QuerySet, now: datetime) -> int:
+        return jobs.update(
+            status=ScrapeJob.Status.RUNNING,
+            started_at=now,
+            worker=self.worker,
+            attempts=F("attempts") + 1,
+            lease_expires_at=now + timedelta(seconds=self.lease),
+        )
+
+    def leased_jobs(self, job_ids: list[int]) -> list[ScrapeJob]:
+        self.leased.update(job_ids)
+        return list(ScrapeJob.objects.filter(pk__in=job_ids).order_by("id"))
+
+
+class DatabaseBroker(BaseBroker):
+    """Uses the ScrapeJob table itself as the queue."""
+
+    def enqueue(self, jobs: list[ScrapeJob]) -> None:
+        # Queued rows are picked up by claim(), nothing else to publish.
+        pass
+
+    def claim(self, limit: int) -> list[ScrapeJob]:
+        now = timezone.now()
+        self.fail_abandoned(now)
+        candidates = ScrapeJob.objects.filter(self.claimable(now)).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            # Workers lock disjoint batches instead of queueing on the same rows.
+            with transaction.atomic():
+                job_ids = list(
+                    candidates.select_for_update(skip_locked=True).values_list(
+                        "id", flat=True
+                    )[:limit]
+                )
+                self.take(ScrapeJob.objects.filter(pk__in=job_ids), now)
+        else:
+            # Compare-and-set so two workers never run the same job. A lost
+            # race means another worker took the row, look further down.
+            job_ids = []
+            while len(job_ids) < limit:
+                batch = list(
+                    candidates.values_list("id", flat=True)[: limit - len(job_ids)]
+                )
+                if not batch:
+                    break
+                job_ids += [
+                    job_id
+                    for job_id in batch
+                    if self.take(
+                        ScrapeJob.objects.filter(self.claimable(now), pk=job_id), now
+                    )
+                ]
+        return self.leased_jobs(job_ids)
+
+
+class RabbitMQBroker(BaseBroker):
+    """Publishes job ids to a durable RabbitMQ queue, job state stays in the DB."""
+
+    def __init__(self, url: str | None = None, queue: str | None = None, **kwargs):
+        import pika
+
+        super().__init__(**kwargs)
+        self.pika = pika
+        self.url = url or settings.SCRAPER_RABBITMQ_URL
+        self.queue = queue or settings.SCRAPER_RABBITMQ_QUEUE
+        self.connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=self.queue, durable=True)
+        self.delivery_tags = {}
+
+    def enqueue(self, jobs: list[ScrapeJob]) -> None:
+        properties = self.pika.BasicProperties(
+            delivery_mode=self.pika.DeliveryMode.Persistent
+        )
+        for job in jobs:
+            self.channel.basic_publish(
+                exchange="",
+                routing_key=self.queue,
+                body=str(job.pk).encode(),
+                properties=properties,
+            )
+
+    def claim(self, limit: int) -> list[ScrapeJob]:
+        now = timezone.now()
+        self.fail_abandoned(now)
+        claimed = []
+        for _ in range(limit):
+            method, _properties, body = self.channel.basic_get(queue=self.queue)
+            if method is None:
+                break
+            job_id = int(body)
+            jobs = ScrapeJob.objects.filter(pk=job_id)
+            if method.redelivered:
+                # RabbitMQ only redelivers once the consumer holding the
+                # message is gone, there is no need to wait for its lease.
+                jobs = jobs.filter(
+                    status__in=(ScrapeJob.Status.QUEUED, ScrapeJob.Status.RUNNING),
+                    attempts__lt=self.max_attempts,
+                )
+            else:
+                jobs = jobs.filter(self.claimable(now))
+            if not self.take(jobs, now):
+                # Deleted or already handled, drop the message.
+                self.channel.basic_ack(method.delivery_tag)
+                continue
+            self.delivery_tags[job_id] = method.delivery_tag
+            claimed.append(job_id)
+        return self.leased_jobs(claimed)
+
+    def ack(self, job: ScrapeJob) -> None:
+        super().ack(job)
+        delivery_tag = self.delivery_tags.pop(job.pk, None)
+        if delivery_tag is not None:
+            self.channel.basic_ack(delivery_tag)
+
+    def heartbeat(self) -> None:
+        super().heartbeat()
+        self.connection.process_data_events(time_limit=0)
+
+    def close(self) -> None:
+        if self.connection.is_open:
+            self.connection.close()
+
+
+def get_broker(path: str | None = None) -> BaseBroker:
+    return import_string(path or settings.SCRAPER_BROKER)()
@@ -0,0 +1,152 @@
+import logging
+from itertools import chain
+from collections.abc import Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.utils import IntegrityError
+from django.utils import timezone
+
+from scraper import metrics
+from scraper.fetch import get_links_many
+from scraper.models import Link, Page
+from scraper.services import (
+    build_links,
+    log_new_links,
+    resolve_urls,
+    save_page,
+    schedule_duplicate,
+    schedule_next,
+)
+from scraper.simhash import SimHash, find_duplicates, set_fingerprint
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+def clean_urls(lines: Iterable[str]) -> tuple[list[str], list[str]]:
+    """Split raw input lines into unique valid URLs (in input order) and invalid ones."""
+    validate = URLValidator()
+    valid, invalid, seen = [], [], set()
+    for line in lines:
+        url = line.strip()
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        try:
+            validate(url)
+        except ValidationError:
+            invalid.append(url)
+        else:
+            valid.append(url)
+    return valid, invalid
+
+
+def existing_urls(urls: list[str]) -> set[str]:
+    existing = set()
+    for i in range(0, len(urls), LOOKUP_CHUNK_SIZE):
+        chunk = urls[i : i + LOOKUP_CHUNK_SIZE]
+        existing.update(
+            Page.objects.filter(url__in=chunk).values_list("url", flat=True)
+        )
+    return existing
+
+
+def save_pages(
+    results: list[tuple[str, tuple[str, int, list[tuple[str, str]]]]], user: User
+) -> list[tuple[str, str, int]]:
+    """Persist a batch of `get_links` results with one bulk insert per table."""
+    summary = []
+    scraped = []
+    for url, (page_name, status, links) in results:
+        if status == 200:
+            scraped.append((url, page_name, links))
+        else:
+            summary.append((url, f"Page {url} bad response", status))
+    if not scraped:
+        return summary
+
+    now = timezone.now()
+    try:
+        with metrics.DB_SECONDS.labels("bulk_create").time(), transaction.atomic():
+            url_ids = resolve_urls(
+                chain.from_iterable(
+                    [url, *(link for link, _ in links)] for url, _, links in scraped
+                )
+            )
+            fingerprints = {}
+            for url, page_name, links in scraped:
+                fingerprint = SimHash(url)
+                for link, name in links:
+                    fingerprint.update_link(link, name)
+                fingerprint.update_text(page_name)
+                fingerprints[url] = fingerprint.digest()
+            # Against stored pages only, not within the batch.
+            duplicates = find_duplicates(fingerprints)
+            pages = []
+            link_instances = []
+            for url, page_name, links in scraped:
+                page = Page(
+                    url=url,
+                    target_id=url_ids[url],
+                    name=page_name or url,
+                    created_by=user,
+                    scraped_at=now,
+                    duplicate_of_id=duplicates.get(url),
+                )
+                set_fingerprint(page, fingerprints[url])
+                if page.duplicate_of_id and settings.SCRAPER_SKIP_DUPLICATES:
+                    schedule_duplicate(page, now)
+                    pages.append(page)
+                    continue
+                schedule_next(page, None, now)
+                page_links = build_links(page, links, url_ids)
+                page.link_count = len(page_links)
+                pages.append(page)
+                link_instances.extend(page_links)
+            Page.objects.bulk_create(pages)
+            Link.objects.bulk_create(link_instances, batch_size=1000)
+            log_new_links([page.pk for page in pages], now)
+    except IntegrityError as e:
+        metrics.INTEGRITY_ERRORS.labels("bulk_create").inc()
+        # Someone else created one of these pages meanwhile, fall back to
+        # saving them one by one so the rest of the batch still goes in.
+        logger.error(f"Error bulk creating pages, retrying one by one: {e}")
+        for url, page_name, links in scraped:
+            message, status = save_page(url, user, page_name, 200, links)
+            summary.append((url, message, status))
+        return summary
+
+    for page in pages:
+        if page.duplicate_of_id and settings.SCRAPER_SKIP_DUPLICATES:
+            message = (
+                f"Page {page.url} duplicates page {page.duplicate_of_id}, links skipped"
+            )
+        else:
+            message = f"Page {page.url} successfully scraped"
+        summary.append((page.url, message, 200))
+    return summary
+
+
+def scrape_urls(
+    urls: list[str], user: User, batch_size: int | None = None, **kwargs
+) -> Iterator[tuple[str, str, int]]:
+    """Scrape `urls` in parallel batches, skipping pages that already exist.
+
+    Yields a `(url, message, status)` summary for every URL. Extra keyword
+    arguments are passed on to `get_links_many`.
+    """
+    batch_size = batch_size or settings.SCRAPER_BULK_BATCH_SIZE
+    for i in range(0, len(urls), batch_size):
+        batch = urls[i : i + batch_size]
+        existing = existing_urls(batch)
+        for url in batch:
+            if url in existing:
+                yield url, f"Page {url} already exists", 200
+        pending = [url for url in batch if url not in existing]
+        if pending:
+            yield from save_pages(list(get_links_many(pending, **kwargs)), user)
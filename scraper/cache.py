@@ -0,0 +1,302 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+from scraper import metrics
+from scraper.parsers import read_body
+from scraper.urlnorm import canonicalize, url_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    encoding TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+# Hits only rewrite `accessed_at` once it is this many seconds old, the
+# eviction order does not need to be finer.
+ACCESS_RESOLUTION = 60
+# The total size is summed each time this share of `max_size` was stored.
+EVICT_CHECK_FRACTION = 0.01
+
+
+def freshness(headers, default_ttl: float, max_ttl: float) -> float:
+    """Seconds a response may be served from the cache, 0 if it must not be stored."""
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+
+    ttl = default_ttl
+    if "max-age" in directives:
+        try:
+            ttl = int(directives["max-age"])
+        except ValueError:
+            return 0
+    elif "Expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            # Invalid Expires values mean "already expired".
+            return 0
+        try:
+            date = parsedate_to_datetime(headers["Date"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            date = time.time()
+        ttl = expires - date
+    return max(0, min(ttl, max_ttl))
+
+
+class ResponseCache:
+    """Successful responses in a SQLite file, keyed by canonical URL.
+
+    Bodies are stored zlib compressed. Once the stored bodies go over
+    `max_size` bytes the least recently used ones are evicted, checked after
+    every 1% of `max_size` stored by this process. Concurrent
+    misses for the same URL within a process wait for a single fetch.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int,
+        default_ttl: float,
+        max_ttl: float,
+        max_entry_size: int,
+    ):
+        self.path = str(path)
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.max_entry_size = max_entry_size
+        self.local = threading.local()
+        # Fetches in progress by key, waited on by misses for the same key.
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+        # Bytes stored since the total size was last checked.
+        self.unchecked = 0
+        self.unchecked_lock = threading.Lock()
+        self.connection.executescript(SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if not hasattr(self.local, "connection"):
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return self.local.connection
+
+    def fetch(
+        self,
+        url: str,
+        get: Callable[[], requests.Response],
+        stream: bool = False,
+        accept: Callable[[requests.Response], bool] | None = None,
+    ) -> requests.Response:
+        """Serve `url` from the cache, or `get` it and store the response.
+
+        Responses `accept` returns False for are not stored, nor their body read.
+        """
+        key = url_key(canonicalize(url))
+        response = self.get(key)
+        leader = False
+        if response is None:
+            # Only misses for the same key wait on each other, and only
+            # the registration is under the lock, not the fetch.
+            with self.inflight_lock:
+                done = self.inflight.get(key)
+                leader = done is None
+                if leader:
+                    done = self.inflight[key] = threading.Event()
+            if not leader:
+                done.wait()
+            # Stored meanwhile, unless it could not be cached.
+            response = self.get(key)
+        try:
+            if response is not None:
+                metrics.CACHE_REQUESTS.labels("hit").inc()
+                return response
+            metrics.CACHE_REQUESTS.labels("miss").inc()
+            response = get()
+            if accept is None or accept(response):
+                self.put(key, url, response, stream)
+            return response
+        finally:
+            if leader:
+                with self.inflight_lock:
+                    del self.inflight[key]
+                done.set()
+
+    def get(self, key: str) -> requests.Response | None:
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT url, status, headers, encoding, body, accessed_at FROM responses "
+            "WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        *row, accessed_at = row
+        if now - accessed_at >= ACCESS_RESOLUTION:
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return build_response(*row)
+
+    def put(
+        self, key: str, url: str, response: requests.Response, stream: bool = False
+    ) -> bool:
+        if response.status_code != 200:
+            return False
+        ttl = freshness(response.headers, self.default_ttl, self.max_ttl)
+        if not ttl:
+            return False
+        length = response.headers.get("Content-Length")
+        if stream and not (length and length.isdigit()):
+            # Reading an unknown length body here would defeat streaming.
+            return False
+        if length and length.isdigit() and int(length) > self.max_entry_size:
+            return False
+        if not response._content_consumed:
+            # Bounded like any other read, the caller gets the same body back.
+            response._content = read_body(response)
+            response._content_consumed = True
+        body = response.content
+        if len(body) > self.max_entry_size:
+            return False
+        if len(body) >= settings.SCRAPER_MAX_BODY_SIZE:
+            # Possibly truncated.
+            return False
+
+        compressed = zlib.compress(body)
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, url, status, headers, encoding, body, size, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                url,
+                response.status_code,
+                json.dumps(dict(response.headers)),
+                response.encoding,
+                compressed,
+                len(compressed),
+                now + ttl,
+                now,
+            ),
+        )
+        with self.unchecked_lock:
+            self.unchecked += len(compressed)
+            check = self.unchecked >= self.max_size * EVICT_CHECK_FRACTION
+            if check:
+                self.unchecked = 0
+        if check:
+            self.evict()
+        return True
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones, down to `max_size`."""
+        (size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if size <= self.max_size:
+            return 0
+        evicted = self.connection.execute(
+            "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+        (size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        rows = self.connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        )
+        stale = []
+        for key, entry_size in rows:
+            if size <= self.max_size:
+                break
+            stale.append((key,))
+            size -= entry_size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+        metrics.CACHE_EVICTIONS.inc(evicted + len(stale))
+        return evicted + len(stale)
+
+    def entries(self, batch_size: int = 100) -> Iterator[tuple[str, requests.Response]]:
+        """Yield `(key, response)` for every stored response, expired or not."""
+        last_key = ""
+        while rows := self.connection.execute(
+            "SELECT key, url, status, headers, encoding, body FROM responses "
+            "WHERE key > ? ORDER BY key LIMIT ?",
+            (last_key, batch_size),
+        ).fetchall():
+            last_key = rows[-1][0]
+            for key, *row in rows:
+                yield key, build_response(*row)
+
+    def close(self):
+        if hasattr(self.local, "connection"):
+            self.local.connection.close()
+            del self.local.connection
+
+
+def build_response(
+    url: str, status: int, headers: str, encoding: str | None, body: bytes
+) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(json.loads(headers))
+    response.encoding = encoding
+    response._content = zlib.decompress(body)
+    response._content_consumed = True
+    response.from_cache = True
+    return response
+
+
+_cache = None
+
+
+def get_cache() -> ResponseCache | None:
+    """The cache configured by `SCRAPER_CACHE_PATH`, or None when it is disabled."""
+    global _cache
+    path = settings.SCRAPER_CACHE_PATH
+    if not path:
+        return None
+    if _cache is None or _cache.path != str(path):
+        _cache = ResponseCache(
+            path,
+            max_size=settings.SCRAPER_CACHE_MAX_SIZE,
+            default_ttl=settings.SCRAPER_CACHE_TTL,
+            max_ttl=settings.SCRAPER_CACHE_MAX_TTL,
+            max_entry_size=settings.SCRAPER_CACHE_MAX_ENTRY_SIZE,
+        )
+    return _cache
+
+
+def cached_get(
+    url: str,
+    get: Callable[[], requests.Response],
+    stream: bool = False,
+    accept: Callable[[requests.Response], bool] | None = None,
+) -> requests.Response:
+    cache = get_cache()
+    if cache is None:
+        return get()
+    return cache.fetch(url, get, stream, accept)
@@ -0,0 +1,179 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from scraper import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without sending the request while a host's circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-host breaker opened after `threshold` consecutive failures.
+
+    While open, requests to the host fail immediately. After `reset_timeout`
+    seconds one trial request is let through: success closes the circuit,
+    failure keeps it open for another `reset_timeout`.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = {}
+        self.opened_at = {}
+        self.lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        with self.lock:
+            opened_at = self.opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.reset_timeout:
+                return False
+            # Half-open, block everyone else until the trial request is done.
+            self.opened_at[host] = time.monotonic()
+            return True
+
+    def record_success(self, host: str) -> None:
+        with self.lock:
+            self.failures.pop(host, None)
+            self.opened_at.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if self.failures[host] >= self.threshold:
+                if host not in self.opened_at:
+                    logger.warning(f"Opening circuit for {host}")
+                self.opened_at[host] = time.monotonic()
+
+
+def make_session(pool_size: int, pool_hosts: int | None = None) -> requests.Session:
+    pool_hosts = pool_hosts or settings.SCRAPER_CLIENT_POOL_HOSTS
+    session = requests.Session()
+    session.headers["User-Agent"] = settings.SCRAPER_USER_AGENT
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def retry_after(response: requests.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class FetchClient:
+    """Keep-alive HTTP client with retries and a per-host circuit breaker.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried up to
+    `retries` times with jittered exponential backoff, waiting for
+    Retry-After instead when the server sends it. The last response is
+    returned as is once retries are exhausted.
+    """
+
+    def __init__(
+        self,
+        pool_size: int | None = None,
+        retries: int | None = None,
+        backoff: float | None = None,
+        max_backoff: float | None = None,
+        timeout: float | None = None,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.session = make_session(pool_size or settings.SCRAPER_CLIENT_POOL_SIZE)
+        self.retries = settings.SCRAPER_CLIENT_RETRIES if retries is None else retries
+        self.backoff = settings.SCRAPER_CLIENT_BACKOFF if backoff is None else backoff
+        self.max_backoff = max_backoff or settings.SCRAPER_CLIENT_MAX_BACKOFF
+        self.timeout = timeout or settings.SCRAPER_FETCH_TIMEOUT
+        self.breaker = breaker or CircuitBreaker(
+            settings.SCRAPER_CLIENT_BREAKER_THRESHOLD,
+            settings.SCRAPER_CLIENT_BREAKER_RESET,
+        )
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("get", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("head", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        if not self.breaker.allow(host):
+            metrics.CIRCUIT_OPEN.inc()
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        attempt = 0
+        while True:
+            try:
+                response = getattr(self.session, method)(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    self.breaker.record_failure(host)
+                    raise
+                delay = self.delay(attempt)
+                logger.info(f"Retrying {url} in {delay:.1f}s after {e}")
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success(host)
+                    return response
+                delay = retry_after(response)
+                if delay is None:
+                    delay = self.delay(attempt)
+                if attempt >= self.retries or delay > self.max_backoff:
+                    self.breaker.record_failure(host)
+                    return response
+                response.close()
+                logger.info(
+                    f"Retrying {url} in {delay:.1f}s after {response.status_code}"
+                )
+            metrics.RETRIES.inc()
+            time.sleep(delay)
+            attempt += 1
+
+    def delay(self, attempt: int) -> float:
+        # "Equal jitter": half the exponential delay plus a random half.
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> FetchClient:
+    """The process wide client, shared by every thread."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FetchClient()
+        return _client
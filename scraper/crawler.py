@@ -0,0 +1,225 @@
+import heapq
+import logging
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from scraper.bloom import BloomFilter
+from scraper.client import get_client
+from scraper.models import Crawl, FrontierUrl, Page
+from scraper.services import create_page
+from scraper.urlnorm import canonicalize, url_key
+
+logger = logging.getLogger(__name__)
+
+
+class RobotsCache:
+    def __init__(self, user_agent: str | None = None, timeout: int = 5):
+        self.user_agent = user_agent or settings.SCRAPER_USER_AGENT
+        self.timeout = timeout
+        self.parsers = {}
+
+    def can_fetch(self, url: str) -> bool:
+        return self.parser(url).can_fetch(self.user_agent, url)
+
+    def sitemaps(self, url: str) -> list[str]:
+        """Sitemap URLs listed in the robots.txt of `url`'s site."""
+        return self.parser(url).site_maps() or []
+
+    def parser(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self.parsers:
+            self.parsers[origin] = self._load(origin)
+        return self.parsers[origin]
+
+    def _load(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = get_client().get(parser.url, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {parser.url}: {e}")
+            response = None
+        if response is None or response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+
+def allowed_hosts(crawl: Crawl) -> set[str]:
+    hosts = {host.strip().lower() for host in crawl.allowed_domains.splitlines()}
+    hosts.discard("")
+    return hosts or {urlsplit(crawl.seed.url).hostname}
+
+
+def in_scope(url: str, hosts: set[str]) -> bool:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False
+    return any(
+        parts.hostname == host or parts.hostname.endswith(f".{host}") for host in hosts
+    )
+
+
+def load_seen(crawl: Crawl) -> BloomFilter:
+    if crawl.seen:
+        seen = BloomFilter.from_bytes(bytes(crawl.seen))
+    else:
+        seen = BloomFilter(
+            settings.SCRAPER_CRAWL_BLOOM_CAPACITY,
+            settings.SCRAPER_CRAWL_BLOOM_ERROR_RATE,
+        )
+    # The filter is saved every few batches only, the frontier with each one.
+    urls = FrontierUrl.objects.filter(crawl=crawl).values_list("url", flat=True)
+    for url in urls.iterator():
+        seen.add(url)
+    return seen
+
+
+def save_seen(crawl: Crawl, seen: BloomFilter) -> None:
+    crawl.seen = seen.to_bytes()
+    crawl.save(update_fields=["seen"])
+
+
+def new_frontier_urls(
+    crawl: Crawl, page: Page, depth: int, seen: BloomFilter, hosts: set[str]
+) -> list[FrontierUrl]:
+    """Unsaved frontier rows for the in scope links of `page` not seen yet."""
+    if depth > crawl.max_depth:
+        return []
+    frontier = []
+    for url in page.link_set.values_list("target__url", flat=True).iterator():
+        if in_scope(url, hosts) and seen.add(url):
+            frontier.append(FrontierUrl(crawl=crawl, url=url, depth=depth))
+    return frontier
+
+
+def find_page(url: str) -> Page | None:
+    # Frontier URLs are canonical, pages keep the URL they were scraped with.
+    page = Page.objects.filter(url=url).first()
+    if page is None:
+        page = Page.objects.filter(target__key=url_key(canonicalize(url))).first()
+    return page
+
+
+def start_crawl(
+    seed: Page,
+    user: User,
+    max_depth: int = 2,
+    allowed_domains: str = "",
+    rate_limit: float | None = None,
+    respect_robots: bool = True,
+) -> Crawl:
+    with transaction.atomic():
+        crawl = Crawl.objects.create(
+            seed=seed,
+            created_by=user,
+            max_depth=max_depth,
+            allowed_domains=allowed_domains,
+            rate_limit=(
+                settings.SCRAPER_CRAWL_RATE_LIMIT if rate_limit is None else rate_limit
+            ),
+            respect_robots=respect_robots,
+        )
+        seen = load_seen(crawl)
+        seen.add(canonicalize(seed.url))
+        FrontierUrl.objects.bulk_create(
+            new_frontier_urls(crawl, seed, 1, seen, allowed_hosts(crawl)),
+            batch_size=1000,
+        )
+        save_seen(crawl, seen)
+    return crawl
+
+
+def _politeness_order(rows: list[FrontierUrl], next_allowed: dict, rate_limit: float):
+    """Yield rows so that each host is hit at most once every `rate_limit` seconds.
+
+    Hosts are interleaved: while one host is cooling down, rows for other hosts
+    are processed instead of sleeping.
+    """
+    by_host = defaultdict(deque)
+    for row in rows:
+        by_host[urlsplit(row.url).netloc].append(row)
+    ready = [(next_allowed.get(host, 0), host) for host in by_host]
+    heapq.heapify(ready)
+    while ready:
+        allowed_at, host = heapq.heappop(ready)
+        delay = allowed_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield by_host[host].popleft()
+        next_allowed[host] = time.monotonic() + rate_limit
+        if by_host[host]:
+            heapq.heappush(ready, (next_allowed[host], host))
+
+
+def run_crawl(
+    crawl: Crawl, batch_size: int = 100, robots: RobotsCache | None = None
+) -> int:
+    """Process the crawl frontier breadth-first until it is empty.
+
+    The statuses of a batch and the URLs it discovered are saved in one
+    transaction so an interrupted crawl can be resumed by calling this again.
+    The Bloom filter of seen URLs is only saved every
+    `SCRAPER_CRAWL_SEEN_SAVE_BATCHES` batches, `load_seen` adds the frontier
+    URLs back. Returns the number of frontier URLs processed.
+    """
+    robots = robots or RobotsCache()
+    seen = load_seen(crawl)
+    hosts = allowed_hosts(crawl)
+    next_allowed = {}
+    processed = batches = 0
+
+    while True:
+        rows = list(
+            FrontierUrl.objects.filter(
+                crawl=crawl, status=FrontierUrl.Status.QUEUED
+            ).order_by("id")[:batch_size]
+        )
+        if not rows:
+            break
+
+        frontier = []
+        allowed, skipped = [], []
+        for row in rows:
+            if crawl.respect_robots and not robots.can_fetch(row.url):
+                skipped.append(row)
+            else:
+                allowed.append(row)
+        for row in skipped:
+            row.status = FrontierUrl.Status.SKIPPED
+
+        for row in _politeness_order(allowed, next_allowed, crawl.rate_limit):
+            page = find_page(row.url)
+            if page is None:
+                create_page(row.url, crawl.created_by)
+                page = find_page(row.url)
+            if page is None:
+                row.status = FrontierUrl.Status.FAILED
+                continue
+            row.status = FrontierUrl.Status.DONE
+            frontier += new_frontier_urls(crawl, page, row.depth + 1, seen, hosts)
+
+        batches += 1
+        with transaction.atomic():
+            FrontierUrl.objects.bulk_update(rows, ["status"])
+            FrontierUrl.objects.bulk_create(frontier, batch_size=1000)
+            if batches % settings.SCRAPER_CRAWL_SEEN_SAVE_BATCHES == 0:
+                save_seen(crawl, seen)
+        processed += len(rows)
+
+    crawl.seen = seen.to_bytes()
+    crawl.status = Crawl.Status.DONE
+    crawl.finished_at = timezone.now()
+    crawl.save(update_fields=["seen", "status", "finished_at"])
+    return processed
@@ -0,0 +1,75 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from scraper.models import FeedCursor, LinkChange
+
+
+def serialize_change(change: LinkChange) -> dict:
+    return {
+        "seq": change.pk,
+        "page": change.page_id,
+        "url": change.target.url,
+        "kind": change.kind,
+        "created_at": change.created_at,
+    }
+
+
+def publish_changes(
+    url: str | None = None,
+    exchange: str | None = None,
+    batch_size: int = 1000,
+    follow: bool = False,
+    poll_interval: float | None = None,
+) -> int:
+    """Publish the change log to a fanout exchange, one message per change.
+
+    The position is saved in a `FeedCursor` after every confirmed batch, so
+    a restarted publisher carries on where it stopped. Delivery is at least
+    once: consumers should skip `seq` values they have already seen.
+    Returns the number of changes published.
+    """
+    import pika
+
+    url = url or settings.SCRAPER_RABBITMQ_URL
+    exchange = exchange or settings.SCRAPER_CHANGES_EXCHANGE
+    if poll_interval is None:
+        poll_interval = settings.SCRAPER_WORKER_POLL_INTERVAL
+    properties = pika.BasicProperties(
+        content_type="application/json",
+        delivery_mode=pika.DeliveryMode.Persistent,
+    )
+
+    connection = pika.BlockingConnection(pika.URLParameters(url))
+    channel = connection.channel()
+    channel.exchange_declare(exchange=exchange, exchange_type="fanout", durable=True)
+    channel.confirm_delivery()
+    cursor, _ = FeedCursor.objects.get_or_create(name=f"rabbitmq:{exchange}")
+    published = 0
+    try:
+        while True:
+            changes = list(
+                LinkChange.objects.filter(pk__gt=cursor.position)
+                .select_related("target")
+                .order_by("pk")[:batch_size]
+            )
+            if not changes:
+                if not follow:
+                    break
+                connection.sleep(poll_interval)
+                continue
+            for change in changes:
+                channel.basic_publish(
+                    exchange=exchange,
+                    routing_key="",
+                    body=json.dumps(serialize_change(change), cls=DjangoJSONEncoder),
+                    properties=properties,
+                )
+            cursor.position = changes[-1].pk
+            cursor.save(update_fields=["position"])
+            published += len(changes)
+    finally:
+        if connection.is_open:
+            connection.close()
+    return published
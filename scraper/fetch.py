@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import queue
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from scraper.client import FetchClient, get_client
+from scraper.pool import parse_many
+from scraper.parsers import PREFIX_SIZE, detect_encoding, read_body
+from scraper.services import fetch, get_links, read_error, save_page
+
+logger = logging.getLogger(__name__)
+
+LinksResult = tuple[str, int, list[tuple[str, str]]]
+BodyResult = tuple[str, int, bytes | None, str | None]
+# Fetches started ahead of the results consumed, per unit of concurrency.
+SUBMIT_AHEAD = 4
+
+
+def make_session(pool_size: int) -> FetchClient:
+    # Own keep-alive pools sized for the engine, shared circuit breaker.
+    return FetchClient(pool_size=pool_size, breaker=get_client().breaker)
+
+
+def _fetch_and_parse(session: FetchClient, url: str, timeout: float) -> LinksResult:
+    return get_links(url, timeout=timeout, client=session)
+
+
+def _fetch_body(session: FetchClient, url: str, timeout: float) -> BodyResult:
+    response, status, error = fetch(url, timeout=timeout, stream=True, client=session)
+    if response is None:
+        return error, status, None, None
+    try:
+        body = read_body(response)
+    except requests.RequestException as e:
+        return read_error(url, e), 500, None, None
+    finally:
+        response.close()
+    content_type = response.headers.get("Content-Type", "")
+    return "", status, body, detect_encoding(content_type, body[:PREFIX_SIZE])
+
+
+def _links_error(url: str, error: Exception) -> LinksResult:
+    return f"{error}", 500, []
+
+
+def _body_error(url: str, error: Exception) -> BodyResult:
+    return f"{error}", 500, None, None
+
+
+async def async_get_links(
+    urls: Iterable[str],
+    concurrency: int | None = None,
+    per_host: int | None = None,
+    timeout: float | None = None,
+    fetcher=_fetch_and_parse,
+    on_error: Callable[[str, Exception], tuple] = _links_error,
+):
+    """Async generator yielding `(url, get_links result)` as each fetch finishes.
+
+    Blocking I/O runs on a thread pool sharing one keep-alive session, bounded
+    by a global semaphore and one semaphore per host. `urls` are read as
+    fetches finish, a few times `concurrency` ahead. Pass `fetcher=_fetch_body`
+    and `on_error=_body_error` to get `(error, status, body, encoding)` back
+    unparsed. An exception raised by `fetcher` is logged and turned into the
+    result of its URL by `on_error`, the other URLs go on.
+    """
+    concurrency = concurrency or settings.SCRAPER_FETCH_CONCURRENCY
+    per_host = per_host or settings.SCRAPER_FETCH_PER_HOST
+    timeout = timeout or settings.SCRAPER_FETCH_TIMEOUT
+
+    loop = asyncio.get_running_loop()
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async def fetch(url: str):
+        async with global_limit, host_limits[urlsplit(url).netloc]:
+            try:
+                result = await loop.run_in_executor(
+                    executor, fetcher, session, url, timeout
+                )
+            except Exception as e:
+                logger.exception(f"Error fetching {url}")
+                result = on_error(url, e)
+        return url, result
+
+    with (
+        make_session(concurrency) as session,
+        ThreadPoolExecutor(max_workers=concurrency) as executor,
+    ):
+        urls = iter(urls)
+        pending = set()
+        try:
+            while True:
+                for url in islice(urls, concurrency * SUBMIT_AHEAD - len(pending)):
+                    pending.add(asyncio.ensure_future(fetch(url)))
+                if not pending:
+                    break
+                finished, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def get_links_many(
+    urls: Iterable[str], parse_workers: int | None = None, **kwargs
+) -> Iterator[tuple[str, LinksResult]]:
+    """Fetch `urls` concurrently, yielding `(url, get_links result)` pairs.
+
+    With `parse_workers` (default `SCRAPER_PARSE_WORKERS`) above zero, raw
+    bodies are parsed in a process pool of that size while fetching goes on.
+    """
+    if parse_workers is None:
+        parse_workers = settings.SCRAPER_PARSE_WORKERS
+    if parse_workers:
+        yield from _get_links_parallel(urls, parse_workers, **kwargs)
+        return
+    yield from _iter_async(async_get_links(urls, **kwargs))
+
+
+def _get_links_parallel(
+    urls: Iterable[str], parse_workers: int, **kwargs
+) -> Iterator[tuple[str, LinksResult]]:
+    statuses = {}
+
+    def bodies():
+        for url, (error, status, body, encoding) in _iter_async(
+            async_get_links(urls, fetcher=_fetch_body, on_error=_body_error, **kwargs)
+        ):
+            if body is None:
+                failed.append((url, (error, status, [])))
+                continue
+            statuses[url] = status
+            yield url, body, encoding
+
+    failed = []
+    for url, title, links in parse_many(bodies(), workers=parse_workers):
+        yield from failed
+        failed.clear()
+        yield url, (title, statuses[url], links)
+    yield from failed
+
+
+def _iter_async(agen) -> Iterator:
+    """Iterate an async generator from synchronous code.
+
+    The event loop runs in a background thread so callers can keep using the
+    ORM (which refuses to run inside an event loop) on the results. When the
+    caller stops early, or raises, `agen` is closed and the thread ends.
+    """
+    results = queue.Queue(maxsize=1024)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Gives up once the caller is gone instead of waiting on a full queue.
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    async def produce():
+        try:
+            async for item in agen:
+                if not put(item):
+                    break
+        finally:
+            await agen.aclose()
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (item := results.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def create_pages(
+    urls: Iterable[str], user: User, **kwargs
+) -> Iterator[tuple[str, str, int]]:
+    """Fetch `urls` concurrently and persist each one through `save_page`.
+
+    Yields `(url, message, status)` in completion order.
+    """
+    for url, (page_name, status, links) in get_links_many(urls, **kwargs):
+        message, status = save_page(url, user, page_name, status, links)
+        yield url, message, status
@@ -12,3 +12,29 @@ class scraperForm(forms.Form):
         ),
         initial="",
     )
+
+
+class bulkScraperForm(forms.Form):
+    urls = forms.CharField(
+        label="",
+        required=False,
+        widget=forms.Textarea(
+            attrs={
+                "rows": 4,
+                "cols": 50,
+                "placeholder": "Add new Pages, one URL per line",
+            }
+        ),
+    )
+    file = forms.FileField(label="Or upload a file", required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lines = cleaned_data.get("urls", "").splitlines()
+        if cleaned_data.get("file"):
+            content = cleaned_data["file"].read().decode("utf-8", errors="replace")
+            lines.extend(content.splitlines())
+        if not any(line.strip() for line in lines):
+            raise forms.ValidationError("Add at least one URL")
+        cleaned_data["lines"] = lines
+        return cleaned_data
@@ -0,0 +1,119 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from scraper import metrics
+from scraper.brokers import BaseBroker, get_broker
+from scraper.models import ScrapeJob
+from scraper.services import create_page
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_scrape(urls: list[str], user: User) -> list[ScrapeJob]:
+    jobs = ScrapeJob.objects.bulk_create(
+        [ScrapeJob(url=url, created_by=user) for url in urls]
+    )
+    transaction.on_commit(lambda: _publish(jobs))
+    return jobs
+
+
+def _publish(jobs: list[ScrapeJob]) -> None:
+    broker = get_broker()
+    try:
+        broker.enqueue(jobs)
+    finally:
+        broker.close()
+
+
+def run_job(job: ScrapeJob) -> ScrapeJob:
+    if job.started_at is None:
+        job.started_at = timezone.now()
+    try:
+        message, status = create_page(job.url, job.created_by)
+    except Exception as e:
+        logger.exception(f"Error running scrape job {job.pk} for {job.url}")
+        message, status = f"{e}", 500
+
+    job.message = message
+    job.status_code = status
+    job.status = ScrapeJob.Status.DONE if status == 200 else ScrapeJob.Status.FAILED
+    job.finished_at = timezone.now()
+    metrics.JOBS.labels(job.status).inc()
+    metrics.JOB_SECONDS.observe((job.finished_at - job.started_at).total_seconds())
+    # Only the worker holding the current lease records the result, a job
+    # reclaimed after its lease expired has had its attempts bumped since.
+    updated = ScrapeJob.objects.filter(pk=job.pk, attempts=job.attempts).update(
+        message=job.message,
+        status_code=job.status_code,
+        status=job.status,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        lease_expires_at=None,
+    )
+    if not updated:
+        logger.warning(f"Scrape job {job.pk} was reclaimed, dropping its result")
+    return job
+
+
+def _run_job_in_thread(job: ScrapeJob) -> ScrapeJob:
+    try:
+        return run_job(job)
+    finally:
+        # Each worker thread holds its own DB connection.
+        connections.close_all()
+
+
+def run_worker(
+    broker: BaseBroker | None = None,
+    concurrency: int | None = None,
+    poll_interval: float | None = None,
+    once: bool = False,
+) -> int:
+    """Claim jobs from the broker and run up to `concurrency` of them at a time.
+
+    With `once=True` the worker stops as soon as the queue is drained.
+    Returns the number of jobs processed.
+    """
+    broker = broker or get_broker()
+    concurrency = concurrency or settings.SCRAPER_WORKER_CONCURRENCY
+    if poll_interval is None:
+        poll_interval = settings.SCRAPER_WORKER_POLL_INTERVAL
+
+    processed = 0
+    running = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            while True:
+                close_old_connections()
+                free = concurrency - len(running)
+                jobs = broker.claim(free) if free else []
+                for job in jobs:
+                    running[executor.submit(_run_job_in_thread, job)] = job
+
+                if not running:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(
+                    running, timeout=poll_interval, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    job = running.pop(future)
+                    broker.ack(job)
+                    processed += 1
+                broker.heartbeat()
+        finally:
+            for future in list(running):
+                future.result()
+                broker.ack(running.pop(future))
+                processed += 1
+            broker.close()
+    return processed
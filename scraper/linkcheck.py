@@ -0,0 +1,81 @@
+import logging
+from collections.abc import Iterator
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from scraper.client import FetchClient
+from scraper.fetch import _iter_async, async_get_links
+from scraper.models import Link, Url
+from scraper.services import batched
+
+logger = logging.getLogger(__name__)
+
+CHECK_FIELDS = ["status_code", "final_url", "checked_at"]
+# Servers that do not implement HEAD, or refuse it, are asked for one byte.
+HEAD_REFUSED = {403, 405, 501}
+
+CheckResult = tuple[int | None, str]
+
+
+def check_url(session: FetchClient, url: str, timeout: float) -> CheckResult:
+    """HEAD `url`, following redirects, returning its status and final URL.
+
+    The status is None when the URL could not be reached at all.
+    """
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+        if response.status_code in HEAD_REFUSED:
+            response = session.get(
+                url, timeout=timeout, stream=True, headers={"Range": "bytes=0-0"}
+            )
+            response.close()
+    except requests.RequestException as e:
+        logger.info(f"Error checking {url}: {e}")
+        return None, ""
+    return response.status_code, response.url if response.url != url else ""
+
+
+def check_error(url: str, error: Exception) -> CheckResult:
+    return None, ""
+
+
+def check_links(
+    older_than: timedelta | None = None,
+    batch_size: int | None = None,
+    **kwargs,
+) -> Iterator[tuple[str, CheckResult]]:
+    """Check every URL that stored links point to, once however many links.
+
+    URLs are streamed from the database with a server-side cursor and checked
+    `batch_size` at a time, each batch saved with one bulk update. With
+    `older_than`, URLs checked more recently are skipped. Extra keyword
+    arguments (`concurrency`, `per_host`, `timeout`) are passed on to
+    `async_get_links`. Yields `(url, (status, final url))`.
+    """
+    batch_size = batch_size or settings.SCRAPER_LINK_CHECK_BATCH_SIZE
+    urls = Url.objects.filter(Exists(Link.objects.filter(target=OuterRef("pk"))))
+    if older_than is not None:
+        urls = urls.filter(
+            Q(checked_at__isnull=True) | Q(checked_at__lt=timezone.now() - older_than)
+        )
+    rows = urls.order_by("pk").values_list("url", "pk").iterator(chunk_size=batch_size)
+    for batch in batched(rows, batch_size):
+        ids = dict(batch)
+        checked = []
+        for url, (status, final_url) in _iter_async(
+            async_get_links(ids, fetcher=check_url, on_error=check_error, **kwargs)
+        ):
+            checked.append(
+                Url(
+                    pk=ids[url],
+                    status_code=status,
+                    final_url=final_url,
+                    checked_at=timezone.now(),
+                )
+            )
+            yield url, (status, final_url)
+        Url.objects.bulk_update(checked, CHECK_FIELDS)
@@ -0,0 +1,44 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from scraper.linkcheck import check_links
+
+
+class Command(BaseCommand):
+    help = "Check that the URLs stored links point to are still reachable."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=None,
+            help="Only check URLs not checked in this many hours.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--concurrency", type=int, default=None)
+        parser.add_argument("--per-host", type=int, default=None)
+
+    def handle(self, *args, **options):
+        older_than = None
+        if options["older_than"] is not None:
+            older_than = timedelta(hours=options["older_than"])
+
+        counts = Counter()
+        for url, (status, final_url) in check_links(
+            older_than=older_than,
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            per_host=options["per_host"],
+        ):
+            counts[status or "unreachable"] += 1
+            self.stdout.write(f"{status or '-'}\t{url}\t{final_url}")
+
+        summary = ", ".join(
+            f"{key}: {value}"
+            for key, value in sorted(counts.items(), key=lambda item: str(item[0]))
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {sum(counts.values())} URLs ({summary})")
+        )
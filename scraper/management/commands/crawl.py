@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.crawler import run_crawl, start_crawl
+from scraper.models import Crawl, Page
+
+
+class Command(BaseCommand):
+    help = "Crawl breadth-first from a scraped page, or resume an existing crawl."
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--seed", type=int, help="Id of the Page to start from.")
+        group.add_argument("--resume", type=int, help="Id of the Crawl to resume.")
+        parser.add_argument("--depth", type=int, default=2)
+        parser.add_argument(
+            "--domain",
+            action="append",
+            default=[],
+            help="Host to stay within (repeatable), defaults to the seed host.",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=None,
+            help="Minimum seconds between requests to the same host.",
+        )
+        parser.add_argument("--ignore-robots", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            try:
+                crawl = Crawl.objects.get(pk=options["resume"])
+            except Crawl.DoesNotExist:
+                raise CommandError(f"Crawl {options['resume']} does not exist")
+        else:
+            try:
+                seed = Page.objects.get(pk=options["seed"])
+            except Page.DoesNotExist:
+                raise CommandError(f"Page {options['seed']} does not exist")
+            crawl = start_crawl(
+                seed,
+                seed.created_by,
+                max_depth=options["depth"],
+                allowed_domains="\n".join(options["domain"]),
+                rate_limit=options["rate_limit"],
+                respect_robots=not options["ignore_robots"],
+            )
+            self.stdout.write(f"Started crawl {crawl.pk}")
+
+        processed = run_crawl(crawl)
+        self.stdout.write(
+            self.style.SUCCESS(f"Crawl {crawl.pk} done, {processed} URLs processed")
+        )
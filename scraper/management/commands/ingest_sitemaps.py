@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.sitemaps import ingest_sitemaps
+
+
+class Command(BaseCommand):
+    help = "Queue scrape jobs for the URLs listed in sitemaps."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "urls",
+            nargs="+",
+            help="Sitemap URLs, or sites whose sitemaps are listed in robots.txt.",
+        )
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username the scraped pages are created for.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        counts = ingest_sitemaps(
+            options["urls"], user, batch_size=options["batch_size"]
+        )
+        summary = ", ".join(f"{key}: {value}" for key, value in sorted(counts.items()))
+        self.stdout.write(
+            self.style.SUCCESS(f"Ingested {sum(counts.values())} URLs ({summary})")
+        )
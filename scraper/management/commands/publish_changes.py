@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from scraper.feed import publish_changes
+
+
+class Command(BaseCommand):
+    help = "Publish new and removed links to RabbitMQ."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--exchange",
+            default=None,
+            help="Fanout exchange, defaults to SCRAPER_CHANGES_EXCHANGE.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Keep publishing new changes instead of exiting once caught up.",
+        )
+
+    def handle(self, *args, **options):
+        published = publish_changes(
+            exchange=options["exchange"],
+            batch_size=options["batch_size"],
+            follow=options["follow"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Published {published} changes"))
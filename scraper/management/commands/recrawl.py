@@ -0,0 +1,40 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from scraper.scheduler import run_scheduler
+
+
+class Command(BaseCommand):
+    help = "Re-scrape pages as they become due, within a fixed crawl rate."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Pages per second, defaults to SCRAPER_RECRAWL_RATE.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--concurrency", type=int, default=None)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no page is due instead of waiting for the next one.",
+        )
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        for page, message, status in run_scheduler(
+            rate=options["rate"],
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            once=options["once"],
+        ):
+            counts[status] += 1
+            self.stdout.write(f"{status}\t{page.url}\t{message}")
+
+        summary = ", ".join(f"{key}: {value}" for key, value in sorted(counts.items()))
+        self.stdout.write(
+            self.style.SUCCESS(f"Re-scraped {sum(counts.values())} pages ({summary})")
+        )
@@ -0,0 +1,73 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.models import ArchiveRecord, Page
+from scraper.services import apply_rescrape, batched
+from scraper.warc import ArchiveReader, index_archives
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-parse stored pages from the WARC archives without fetching them, "
+        "e.g. after changing the link parser."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = settings.SCRAPER_ARCHIVE_PATH
+        if not path:
+            raise CommandError("The archives are disabled (SCRAPER_ARCHIVE_PATH).")
+
+        indexed = index_archives(path)
+        self.stdout.write(f"Indexed {indexed} archived responses")
+
+        counts = Counter()
+        pages = (
+            Page.objects.filter(target__isnull=False)
+            .select_related("target")
+            .order_by("pk")
+            .iterator(chunk_size=options["batch_size"])
+        )
+        with ArchiveReader(path) as reader:
+            for batch in batched(pages, options["batch_size"]):
+                self.replay(reader, batch, counts)
+
+        summary = ", ".join(
+            f"{key}: {value}"
+            for key, value in sorted(counts.items(), key=lambda item: str(item[0]))
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Replayed {sum(counts.values())} pages ({summary})")
+        )
+
+    def replay(self, reader, batch, counts):
+        # The latest successful fetch of each page.
+        records = {
+            record.key: record
+            for record in ArchiveRecord.objects.filter(
+                key__in=[page.target.key for page in batch], status_code=200
+            ).order_by("fetched_at", "pk")
+        }
+        pages = [page for page in batch if page.target.key in records]
+        # In file order, the archives are read sequentially.
+        pages.sort(
+            key=lambda page: (
+                records[page.target.key].filename,
+                records[page.target.key].offset,
+            )
+        )
+        for page in pages:
+            record = records[page.target.key]
+            try:
+                response = reader.read(record.filename, record.offset, record.length)
+            except OSError as e:
+                counts["missing"] += 1
+                self.stderr.write(f"Error reading {record}: {e}")
+                continue
+            message, status = apply_rescrape(page, response, force=True)
+            counts[status] += 1
+            self.stdout.write(f"{status}\t{page.url}\t{message}")
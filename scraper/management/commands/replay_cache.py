@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.cache import get_cache
+from scraper.models import Page
+from scraper.services import apply_rescrape
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-parse stored pages from the response cache without fetching them, "
+        "e.g. after changing the link parser."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        cache = get_cache()
+        if cache is None:
+            raise CommandError("The response cache is disabled (SCRAPER_CACHE_PATH).")
+
+        counts = Counter()
+        batch = []
+        for entry in cache.entries(options["batch_size"]):
+            batch.append(entry)
+            if len(batch) == options["batch_size"]:
+                self.replay(batch, counts)
+                batch = []
+        self.replay(batch, counts)
+
+        summary = ", ".join(f"{key}: {value}" for key, value in sorted(counts.items()))
+        self.stdout.write(
+            self.style.SUCCESS(f"Replayed {sum(counts.values())} pages ({summary})")
+        )
+
+    def replay(self, batch, counts):
+        pages = {
+            page.target.key: page
+            for page in Page.objects.filter(
+                target__key__in=[key for key, _ in batch]
+            ).select_related("target")
+        }
+        for key, response in batch:
+            page = pages.get(key)
+            if page is None:
+                continue
+            message, status = apply_rescrape(page, response, force=True)
+            counts[status] += 1
+            self.stdout.write(f"{status}\t{page.url}\t{message}")
@@ -0,0 +1,53 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from scraper.models import Page
+from scraper.services import SCHEDULE_FIELDS, apply_rescrape, conditional_get
+
+
+class Command(BaseCommand):
+    help = "Re-scrape stored pages, skipping the ones that did not change."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=None,
+            help="Only re-scrape pages last scraped more than this many hours ago.",
+        )
+        parser.add_argument("--user", default=None, help="Only pages of this user.")
+        parser.add_argument("--concurrency", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        pages = Page.objects.order_by("id")
+        if options["older_than"] is not None:
+            cutoff = timezone.now() - timedelta(hours=options["older_than"])
+            pages = pages.filter(Q(scraped_at__lt=cutoff) | Q(scraped_at__isnull=True))
+        if options["user"]:
+            pages = pages.filter(created_by__username=options["user"])
+
+        concurrency = options["concurrency"] or settings.SCRAPER_FETCH_CONCURRENCY
+        batch_size = options["batch_size"]
+        counts = Counter()
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while batch := list(pages.filter(id__gt=last_id)[:batch_size]):
+                last_id = batch[-1].id
+                responses = executor.map(conditional_get, batch)
+                for page, response in zip(batch, responses):
+                    message, status = apply_rescrape(page, response)
+                    counts[status] += 1
+                    self.stdout.write(f"{status}\t{page.url}\t{message}")
+                Page.objects.bulk_update(batch, SCHEDULE_FIELDS)
+
+        summary = ", ".join(f"{key}: {value}" for key, value in sorted(counts.items()))
+        self.stdout.write(
+            self.style.SUCCESS(f"Re-scraped {sum(counts.values())} pages ({summary})")
+        )
@@ -0,0 +1,70 @@
+import sys
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.bulk import clean_urls, scrape_urls
+
+
+class Command(BaseCommand):
+    help = "Scrape a list of URLs, one per line, from a file or stdin."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file",
+            nargs="?",
+            default="-",
+            help="File with one URL per line, '-' (default) reads stdin.",
+        )
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username the scraped pages are created for.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--concurrency", type=int, default=None)
+        parser.add_argument("--per-host", type=int, default=None)
+        parser.add_argument(
+            "--parse-workers",
+            type=int,
+            default=None,
+            help="Parse pages in this many processes, defaults to SCRAPER_PARSE_WORKERS.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        if options["file"] == "-":
+            urls, invalid = clean_urls(sys.stdin)
+        else:
+            with open(options["file"]) as f:
+                urls, invalid = clean_urls(f)
+
+        counts = Counter()
+        for url in invalid:
+            counts["invalid"] += 1
+            self.stdout.write(f"invalid\t{url}\tInvalid URL")
+
+        results = scrape_urls(
+            urls,
+            user,
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            per_host=options["per_host"],
+            parse_workers=options["parse_workers"],
+        )
+        for url, message, status in results:
+            counts[status] += 1
+            self.stdout.write(f"{status}\t{url}\t{message}")
+
+        summary = ", ".join(
+            f"{key}: {value}"
+            for key, value in sorted(counts.items(), key=lambda item: str(item[0]))
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {sum(counts.values())} URLs ({summary})")
+        )
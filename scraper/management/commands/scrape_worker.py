@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from prometheus_client import start_http_server
+
+from scraper.brokers import get_broker
+from scraper.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run queued scrape jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Number of jobs to run at the same time.",
+        )
+        parser.add_argument(
+            "--broker",
+            default=None,
+            help="Dotted path to the broker class, defaults to SCRAPER_BROKER.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of polling for new jobs.",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=None,
+            help="Serve Prometheus metrics of this worker on the given port.",
+        )
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            start_http_server(options["metrics_port"])
+        broker = get_broker(options["broker"])
+        processed = run_worker(
+            broker=broker,
+            concurrency=options["concurrency"],
+            once=options["once"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs"))
@@ -0,0 +1,88 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+FETCH_SECONDS = Histogram(
+    "scraper_fetch_seconds",
+    "Time spent waiting for the HTTP response of a page.",
+)
+PARSE_SECONDS = Histogram(
+    "scraper_parse_seconds",
+    "Time spent extracting the title and links of a page.",
+)
+DB_SECONDS = Histogram(
+    "scraper_db_seconds",
+    "Time spent writing a scraped page and its links.",
+    ["operation"],
+)
+RESPONSES = Counter(
+    "scraper_responses_total",
+    "Responses received, by HTTP status code (500 for connection errors).",
+    ["status"],
+)
+LINKS_EXTRACTED = Counter(
+    "scraper_links_extracted_total",
+    "Links extracted from scraped pages.",
+)
+DUPLICATE_LINKS = Counter(
+    "scraper_duplicate_links_total",
+    "Links dropped because the page already had the same URL.",
+)
+INTEGRITY_ERRORS = Counter(
+    "scraper_integrity_errors_total",
+    "IntegrityErrors raised while saving scraped data.",
+    ["operation"],
+)
+JOBS = Counter(
+    "scraper_jobs_total",
+    "Scrape jobs finished, by final status.",
+    ["status"],
+)
+JOB_SECONDS = Histogram(
+    "scraper_job_seconds",
+    "Time from a scrape job starting to finishing.",
+)
+TRUNCATED_BODIES = Counter(
+    "scraper_truncated_bodies_total",
+    "Responses cut off after SCRAPER_MAX_BODY_SIZE bytes.",
+)
+RETRIES = Counter(
+    "scraper_fetch_retries_total",
+    "Requests retried after a connection error, timeout, 429 or 5xx.",
+)
+CIRCUIT_OPEN = Counter(
+    "scraper_circuit_open_total",
+    "Requests failed fast because the host's circuit breaker was open.",
+)
+CACHE_REQUESTS = Counter(
+    "scraper_cache_requests_total",
+    "Response cache lookups, by result (hit or miss).",
+    ["result"],
+)
+CACHE_EVICTIONS = Counter(
+    "scraper_cache_evictions_total",
+    "Responses evicted from the cache, expired or least recently used.",
+)
+
+
+def observe_parse(seconds: float, links: int) -> None:
+    """Record one parsed page, wherever it was parsed."""
+    PARSE_SECONDS.observe(seconds)
+    LINKS_EXTRACTED.inc(links)
+
+
+def render() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
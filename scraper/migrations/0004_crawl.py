@@ -0,0 +1,113 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0003_scrapejob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Crawl",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("max_depth", models.PositiveSmallIntegerField(default=2)),
+                (
+                    "allowed_domains",
+                    models.TextField(
+                        blank=True,
+                        help_text="One host per line, defaults to the seed host.",
+                    ),
+                ),
+                (
+                    "rate_limit",
+                    models.FloatField(
+                        default=1.0,
+                        help_text="Minimum seconds between requests to the same host.",
+                    ),
+                ),
+                ("respect_robots", models.BooleanField(default=True)),
+                ("seen", models.BinaryField(blank=True, default=b"")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("running", "Running"), ("done", "Done")],
+                        default="running",
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "seed",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="scraper.page"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FrontierUrl",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField()),
+                ("depth", models.PositiveSmallIntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                            ("skipped", "Skipped"),
+                        ],
+                        default="queued",
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "crawl",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="scraper.crawl"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["crawl", "status", "id"],
+                        name="scraper_fro_crawl_i_077190_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0004_crawl"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="etag",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="last_modified",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="scraped_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_links(apps, schema_editor):
+    Page = apps.get_model("scraper", "Page")
+    Link = apps.get_model("scraper", "Link")
+    counts = (
+        Link.objects.filter(page=OuterRef("pk"))
+        .order_by()
+        .values("page")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Page.objects.update(link_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0005_page_validators"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="link_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(count_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0006_page_link_count"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["page", "id"], name="scraper_lin_page_id_dc9d83_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["page", "name"], name="scraper_lin_page_id_d79695_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["page", "url"], name="scraper_lin_page_id_40b058_idx"
+            ),
+        ),
+    ]
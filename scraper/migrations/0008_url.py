@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0007_link_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Url",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=32, unique=True)),
+                ("url", models.TextField()),
+                ("host", models.CharField(db_index=True, max_length=255)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="target",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="scraper.url",
+            ),
+        ),
+        migrations.AddField(
+            model_name="link",
+            name="target",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="scraper.url",
+            ),
+        ),
+    ]
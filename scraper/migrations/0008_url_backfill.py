@@ -0,0 +1,82 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+from scraper.urlnorm import canonicalize, url_host, url_key
+
+BATCH_SIZE = 1000
+
+
+def resolve(Url, urls):
+    keys = {}
+    for url in urls:
+        canonical = canonicalize(url)
+        keys[url] = (url_key(canonical), canonical)
+    Url.objects.bulk_create(
+        [
+            Url(key=key, url=canonical, host=url_host(canonical))
+            for key, canonical in set(keys.values())
+        ],
+        ignore_conflicts=True,
+    )
+    ids = dict(
+        Url.objects.filter(key__in=[key for key, _ in keys.values()]).values_list(
+            "key", "id"
+        )
+    )
+    return {url: ids[key] for url, (key, _) in keys.items()}
+
+
+def forwards(apps, schema_editor):
+    Url = apps.get_model("scraper", "Url")
+    Page = apps.get_model("scraper", "Page")
+    Link = apps.get_model("scraper", "Link")
+
+    last_id = 0
+    while pages := list(
+        Page.objects.filter(id__gt=last_id).order_by("id")[:BATCH_SIZE]
+    ):
+        last_id = pages[-1].id
+        ids = resolve(Url, [page.url for page in pages])
+        for page in pages:
+            page.target_id = ids[page.url]
+        Page.objects.bulk_update(pages, ["target"])
+
+    last_id = 0
+    while links := list(
+        Link.objects.filter(id__gt=last_id).order_by("id")[:BATCH_SIZE]
+    ):
+        last_id = links[-1].id
+        ids = resolve(Url, [link.url for link in links])
+        for link in links:
+            link.target_id = ids[link.url]
+        Link.objects.bulk_update(links, ["target"])
+
+    # Links that only differed by a fragment, port or parameter order now
+    # point to the same Url, keep the first one of each page.
+    duplicates = (
+        Link.objects.values("page_id", "target_id")
+        .annotate(total=Count("id"), keep=Min("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        Link.objects.filter(page_id=row["page_id"], target_id=row["target_id"]).exclude(
+            id=row["keep"]
+        ).delete()
+        Page.objects.filter(id=row["page_id"]).update(
+            link_count=models.F("link_count") - (row["total"] - 1)
+        )
+
+
+class Migration(migrations.Migration):
+    # Data only, PostgreSQL refuses to alter a table with pending deferred
+    # constraint checks from rows changed in the same transaction.
+
+    dependencies = [
+        ("scraper", "0008_url"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
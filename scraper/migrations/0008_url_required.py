@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0008_url_backfill"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="link",
+            unique_together={("page", "target")},
+        ),
+        migrations.RemoveIndex(
+            model_name="link",
+            name="scraper_lin_page_id_40b058_idx",
+        ),
+        migrations.RemoveField(
+            model_name="link",
+            name="url",
+        ),
+        migrations.AlterField(
+            model_name="link",
+            name="target",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, to="scraper.url"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0008_url_required"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapejob",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scrapejob",
+            name="lease_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="scrapejob",
+            name="worker",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
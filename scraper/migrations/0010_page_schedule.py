@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:59
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce, Now
+
+
+def forwards(apps, schema_editor):
+    Page = apps.get_model("scraper", "Page")
+    Page.objects.update(
+        next_crawl_at=Coalesce(F("scraped_at"), Now())
+        + timedelta(seconds=settings.SCRAPER_RECRAWL_INTERVAL)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0009_scrapejob_lease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="crawl_interval",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Seconds between re-scrapes, adapted to how often the links change.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="next_crawl_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="priority",
+            field=models.SmallIntegerField(
+                default=0,
+                help_text="Each point above 0 halves the re-scrape interval, below 0 doubles it.",
+            ),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0011_link_change"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="checked_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="url",
+            name="final_url",
+            field=models.TextField(blank=True, help_text="Where the URL redirects to."),
+        ),
+        migrations.AddField(
+            model_name="url",
+            name="status_code",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Of the last link check, empty if unreachable.",
+                null=True,
+            ),
+        ),
+    ]
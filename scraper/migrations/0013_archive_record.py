@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0012_url_check"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchiveRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(db_index=True, max_length=32)),
+                ("filename", models.CharField(max_length=255)),
+                ("offset", models.BigIntegerField()),
+                ("length", models.PositiveIntegerField()),
+                ("status_code", models.PositiveSmallIntegerField()),
+                ("fetched_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="archiverecord",
+            constraint=models.UniqueConstraint(
+                fields=("filename", "offset"), name="unique_archive_record"
+            ),
+        ),
+    ]
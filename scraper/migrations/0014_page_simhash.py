@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0013_archive_record"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="page",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="A stored page with nearly the same text and links.",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="scraper.page",
+            ),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="simhash",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="simhash_band0",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="simhash_band1",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="simhash_band2",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="page",
+            name="simhash_band3",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from scraper import search
+
+
+def forwards(apps, schema_editor):
+    search.install(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    search.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0014_page_simhash"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0015_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="page",
+            name="scraped_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="page",
+            index=models.Index(
+                fields=["created_by", "id"], name="scraper_pag_created_029780_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="page",
+            index=models.Index(
+                fields=["created_by", "scraped_at"],
+                name="scraper_pag_created_72cc13_idx",
+            ),
+        ),
+    ]
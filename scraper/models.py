@@ -1,22 +1,218 @@
 from django.db import models
 
 
+class Url(models.Model):
+    """A canonical URL, stored once however many pages link to it."""
+
+    key = models.CharField(max_length=32, unique=True)
+    url = models.TextField()
+    host = models.CharField(max_length=255, db_index=True)
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text="Of the last link check, empty if unreachable."
+    )
+    final_url = models.TextField(blank=True, help_text="Where the URL redirects to.")
+    checked_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return self.url
+
+
 class Page(models.Model):
     url = models.URLField(unique=True)
+    target = models.ForeignKey(Url, null=True, blank=True, on_delete=models.SET_NULL)
     name = models.CharField(max_length=126)
     created_by = models.ForeignKey("auth.User", on_delete=models.CASCADE)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    scraped_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    link_count = models.PositiveIntegerField(default=0, db_index=True)
+    next_crawl_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    crawl_interval = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Seconds between re-scrapes, adapted to how often the links change.",
+    )
+    priority = models.SmallIntegerField(
+        default=0,
+        help_text="Each point above 0 halves the re-scrape interval, below 0 doubles it.",
+    )
+    simhash = models.BigIntegerField(null=True, blank=True)
+    # The 16-bit bands of `simhash`, to look up near-duplicates by index.
+    simhash_band0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    simhash_band1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    simhash_band2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    simhash_band3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    duplicate_of = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+        help_text="A stored page with nearly the same text and links.",
+    )
+
+    class Meta:
+        indexes = [
+            # The API's ETags, latest page and scrape of a user.
+            models.Index(fields=["created_by", "id"]),
+            models.Index(fields=["created_by", "scraped_at"]),
+        ]
 
     def __str__(self):
         return self.name or "-"
 
+    def update_link_count(self):
+        self.link_count = self.link_set.count()
+        Page.objects.filter(pk=self.pk).update(link_count=self.link_count)
+
 
 class Link(models.Model):
-    url = models.URLField()
+    target = models.ForeignKey(Url, on_delete=models.PROTECT)
     name = models.CharField(max_length=126)
     page = models.ForeignKey(Page, on_delete=models.CASCADE)
 
     class Meta:
-        unique_together = ("url", "page")
+        unique_together = ("page", "target")
+        indexes = [
+            # Keyset pagination and prefix search within a page.
+            models.Index(fields=["page", "id"]),
+            models.Index(fields=["page", "name"]),
+        ]
 
     def __str__(self):
         return self.name or "-"
+
+    @property
+    def url(self):
+        return self.target.url
+
+
+class LinkChange(models.Model):
+    """Append-only log of links added to and removed from pages.
+
+    Ids are the sequence numbers of the feed, see `services.lock_change_log`.
+    Entries outlive their page, there is no foreign key constraint on it.
+    """
+
+    class Kind(models.TextChoices):
+        ADDED = "added", "Added"
+        REMOVED = "removed", "Removed"
+
+    page = models.ForeignKey(Page, on_delete=models.DO_NOTHING, db_constraint=False)
+    target = models.ForeignKey(Url, on_delete=models.PROTECT)
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.kind} {self.target_id} on {self.page_id}"
+
+
+class FeedCursor(models.Model):
+    """How far a consumer, e.g. the RabbitMQ publisher, got in the change log."""
+
+    name = models.CharField(max_length=64, unique=True)
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
+
+
+class ArchiveRecord(models.Model):
+    """Where a fetched response is in the WARC archives, see `scraper.warc`.
+
+    `key` is the `Url.key` of the fetched URL, the same as its page's target.
+    """
+
+    key = models.CharField(max_length=32, db_index=True)
+    filename = models.CharField(max_length=255)
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()
+    status_code = models.PositiveSmallIntegerField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["filename", "offset"], name="unique_archive_record"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.filename}@{self.offset}"
+
+
+class ScrapeJob(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    url = models.URLField()
+    created_by = models.ForeignKey("auth.User", on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-id",)
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def __str__(self):
+        return f"{self.url} ({self.status})"
+
+
+class Crawl(models.Model):
+    class Status(models.TextChoices):
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+
+    seed = models.ForeignKey(Page, on_delete=models.CASCADE)
+    created_by = models.ForeignKey("auth.User", on_delete=models.CASCADE)
+    max_depth = models.PositiveSmallIntegerField(default=2)
+    allowed_domains = models.TextField(
+        blank=True, help_text="One host per line, defaults to the seed host."
+    )
+    rate_limit = models.FloatField(
+        default=1.0, help_text="Minimum seconds between requests to the same host."
+    )
+    respect_robots = models.BooleanField(default=True)
+    seen = models.BinaryField(blank=True, default=b"")
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.RUNNING
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Crawl {self.pk} from {self.seed.url}"
+
+
+class FrontierUrl(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+        SKIPPED = "skipped", "Skipped"
+
+    crawl = models.ForeignKey(Crawl, on_delete=models.CASCADE)
+    url = models.URLField()
+    depth = models.PositiveSmallIntegerField()
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["crawl", "status", "id"])]
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,68 @@
+from django.db.models import QuerySet
+
+# Upper bound for prefix ranges, sorts after any character a prefix is
+# followed by, so `prefix <= value < prefix + PREFIX_END` is a prefix match.
+PREFIX_END = "\U0010ffff"
+
+
+def prefix_filter(field: str, prefix: str) -> dict:
+    """Filter kwargs for an index-friendly, case-sensitive prefix match.
+
+    Unlike `startswith`, a plain range comparison can use a B-tree index on
+    every database backend.
+    """
+    return {f"{field}__gte": prefix, f"{field}__lt": prefix + PREFIX_END}
+
+
+class KeysetPage:
+    """One page of a queryset paginated by primary key.
+
+    Each page costs a single `LIMIT per_page + 1` query on an index, no
+    COUNT and no OFFSET, so deep pages are as fast as the first one.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int = 10,
+        after: int | None = None,
+        before: int | None = None,
+    ):
+        if before is not None:
+            items = list(queryset.filter(pk__lt=before).order_by("-pk")[: per_page + 1])
+            self.has_previous = len(items) > per_page
+            self.has_next = True
+            self.object_list = items[:per_page][::-1]
+        else:
+            if after is not None:
+                queryset = queryset.filter(pk__gt=after)
+            items = list(queryset.order_by("pk")[: per_page + 1])
+            self.has_previous = after is not None
+            self.has_next = len(items) > per_page
+            self.object_list = items[:per_page]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self) -> bool:
+        return self.has_previous or self.has_next
+
+    @property
+    def next_cursor(self) -> int | None:
+        return self.object_list[-1].pk if self.has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self) -> int | None:
+        if self.has_previous and self.object_list:
+            return self.object_list[0].pk
+        return None
+
+
+def parse_cursor(value: str | None) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,268 @@
+import codecs
+import logging
+import re
+from collections.abc import Iterable, Iterator
+from email.message import Message
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import charset_normalizer
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from scraper import metrics
+
+logger = logging.getLogger(__name__)
+
+Link = tuple[str, str]
+
+# Encoding detection only looks at the start of the body.
+PREFIX_SIZE = 64 * 1024
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w.:-]+)""", re.I)
+
+
+class BaseLinkParser:
+    """Extracts the title and `(url, text)` pairs of `<a href>` elements.
+
+    Input is fed in chunks; `feed` and `close` return the links completed so
+    far. `title` is final once `close` has been called.
+    """
+
+    streaming = False
+    # Set once the parser has everything it needs, the rest of the input is
+    # then not read at all.
+    done = False
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.title = ""
+
+    def feed(self, chunk: str) -> list[Link]:
+        raise NotImplementedError
+
+    def close(self) -> list[Link]:
+        raise NotImplementedError
+
+    def iter_links(self, chunks: Iterable[str]) -> Iterator[Link]:
+        for chunk in chunks:
+            yield from self.feed(chunk)
+            if self.done:
+                break
+        yield from self.close()
+
+    def make_link(self, href: str, text: str) -> Link | None:
+        text = text.strip()
+        if not text:
+            return None
+        return urljoin(self.base_url, href), text[:126]
+
+
+class SoupLinkParser(BaseLinkParser):
+    """Builds a full BeautifulSoup tree once all the input has been fed."""
+
+    def __init__(self, base_url: str):
+        super().__init__(base_url)
+        self.chunks = []
+
+    def feed(self, chunk: str) -> list[Link]:
+        self.chunks.append(chunk)
+        return []
+
+    def close(self) -> list[Link]:
+        soup = BeautifulSoup("".join(self.chunks), "html.parser")
+        self.chunks = []
+        # str() so the title does not keep a reference to the whole tree.
+        self.title = str(soup.title.string) if soup.title and soup.title.string else ""
+        links = []
+        for anchor in soup.find_all("a", href=True):
+            link = self.make_link(anchor["href"], anchor.text)
+            if link:
+                links.append(link)
+        return links
+
+
+class StreamingLinkParser(BaseLinkParser):
+    """Incremental extractor on top of `html.parser`, no document tree is kept.
+
+    Memory use is bounded by the unparsed remainder of the current chunk and
+    the text of the anchors still open.
+    """
+
+    streaming = True
+
+    def __init__(self, base_url: str):
+        super().__init__(base_url)
+        self.parser = _AnchorParser(self)
+        self.completed = []
+
+    def feed(self, chunk: str) -> list[Link]:
+        self.parser.feed(chunk)
+        return self._drain()
+
+    def close(self) -> list[Link]:
+        self.parser.close()
+        # Anchors never closed run until the end of the document.
+        while self.parser.anchors:
+            self.parser.end_anchor()
+        return self._drain()
+
+    def _drain(self) -> list[Link]:
+        completed, self.completed = self.completed, []
+        return completed
+
+
+class TitleParser(StreamingLinkParser):
+    """Title-only mode: no links, done as soon as the title or the body is seen."""
+
+    def make_link(self, href: str, text: str) -> Link | None:
+        return None
+
+    @property
+    def done(self) -> bool:
+        return self.parser.body_started or (
+            self.parser.title_parts is not None and not self.parser.in_title
+        )
+
+
+class _AnchorParser(HTMLParser):
+    def __init__(self, owner: StreamingLinkParser):
+        super().__init__(convert_charrefs=True)
+        self.owner = owner
+        self.anchors = []
+        # None until a <title> is found, then its text parts.
+        self.title_parts = None
+        self.in_title = False
+        self.title_has_children = False
+        self.body_started = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.in_title:
+            self.title_has_children = True
+        if tag == "body":
+            self.body_started = True
+        elif tag == "a":
+            attrs = dict(attrs)
+            if "href" in attrs:
+                self.anchors.append((attrs["href"] or "", []))
+        elif tag == "title" and self.title_parts is None:
+            self.title_parts = []
+            self.in_title = True
+
+    def handle_startendtag(self, tag, attrs):
+        if self.in_title:
+            self.title_has_children = True
+        if tag == "title" and self.title_parts is None:
+            self.title_parts = []
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self.anchors:
+            self.end_anchor()
+        elif tag == "title" and self.in_title:
+            self.in_title = False
+            if not self.title_has_children:
+                self.owner.title = "".join(self.title_parts)
+        elif self.in_title:
+            self.title_has_children = True
+
+    def handle_data(self, data):
+        for _, parts in self.anchors:
+            parts.append(data)
+        if self.in_title:
+            self.title_parts.append(data)
+
+    def end_anchor(self):
+        href, parts = self.anchors.pop()
+        link = self.owner.make_link(href, "".join(parts))
+        if link:
+            self.owner.completed.append(link)
+
+
+def get_parser(base_url: str) -> BaseLinkParser:
+    return import_string(settings.SCRAPER_PARSER)(base_url)
+
+
+def detect_encoding(content_type: str, prefix: bytes) -> str:
+    """Encoding of a body from its BOM, the Content-Type charset, a `<meta>`
+    charset or, failing those, the bytes in `prefix`.
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+
+    header = Message()
+    header["Content-Type"] = content_type or ""
+    candidates = [header.get_param("charset")]
+    if match := META_CHARSET.search(prefix[:4096]):
+        candidates.append(match.group(1).decode("ascii"))
+    for candidate in candidates:
+        if isinstance(candidate, str):
+            try:
+                return codecs.lookup(candidate.strip()).name
+            except LookupError:
+                pass
+
+    try:
+        # Only the tail may be cut in the middle of a character.
+        codecs.getincrementaldecoder("utf-8")().decode(prefix)
+        return "utf-8"
+    except UnicodeDecodeError:
+        best = charset_normalizer.from_bytes(prefix).best()
+        return best.encoding if best else "utf-8"
+
+
+def iter_bytes(
+    response, chunk_size: int = 64 * 1024, max_bytes: int | None = None
+) -> Iterator[bytes]:
+    """Read a streamed `requests` response, stopping after `max_bytes`."""
+    max_bytes = max_bytes or settings.SCRAPER_MAX_BODY_SIZE
+    received = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        received += len(chunk)
+        if received > max_bytes:
+            if chunk := chunk[: len(chunk) - (received - max_bytes)]:
+                yield chunk
+            logger.warning(f"Stopped reading {response.url} after {max_bytes} bytes")
+            metrics.TRUNCATED_BODIES.inc()
+            response.close()
+            return
+        yield chunk
+
+
+def read_body(response, max_bytes: int | None = None) -> bytes:
+    return b"".join(iter_bytes(response, max_bytes=max_bytes))
+
+
+def iter_text(
+    response,
+    chunk_size: int = PREFIX_SIZE,
+    max_bytes: int | None = None,
+    digest=None,
+) -> Iterator[str]:
+    """Decode a streamed `requests` response incrementally.
+
+    The encoding is detected on the first chunk only and at most `max_bytes`
+    (default `SCRAPER_MAX_BODY_SIZE`) are read. The bytes read are fed to
+    `digest`, a `hashlib` object, when given.
+    """
+    decoder = None
+    for chunk in iter_bytes(response, chunk_size, max_bytes):
+        if digest is not None:
+            digest.update(chunk)
+        if decoder is None:
+            encoding = detect_encoding(response.headers.get("Content-Type", ""), chunk)
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    if decoder is not None:
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
@@ -0,0 +1,63 @@
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from scraper import metrics
+
+# Kept free of model imports so worker processes start without Django setup.
+
+ParseResult = tuple[str, str, list[tuple[str, str]]]
+
+
+def parse_body(
+    parser_path: str, url: str, body: bytes, encoding: str | None
+) -> tuple[str, str, list[tuple[str, str]], float]:
+    """Decode and parse one page, run inside a worker process.
+
+    Bodies cross the process boundary as bytes, decoding happens here so the
+    parent never pays for it. The parse time is returned so the parent
+    process can record it.
+    """
+    start = time.perf_counter()
+    parser = import_string(parser_path)(url)
+    text = body.decode(encoding or "utf-8", errors="replace")
+    links = list(parser.iter_links([text]))
+    return url, parser.title, links, time.perf_counter() - start
+
+
+def _result(future) -> ParseResult:
+    url, title, links, seconds = future.result()
+    metrics.observe_parse(seconds, len(links))
+    return url, title, links
+
+
+def parse_many(
+    items: Iterable[tuple[str, bytes, str | None]],
+    workers: int | None = None,
+    parser_path: str | None = None,
+) -> Iterator[ParseResult]:
+    """Parse `(url, body, encoding)` items in a process pool.
+
+    Results are yielded as soon as they are ready, in completion order. At most
+    `2 * workers` bodies are in flight so a fast producer can't fill memory.
+    """
+    workers = workers or settings.SCRAPER_PARSE_WORKERS or os.cpu_count()
+    parser_path = parser_path or settings.SCRAPER_PARSER
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for url, body, encoding in items:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _result(future)
+            pending.add(executor.submit(parse_body, parser_path, url, body, encoding))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield _result(future)
@@ -0,0 +1,69 @@
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from scraper.models import Page
+from scraper.services import SCHEDULE_FIELDS, apply_rescrape, conditional_get
+
+
+def claim_due_pages(limit: int, now: datetime | None = None) -> list[Page]:
+    """Lease up to `limit` due pages, most overdue first.
+
+    Reads only the due end of the `next_crawl_at` index. Claimed pages are
+    pushed `SCRAPER_WORKER_LEASE` seconds ahead so other schedulers skip them;
+    if this one dies before rescheduling them they become due again.
+    """
+    now = now or timezone.now()
+    due = Page.objects.filter(next_crawl_at__lte=now).order_by("next_crawl_at")
+    with transaction.atomic():
+        pages = list(due.select_for_update(skip_locked=True)[:limit])
+        Page.objects.filter(pk__in=[page.pk for page in pages]).update(
+            next_crawl_at=now + timedelta(seconds=settings.SCRAPER_WORKER_LEASE)
+        )
+    return pages
+
+
+def run_scheduler(
+    rate: float | None = None,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+    poll_interval: float | None = None,
+    once: bool = False,
+) -> Iterator[tuple[Page, str, int]]:
+    """Re-scrape due pages, at most `rate` pages per second.
+
+    Yields a `(page, message, status)` summary for every page. With
+    `once=True` it stops when no page is due instead of polling.
+    """
+    rate = rate or settings.SCRAPER_RECRAWL_RATE
+    batch_size = batch_size or settings.SCRAPER_RECRAWL_BATCH_SIZE
+    concurrency = concurrency or settings.SCRAPER_FETCH_CONCURRENCY
+    if poll_interval is None:
+        poll_interval = settings.SCRAPER_WORKER_POLL_INTERVAL
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            close_old_connections()
+            started = time.monotonic()
+            pages = claim_due_pages(batch_size)
+            if not pages:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            responses = executor.map(conditional_get, pages)
+            for page, response in zip(pages, responses):
+                message, status = apply_rescrape(page, response)
+                yield page, message, status
+            # Changed pages are saved by apply_rescrape, this covers the rest.
+            Page.objects.bulk_update(pages, SCHEDULE_FIELDS)
+
+            delay = len(pages) / rate - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
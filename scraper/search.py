@@ -0,0 +1,196 @@
+"""Full-text search over page and link names and URLs.
+
+SQLite keeps contentless FTS5 tables, updated by triggers on every insert,
+update and delete of pages and links. PostgreSQL uses GIN indexes on
+`to_tsvector` expressions, which it maintains itself. Either way the index
+follows the bulk insert paths row by row, in the same transaction.
+
+A query matches when all its words, each as a prefix, are in the name or
+all of them are in the URL.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+
+WORD = re.compile(r"\w+")
+# URLs split into words on anything but letters and digits, like FTS5 does.
+URL_WORDS = "regexp_replace({}, '[^[:alnum:]]+', ' ', 'g')"
+PG_CONFIG = "simple"
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS scraper_page_fts "
+    "USING fts5(name, url, content='')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS scraper_link_fts "
+    "USING fts5(name, url, content='')",
+    # Contentless tables only delete rows given the values they indexed.
+    "CREATE TRIGGER IF NOT EXISTS scraper_page_fts_insert "
+    "AFTER INSERT ON scraper_page BEGIN "
+    "INSERT INTO scraper_page_fts (rowid, name, url) "
+    "VALUES (new.id, new.name, new.url); END",
+    "CREATE TRIGGER IF NOT EXISTS scraper_page_fts_update "
+    "AFTER UPDATE OF name, url ON scraper_page BEGIN "
+    "INSERT INTO scraper_page_fts (scraper_page_fts, rowid, name, url) "
+    "VALUES ('delete', old.id, old.name, old.url); "
+    "INSERT INTO scraper_page_fts (rowid, name, url) "
+    "VALUES (new.id, new.name, new.url); END",
+    "CREATE TRIGGER IF NOT EXISTS scraper_page_fts_delete "
+    "AFTER DELETE ON scraper_page BEGIN "
+    "INSERT INTO scraper_page_fts (scraper_page_fts, rowid, name, url) "
+    "VALUES ('delete', old.id, old.name, old.url); END",
+    "CREATE TRIGGER IF NOT EXISTS scraper_link_fts_insert "
+    "AFTER INSERT ON scraper_link BEGIN "
+    "INSERT INTO scraper_link_fts (rowid, name, url) VALUES (new.id, new.name, "
+    "(SELECT url FROM scraper_url WHERE id = new.target_id)); END",
+    "CREATE TRIGGER IF NOT EXISTS scraper_link_fts_update "
+    "AFTER UPDATE OF name, target_id ON scraper_link BEGIN "
+    "INSERT INTO scraper_link_fts (scraper_link_fts, rowid, name, url) "
+    "VALUES ('delete', old.id, old.name, "
+    "(SELECT url FROM scraper_url WHERE id = old.target_id)); "
+    "INSERT INTO scraper_link_fts (rowid, name, url) VALUES (new.id, new.name, "
+    "(SELECT url FROM scraper_url WHERE id = new.target_id)); END",
+    "CREATE TRIGGER IF NOT EXISTS scraper_link_fts_delete "
+    "AFTER DELETE ON scraper_link BEGIN "
+    "INSERT INTO scraper_link_fts (scraper_link_fts, rowid, name, url) "
+    "VALUES ('delete', old.id, old.name, "
+    "(SELECT url FROM scraper_url WHERE id = old.target_id)); END",
+]
+SQLITE_BACKFILL = [
+    "INSERT INTO scraper_page_fts (rowid, name, url) "
+    "SELECT id, name, url FROM scraper_page",
+    "INSERT INTO scraper_link_fts (rowid, name, url) "
+    "SELECT scraper_link.id, scraper_link.name, scraper_url.url "
+    "FROM scraper_link JOIN scraper_url ON scraper_url.id = scraper_link.target_id",
+]
+SQLITE_UNINSTALL = [
+    "DROP TABLE IF EXISTS scraper_page_fts",
+    "DROP TABLE IF EXISTS scraper_link_fts",
+    *(
+        f"DROP TRIGGER IF EXISTS scraper_{table}_fts_{event}"
+        for table in ("page", "link")
+        for event in ("insert", "update", "delete")
+    ),
+]
+
+
+def pg_vector(column: str, url: bool = False) -> str:
+    return f"to_tsvector('{PG_CONFIG}', {URL_WORDS.format(column) if url else column})"
+
+
+PG_INDEXES = {
+    "scraper_page_name_search": ("scraper_page", pg_vector("name")),
+    "scraper_page_url_search": ("scraper_page", pg_vector("url", url=True)),
+    "scraper_link_name_search": ("scraper_link", pg_vector("name")),
+    "scraper_url_url_search": ("scraper_url", pg_vector("url", url=True)),
+}
+
+
+def install(schema_editor) -> None:
+    """Create the search index, filling it from the stored rows."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'scraper_page_fts'"
+            )
+            installed = cursor.fetchone()
+        for sql in SQLITE_INSTALL if installed else SQLITE_INSTALL + SQLITE_BACKFILL:
+            schema_editor.execute(sql)
+    elif vendor == "postgresql":
+        for name, (table, expression) in PG_INDEXES.items():
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING GIN ({expression})"
+            )
+
+
+def uninstall(schema_editor) -> None:
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for sql in SQLITE_UNINSTALL:
+            schema_editor.execute(sql)
+    elif vendor == "postgresql":
+        for name in PG_INDEXES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def query_words(query: str) -> list[str]:
+    return WORD.findall(query.lower())
+
+
+def fts5_query(words: list[str]) -> str:
+    terms = " AND ".join(f'"{word}"*' for word in words)
+    return f"name : ({terms}) OR url : ({terms})"
+
+
+def pg_query(words: list[str]) -> str:
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def _matches_sql(table: str, param: str) -> tuple[str, list[str]]:
+    """SQL selecting `id, rank` of the rows of `table` matching `param`."""
+    if connection.vendor == "sqlite":
+        sql = f"SELECT rowid AS id, rank FROM {table}_fts WHERE {table}_fts MATCH %s"
+        return sql, [param]
+    query = f"to_tsquery('{PG_CONFIG}', %s)"
+    if table == "scraper_page":
+        name, url = pg_vector("name"), pg_vector("url", url=True)
+        sql = (
+            f"SELECT id, -ts_rank({name} || {url}, query) AS rank "
+            f"FROM scraper_page, {query} query "
+            f"WHERE {name} @@ query OR {url} @@ query"
+        )
+        return sql, [param]
+    # Name and URL live in two tables: an OR across them cannot use both GIN
+    # indexes, a union of one index-backed select per table can.
+    name, url = pg_vector("scraper_link.name"), pg_vector("scraper_url.url", url=True)
+    sql = (
+        f"SELECT scraper_link.id, -ts_rank({name} || {url}, query) AS rank "
+        f"FROM (SELECT scraper_link.id FROM scraper_link, {query} query "
+        f"WHERE {name} @@ query "
+        f"UNION SELECT scraper_link.id FROM scraper_url "
+        f"JOIN scraper_link ON scraper_link.target_id = scraper_url.id, "
+        f"{query} query WHERE {url} @@ query) matched "
+        f"JOIN scraper_link ON scraper_link.id = matched.id "
+        f"JOIN scraper_url ON scraper_url.id = scraper_link.target_id, {query} query"
+    )
+    return sql, [param] * 3
+
+
+def _param(query: str) -> str | None:
+    words = query_words(query)
+    if not words:
+        return None
+    return fts5_query(words) if connection.vendor == "sqlite" else pg_query(words)
+
+
+def search_filter(queryset: QuerySet, query: str) -> QuerySet:
+    """Pages or links of `queryset` matching `query`, in no particular order."""
+    param = _param(query)
+    if param is None:
+        return queryset.none()
+    matches, params = _matches_sql(queryset.model._meta.db_table, param)
+    return queryset.filter(pk__in=RawSQL(f"SELECT id FROM ({matches}) matches", params))
+
+
+def search(queryset: QuerySet, query: str, limit: int = 100) -> list:
+    """The `limit` pages or links of `queryset` best matching `query`, best first.
+
+    Ranking reads the index only, the matching rows are then loaded in one
+    query.
+    """
+    param = _param(query)
+    if param is None:
+        return []
+    matches, params = _matches_sql(queryset.model._meta.db_table, param)
+    visible, visible_params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT matches.id FROM ({matches}) matches "
+            f"WHERE matches.id IN ({visible}) ORDER BY matches.rank LIMIT %s",
+            [*params, *visible_params, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
@@ -1,70 +1,586 @@
+import hashlib
+import io
 import logging
-from urllib.parse import urljoin
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from itertools import islice
 
 import requests
-from bs4 import BeautifulSoup
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
 
-from scraper.models import Link, Page
+from scraper import metrics
+from scraper.cache import cached_get
+from scraper.client import FetchClient, get_client
+from scraper.models import Link, LinkChange, Page, Url
+from scraper.parsers import (
+    PREFIX_SIZE,
+    TitleParser,
+    detect_encoding,
+    get_parser,
+    iter_text,
+    read_body,
+)
+from scraper.simhash import FINGERPRINT_FIELDS, SimHash, match_duplicate
+from scraper.urlnorm import canonicalize, url_host, url_key
+from scraper.warc import archive_response
 
 logger = logging.getLogger(__name__)
 
+SCHEDULE_FIELDS = ["next_crawl_at", "crawl_interval"]
+# Arbitrary, unique within the database.
+CHANGE_LOG_LOCK = 0x5C12A9E1
 
-def get_links(url: str, timeout: int = 5) -> tuple[str, int, list[tuple[str, str]]]:
+
+def fetch(
+    url: str,
+    timeout: float | None = None,
+    stream: bool = False,
+    client: FetchClient | None = None,
+) -> tuple[requests.Response | None, int, str]:
+    """GET `url`, returning the response (None on error), its status and the error.
+
+    Responses whose Content-Type is not in `SCRAPER_ALLOWED_CONTENT_TYPES`
+    are refused with 415 before their body is read.
+    """
+    timeout = timeout or settings.SCRAPER_FETCH_TIMEOUT
+    client = client or get_client()
     response = None
     try:
-        response = requests.get(url, timeout=timeout)
+        with metrics.FETCH_SECONDS.time():
+            response = cached_get(
+                url,
+                lambda: client.get(url, timeout=timeout, stream=stream),
+                stream,
+                accept=lambda response: allowed_content_type(
+                    response.headers.get("Content-Type", "")
+                ),
+            )
         response.raise_for_status()
     except requests.RequestException as e:
         logger.error(f"Error fetching {url}: {e}")
-        status = response.status_code if response else 500
-        return f"{e}", status, []
-
-    soup = BeautifulSoup(response.text, "html.parser")
-    name = soup.title.string if soup.title and soup.title.string else ""
-    links = soup.find_all("a", href=True)
-    return (
-        name,
-        response.status_code,
-        [
-            (urljoin(url, link["href"]), link.text.strip()[:126])
-            for link in links
-            if link.text and link.text.strip()
-        ],
+        status = response.status_code if response is not None else 500
+        metrics.RESPONSES.labels(status).inc()
+        if response is not None:
+            response.close()
+        return None, status, f"{e}"
+
+    metrics.RESPONSES.labels(response.status_code).inc()
+    content_type = response.headers.get("Content-Type", "")
+    if not allowed_content_type(content_type):
+        response.close()
+        logger.info(f"Skipping {url}: unsupported content type {content_type}")
+        return None, 415, f"Unsupported content type {content_type}"
+    try:
+        archive_response(response)
+    except requests.RequestException as e:
+        response.close()
+        logger.error(f"Error fetching {url}: {e}")
+        return None, 500, f"{e}"
+    return response, response.status_code, ""
+
+
+def allowed_content_type(content_type: str) -> bool:
+    # Servers that send no Content-Type at all get the benefit of the doubt.
+    media_type = content_type.split(";")[0].strip().lower()
+    return not media_type or media_type in settings.SCRAPER_ALLOWED_CONTENT_TYPES
+
+
+def get_links(
+    url: str,
+    timeout: float | None = None,
+    client: FetchClient | None = None,
+    validators: dict | None = None,
+) -> tuple[str, int, list[tuple[str, str]]]:
+    """Fetch and parse `url`.
+
+    When given, `validators` is filled with the `Page` fields that let the
+    first re-scrape be conditional: `etag`, `last_modified`, `content_hash`.
+    """
+    response, status, error = fetch(url, timeout=timeout, stream=True, client=client)
+    if response is None:
+        return error, status, []
+    digest = hashlib.sha256()
+    try:
+        page_name, links = read_links(url, response, digest)
+    except requests.RequestException as e:
+        return read_error(url, e), 500, []
+    finally:
+        response.close()
+    if validators is not None:
+        validators.update(
+            etag=response.headers.get("ETag", ""),
+            last_modified=response.headers.get("Last-Modified", ""),
+            content_hash=digest.hexdigest(),
+        )
+    return page_name, status, links
+
+
+def get_title(url: str, timeout: float | None = None) -> tuple[str, int]:
+    """Fetch only as much of `url` as needed to read its title."""
+    response, status, error = fetch(url, timeout=timeout, stream=True)
+    if response is None:
+        return error, status
+    try:
+        parser = TitleParser(url)
+        for _ in parser.iter_links(iter_text(response)):
+            pass
+    except requests.RequestException as e:
+        return read_error(url, e), 500
+    finally:
+        response.close()
+    return parser.title, status
+
+
+def read_error(url: str, error: requests.RequestException) -> str:
+    """Log a connection lost or timed out in the middle of a streamed body."""
+    logger.error(f"Error reading {url}: {error}")
+    metrics.RESPONSES.labels(500).inc()
+    return f"{error}"
+
+
+def read_links(
+    url: str, response: requests.Response, digest=None
+) -> tuple[str, list[tuple[str, str]]]:
+    """Parse a streamed response, reading at most `SCRAPER_MAX_BODY_SIZE` bytes."""
+    return _parse(url, iter_text(response, digest=digest))
+
+
+def parse_links(url: str, html: str) -> tuple[str, list[tuple[str, str]]]:
+    return _parse(url, [html])
+
+
+def _parse(url: str, chunks: Iterable[str]) -> tuple[str, list[tuple[str, str]]]:
+    parser = get_parser(url)
+    start = time.perf_counter()
+    links = list(parser.iter_links(chunks))
+    metrics.observe_parse(time.perf_counter() - start, len(links))
+    return parser.title, links
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def resolve_urls(urls: Iterable[str], chunk_size: int = 500) -> dict[str, int]:
+    """Map each URL to the id of its canonical `Url` row, creating missing rows.
+
+    Per chunk: one SELECT for the known keys, one INSERT for the missing ones
+    and one SELECT for their ids.
+    """
+    keys = {}
+    canonical_urls = {}
+    for url in urls:
+        if url not in keys:
+            canonical = canonicalize(url)
+            keys[url] = url_key(canonical)
+            canonical_urls[keys[url]] = canonical
+
+    ids = {}
+    all_keys = list(canonical_urls)
+    for i in range(0, len(all_keys), chunk_size):
+        chunk = all_keys[i : i + chunk_size]
+        ids.update(Url.objects.filter(key__in=chunk).values_list("key", "id"))
+        missing = [key for key in chunk if key not in ids]
+        if missing:
+            Url.objects.bulk_create(
+                [
+                    Url(
+                        key=key,
+                        url=canonical_urls[key],
+                        host=url_host(canonical_urls[key]),
+                    )
+                    for key in missing
+                ],
+                ignore_conflicts=True,
+            )
+            ids.update(Url.objects.filter(key__in=missing).values_list("key", "id"))
+    return {url: ids[key] for url, key in keys.items()}
+
+
+def build_links(
+    page: Page,
+    links: list[tuple[str, str]],
+    url_ids: dict[str, int] | None = None,
+) -> list[Link]:
+    if url_ids is None:
+        url_ids = resolve_urls(link for link, _ in links)
+    link_instances = []
+    seen_urls = set()
+    for link, name in links:
+        target_id = url_ids[link]
+        if target_id in seen_urls:
+            continue
+        seen_urls.add(target_id)
+        name = name or link
+        link_instance = Link(target_id=target_id, name=name, page=page)
+        link_instances.append(link_instance)
+    metrics.DUPLICATE_LINKS.inc(len(links) - len(link_instances))
+    return link_instances
+
+
+def save_links(
+    page: Page, links: Iterable[tuple[str, str]], batch_size: int | None = None
+) -> int:
+    """Insert `links` for `page` in batches, skipping the ones it already has.
+
+    `links` is consumed lazily, only one batch is held in memory at a time.
+    Returns the number of links consumed.
+    """
+    batch_size = batch_size or settings.SCRAPER_LINK_BATCH_SIZE
+    consumed = 0
+    for batch in batched(links, batch_size):
+        consumed += len(batch)
+        insert_links(build_links(page, batch))
+    return consumed
+
+
+def insert_links(links: list[Link]) -> None:
+    if connection.vendor == "postgresql":
+        _copy_links(links)
+    else:
+        Link.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def _copy_links(links: list[Link]) -> None:
+    # COPY cannot skip conflicting rows, so copy into a temporary table and
+    # move the rows over with ON CONFLICT DO NOTHING.
+    table = Link._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS scraper_link_copy "
+            "(page_id bigint, target_id bigint, name varchar(126)) ON COMMIT DROP"
+        )
+        rows = [(link.page_id, link.target_id, link.name) for link in links]
+        sql = "COPY scraper_link_copy (page_id, target_id, name) FROM STDIN"
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, "copy"):  # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:  # psycopg2
+            raw_cursor.copy_expert(
+                sql, io.StringIO("".join(_copy_line(row) for row in rows))
+            )
+        cursor.execute(
+            f"INSERT INTO {table} (page_id, target_id, name) "
+            "SELECT page_id, target_id, name FROM scraper_link_copy "
+            "ON CONFLICT DO NOTHING"
+        )
+        cursor.execute("TRUNCATE scraper_link_copy")
+
+
+def _copy_line(row: tuple) -> str:
+    values = (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        for value in row
     )
+    return "\t".join(values) + "\n"
 
 
 def create_page(url: str, user: User) -> tuple[str, int]:
-    page_name, status, links = get_links(url)
+    """Fetch `url`, then store it and its links.
+
+    The bounded body is parsed before the transaction starts, no database
+    lock is held while the response downloads. The links are held in a list
+    until then, as many as a `SCRAPER_MAX_BODY_SIZE` body holds.
+    """
+    validators = {}
+    page_name, status, links = get_links(url, validators=validators)
+    return save_page(url, user, page_name, status, links, validators)
+
+
+def save_page(
+    url: str,
+    user: User,
+    page_name: str,
+    status: int,
+    links: Iterable[tuple[str, str]],
+    validators: dict | None = None,
+) -> tuple[str, int]:
     if status != 200:
         return f"Page {url} bad response", status
 
+    with metrics.DB_SECONDS.labels("create_page").time():
+        return _save_page(url, user, page_name, links, validators or {})
+
+
+def _save_page(
+    url: str,
+    user: User,
+    page_name: str,
+    links: Iterable[tuple[str, str]],
+    validators: dict,
+) -> tuple[str, int]:
     try:
-        page, created = Page.objects.get_or_create(url=url, created_by=user)
-        if created:
+        with transaction.atomic():
+            page, created = Page.objects.get_or_create(
+                url=url, defaults={"created_by": user}
+            )
+            if not created:
+                return f"Page {url} already exists", 200
+
+            fingerprint = SimHash(url)
+            links = fingerprint.iter_links(links)
+            skip = settings.SCRAPER_SKIP_DUPLICATES
+            if skip:
+                # The whole page is fingerprinted before any link is written.
+                links = list(links)
+                page.duplicate_of_id = match_duplicate(page, fingerprint, page_name)
+            now = timezone.now()
+            if page.duplicate_of_id is None:
+                save_links(page, links)
+                log_new_links([page.pk], now)
+                page.link_count = page.link_set.count()
+                schedule_next(page, None, now)
+                for field, value in validators.items():
+                    setattr(page, field, value)
+            else:
+                schedule_duplicate(page, now)
+            page.target_id = resolve_urls([url])[url]
             page.name = page_name or url
+            page.scraped_at = now
+            if not skip:
+                page.duplicate_of_id = match_duplicate(page, fingerprint, page_name)
             page.save()
-
-            link_instances = []
-            seen_urls = set()
-            for link, name in links:
-                if link in seen_urls:
-                    continue
-                seen_urls.add(link)
-                name = name or link
-                link_instance = Link(url=link, name=name, page=page)
-                link_instances.append(link_instance)
-
-            try:
-                Link.objects.bulk_create(link_instances)
-                return f"Page {url} successfully scraped", status
-            except IntegrityError as e:
-                logger.error(f"Error creating links for {url}: {e}")
-                return f"Error scraping {url}", status
-        else:
-            return f"Page {url} already exists"
     except IntegrityError as e:
+        metrics.INTEGRITY_ERRORS.labels("page").inc()
         message = f"Error {e} creating the page {url}"
         logger.error(message)
-        return message, status
+        return message, 200
+    if skip and page.duplicate_of_id is not None:
+        return f"Page {url} duplicates page {page.duplicate_of_id}, links skipped", 200
+    return f"Page {url} successfully scraped", 200
+
+
+def conditional_get(
+    page: Page, timeout: float | None = None
+) -> requests.Response | None:
+    timeout = timeout or settings.SCRAPER_FETCH_TIMEOUT
+    headers = {}
+    if page.etag:
+        headers["If-None-Match"] = page.etag
+    if page.last_modified:
+        headers["If-Modified-Since"] = page.last_modified
+    try:
+        with metrics.FETCH_SECONDS.time():
+            response = get_client().get(
+                page.url, headers=headers, timeout=timeout, stream=True
+            )
+            if response.status_code == 200:
+                content_type = response.headers.get("Content-Type", "")
+                if not allowed_content_type(content_type):
+                    response.close()
+                    logger.error(f"Unsupported content type {content_type} {page.url}")
+                    metrics.RESPONSES.labels(415).inc()
+                    return None
+                # Read the bounded body now, while this thread holds the connection.
+                response._content = read_body(response)
+                response._content_consumed = True
+                archive_response(response)
+    except requests.RequestException as e:
+        logger.error(f"Error fetching {page.url}: {e}")
+        metrics.RESPONSES.labels(500).inc()
+        return None
+    metrics.RESPONSES.labels(response.status_code).inc()
+    return response
+
+
+def lock_change_log() -> None:
+    """Keep `LinkChange` ids in commit order until the transaction ends.
+
+    Ids come from a sequence, but concurrent transactions can commit out of
+    order and a reader paging by id would skip a change committed late below
+    its cursor. Writers hold this lock from their first change to the commit,
+    SQLite serializes writers anyway.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CHANGE_LOG_LOCK])
+
+
+def log_new_links(page_ids: list[int], now: datetime) -> None:
+    """Log every link of the just created `page_ids` as added."""
+    log_page_links(page_ids, LinkChange.Kind.ADDED, now)
+
+
+def log_page_links(page_ids: list[int], kind: str, now: datetime) -> None:
+    """Log every link of `page_ids` as `kind`, in one statement."""
+    lock_change_log()
+    placeholders = ", ".join(["%s"] * len(page_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {LinkChange._meta.db_table} "
+            "(page_id, target_id, kind, created_at) "
+            f"SELECT page_id, target_id, %s, %s FROM {Link._meta.db_table} "
+            f"WHERE page_id IN ({placeholders}) ORDER BY id",
+            [
+                kind,
+                connection.ops.adapt_datetimefield_value(now),
+                *page_ids,
+            ],
+        )
+
+
+def log_link_changes(
+    page: Page, added: Iterable[int], removed: Iterable[int], now: datetime
+) -> None:
+    """Log the target ids of links `added` to and `removed` from `page`."""
+    changes = [
+        LinkChange(page=page, target_id=target_id, kind=kind, created_at=now)
+        for kind, target_ids in (
+            (LinkChange.Kind.REMOVED, removed),
+            (LinkChange.Kind.ADDED, added),
+        )
+        for target_id in target_ids
+    ]
+    if changes:
+        lock_change_log()
+        LinkChange.objects.bulk_create(changes, batch_size=1000)
+
+
+def apply_link_diff(page: Page, links: list[tuple[str, str]]) -> tuple[int, int]:
+    """Add and remove links of `page` to match `links`, renaming the kept ones.
+
+    Returns the number of links added and removed, renames are not counted.
+    """
+    existing = {
+        target_id: (link_id, name)
+        for target_id, link_id, name in page.link_set.values_list(
+            "target_id", "id", "name"
+        )
+    }
+    new_links = build_links(page, links)
+    new_targets = {link.target_id for link in new_links}
+
+    removed = {
+        target_id: link_id
+        for target_id, (link_id, _) in existing.items()
+        if target_id not in new_targets
+    }
+    renamed = [
+        Link(pk=existing[link.target_id][0], name=link.name)
+        for link in new_links
+        if link.target_id in existing and existing[link.target_id][1] != link.name
+    ]
+    Link.objects.bulk_update(renamed, ["name"], batch_size=1000)
+    removed_ids = list(removed.values())
+    for i in range(0, len(removed_ids), 500):
+        Link.objects.filter(id__in=removed_ids[i : i + 500]).delete()
+    added = [link for link in new_links if link.target_id not in existing]
+    Link.objects.bulk_create(added, batch_size=1000)
+    log_link_changes(page, (link.target_id for link in added), removed, timezone.now())
+    page.link_count = len(new_links)
+    return len(added), len(removed)
+
+
+def schedule_next(
+    page: Page, changed: bool | None, now: datetime | None = None
+) -> None:
+    """Set when `page` is due again, without saving it.
+
+    The interval halves after the links changed and grows by half when they
+    did not, within the SCRAPER_RECRAWL_*_INTERVAL bounds. `changed=None`
+    (e.g. a failed fetch) keeps it as is.
+    """
+    interval = page.crawl_interval or settings.SCRAPER_RECRAWL_INTERVAL
+    if changed:
+        interval //= 2
+    elif changed is not None:
+        interval = interval * 3 // 2
+    low = settings.SCRAPER_RECRAWL_MIN_INTERVAL
+    high = settings.SCRAPER_RECRAWL_MAX_INTERVAL
+    page.crawl_interval = max(low, min(interval, high))
+    delay = max(low, min(page.crawl_interval * 2.0**-page.priority, high))
+    page.next_crawl_at = (now or timezone.now()) + timedelta(seconds=delay)
+
+
+def schedule_duplicate(page: Page, now: datetime | None = None) -> None:
+    """Schedule a duplicate whose links are skipped at the longest interval.
+
+    Its validators are cleared so that re-scrape downloads it and matches it
+    again, in case the page it duplicates changed meanwhile.
+    """
+    page.crawl_interval = settings.SCRAPER_RECRAWL_MAX_INTERVAL
+    page.etag = page.last_modified = page.content_hash = ""
+    schedule_next(page, None, now)
+
+
+def apply_rescrape(
+    page: Page, response: requests.Response | None, force: bool = False
+) -> tuple[str, int]:
+    """Update `page` from a `conditional_get` response.
+
+    Nothing is parsed or written when the server answers 304 or the body hash
+    matches the stored one (unless `force`, e.g. after a parser change);
+    otherwise only added and removed links are written. The next re-scrape is
+    always scheduled on `page`, but only saved along with changed pages.
+    """
+    if response is None:
+        schedule_next(page, None)
+        return f"Page {page.url} bad response", 500
+    if response.status_code == 304:
+        schedule_next(page, False)
+        return f"Page {page.url} not modified", 304
+    if response.status_code != 200:
+        schedule_next(page, None)
+        return f"Page {page.url} bad response", response.status_code
+
+    body = response.content
+    content_hash = hashlib.sha256(body).hexdigest()
+    if content_hash == page.content_hash and not force:
+        schedule_next(page, False)
+        return f"Page {page.url} unchanged", 200
+
+    encoding = detect_encoding(
+        response.headers.get("Content-Type", ""), body[:PREFIX_SIZE]
+    )
+    page_name, links = parse_links(page.url, body.decode(encoding, errors="replace"))
+    fingerprint = SimHash(page.url)
+    links = list(fingerprint.iter_links(links))
+    duplicate_of_id = match_duplicate(page, fingerprint, page_name)
+    skip = settings.SCRAPER_SKIP_DUPLICATES and duplicate_of_id is not None
+    with metrics.DB_SECONDS.labels("link_diff").time(), transaction.atomic():
+        added, removed = (0, 0) if skip else apply_link_diff(page, links)
+        page.duplicate_of_id = duplicate_of_id
+        page.name = page_name or page.url
+        page.etag = response.headers.get("ETag", "")
+        page.last_modified = response.headers.get("Last-Modified", "")
+        page.content_hash = content_hash
+        page.scraped_at = timezone.now()
+        if skip:
+            schedule_duplicate(page, page.scraped_at)
+        else:
+            schedule_next(page, bool(added or removed), page.scraped_at)
+        page.save(
+            update_fields=[
+                "name",
+                "etag",
+                "last_modified",
+                "content_hash",
+                "scraped_at",
+                "link_count",
+                "duplicate_of",
+                *FINGERPRINT_FIELDS,
+                *SCHEDULE_FIELDS,
+            ]
+        )
+    if skip:
+        return f"Page {page.url} duplicates page {duplicate_of_id}, links skipped", 200
+    return f"Page {page.url} updated, {added} links added, {removed} removed", 200
+
+
+def rescrape_page(page: Page, timeout: float | None = None) -> tuple[str, int]:
+    message, status = apply_rescrape(page, conditional_get(page, timeout))
+    page.save(update_fields=SCHEDULE_FIELDS)
+    return message, status
@@ -1,6 +1,10 @@
 from django.contrib.auth.models import Permission, User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
+
+from scraper.models import LinkChange, Page
+from scraper.services import log_page_links
 
 
 @receiver(post_save, sender=User)
@@ -10,3 +14,9 @@ def add_permissions_to_new_user(sender, instance, created, **kwargs):
         instance.user_permissions.add(permission)
         instance.is_staff = True
         instance.save()
+
+
+@receiver(pre_delete, sender=Page)
+def log_deleted_page_links(sender, instance, **kwargs):
+    # Sent before the cascade, the page's links can still be read.
+    log_page_links([instance.pk], LinkChange.Kind.REMOVED, timezone.now())
@@ -0,0 +1,151 @@
+import hashlib
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from functools import reduce
+from operator import or_
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+
+from scraper.models import Page
+from scraper.urlnorm import canonicalize
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+BAND_FIELDS = [f"simhash_band{i}" for i in range(BANDS)]
+FINGERPRINT_FIELDS = ["simhash", *BAND_FIELDS]
+WORD = re.compile(r"\w+")
+
+
+def feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest())
+
+
+class SimHash:
+    """64-bit SimHash of a page, fed one feature at a time.
+
+    Pages sharing most of their features get fingerprints a few bits apart.
+    Features are the words of the title and link texts, and the link
+    targets, without their host when it is the page's own so that mirrors
+    match.
+    """
+
+    def __init__(self, url: str):
+        self.host = urlsplit(url).netloc
+        self.weights = [0] * BITS
+        self.features = 0
+
+    def update(self, feature: str) -> None:
+        value = feature_hash(feature)
+        weights = self.weights
+        for bit in range(BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+        self.features += 1
+
+    def update_text(self, text: str) -> None:
+        for word in WORD.findall(text.lower()):
+            self.update(word)
+
+    def update_link(self, url: str, name: str) -> None:
+        parts = urlsplit(canonicalize(url))
+        if parts.netloc == self.host:
+            self.update(f"link:{parts.path}?{parts.query}")
+        else:
+            self.update(f"link:{parts.netloc}{parts.path}?{parts.query}")
+        self.update_text(name)
+
+    def iter_links(self, links: Iterable[tuple[str, str]]) -> Iterator[tuple[str, str]]:
+        """Pass `links` through, adding them to the fingerprint on the way."""
+        for url, name in links:
+            self.update_link(url, name)
+            yield url, name
+
+    def digest(self) -> int | None:
+        """The fingerprint, None for a page with nothing to compare."""
+        if not self.features:
+            return None
+        return sum(1 << bit for bit, weight in enumerate(self.weights) if weight > 0)
+
+
+def bands(value: int) -> list[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [value >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+
+def set_fingerprint(page: Page, value: int | None) -> None:
+    """Store `value` on `page` with its bands, without saving it."""
+    if value is None:
+        page.simhash = None
+        values = [None] * BANDS
+    else:
+        # Stored signed, in a 64-bit integer column.
+        page.simhash = value - (1 << BITS) * (value >> (BITS - 1))
+        values = bands(value)
+    for field, band in zip(BAND_FIELDS, values):
+        setattr(page, field, band)
+
+
+def distance(a: int, b: int) -> int:
+    return ((a ^ b) & (1 << BITS) - 1).bit_count()
+
+
+def find_duplicates(
+    fingerprints: dict, max_distance: int | None = None, exclude: Iterable[int] = ()
+) -> dict:
+    """Map the keys of `fingerprints` to the id of their closest stored page.
+
+    Fingerprints at most `max_distance` bits apart share at least one of
+    their `BANDS` bands when `max_distance < BANDS`, so candidates are only
+    looked up by band, one indexed query for all of them. Only pages that
+    are not duplicates themselves are matched.
+    """
+    if max_distance is None:
+        max_distance = settings.SCRAPER_DUPLICATE_DISTANCE
+    fingerprints = {
+        key: value for key, value in fingerprints.items() if value is not None
+    }
+    if not fingerprints:
+        return {}
+    # Keys by band, so each candidate is only compared with the fingerprints
+    # it was found for.
+    keys_by_band = defaultdict(list)
+    for key, value in fingerprints.items():
+        for band in enumerate(bands(value)):
+            keys_by_band[band].append(key)
+    lookup = reduce(
+        or_,
+        (
+            Q(**{f"{field}__in": {band for j, band in keys_by_band if j == i}})
+            for i, field in enumerate(BAND_FIELDS)
+        ),
+    )
+    candidates = (
+        Page.objects.filter(lookup, duplicate_of__isnull=True)
+        .exclude(pk__in=list(exclude))
+        .values_list("pk", "simhash", *BAND_FIELDS)
+    )
+    duplicates = {}
+    best = {}
+    for pk, simhash, *candidate_bands in candidates:
+        keys = {
+            key
+            for band in enumerate(candidate_bands)
+            for key in keys_by_band.get(band, ())
+        }
+        for key in keys:
+            bits = distance(fingerprints[key], simhash)
+            if bits <= max_distance and bits < best.get(key, BITS + 1):
+                duplicates[key] = pk
+                best[key] = bits
+    return duplicates
+
+
+def match_duplicate(page: Page, fingerprint: SimHash, title: str) -> int | None:
+    """Fingerprint `page`, without saving it, and find its closest duplicate."""
+    fingerprint.update_text(title)
+    value = fingerprint.digest()
+    set_fingerprint(page, value)
+    return find_duplicates({page.pk: value}, exclude=[page.pk]).get(page.pk)
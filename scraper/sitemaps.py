@@ -0,0 +1,214 @@
+import logging
+import zlib
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from datetime import datetime, time, timezone
+from itertools import chain
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from scraper.bulk import LOOKUP_CHUNK_SIZE, clean_urls
+from scraper.client import get_client
+from scraper.crawler import RobotsCache
+from scraper.jobs import enqueue_scrape
+from scraper.models import Page, ScrapeJob
+from scraper.parsers import iter_bytes
+from scraper.services import batched
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 64 * 1024
+OPEN_JOB_STATUSES = [ScrapeJob.Status.QUEUED, ScrapeJob.Status.RUNNING]
+
+
+def parse_lastmod(value: str | None) -> datetime | None:
+    """Parse a W3C datetime, dates alone are taken as midnight UTC."""
+    value = (value or "").strip()
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None and (date := parse_date(value)):
+            parsed = datetime.combine(date, time())
+    except ValueError:
+        return None
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def iter_xml(
+    response: requests.Response, max_size: int | None = None
+) -> Iterator[bytes]:
+    """Body of a streamed sitemap, gunzipped if needed, stopping after `max_size`."""
+    max_size = max_size or settings.SCRAPER_SITEMAP_MAX_SIZE
+    chunks = iter_bytes(response, CHUNK_SIZE, max_size)
+    first = next(chunks, b"")
+    if not first.startswith(GZIP_MAGIC):
+        yield first
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    size = 0
+    for chunk in chain([first], chunks):
+        # Bounded output per call, a small compressed chunk can expand a lot.
+        while chunk:
+            data = decompressor.decompress(chunk, CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+            size += len(data)
+            if size > max_size:
+                if data := data[: len(data) - (size - max_size)]:
+                    yield data
+                logger.warning(f"Stopped reading {response.url} after {max_size} bytes")
+                response.close()
+                return
+            yield data
+
+
+def parse_sitemap(
+    chunks: Iterable[bytes],
+) -> Iterator[tuple[str, str, datetime | None]]:
+    """Yield `(tag, loc, lastmod)` for every `<url>` and `<sitemap>` entry.
+
+    The XML is parsed incrementally and every entry is dropped from the tree
+    once read, memory use does not depend on the number of entries.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in chain(chunks, [None]):
+        if chunk is None:
+            parser.close()
+        else:
+            parser.feed(chunk)
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+            if event != "end":
+                continue
+            tag = element.tag.rpartition("}")[2]
+            if tag not in ("url", "sitemap"):
+                continue
+            loc = lastmod = None
+            for child in element:
+                name = child.tag.rpartition("}")[2]
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = parse_lastmod(child.text)
+            if loc:
+                yield tag, loc, lastmod
+            root.clear()
+
+
+def read_sitemap(
+    url: str, timeout: float | None = None
+) -> Iterator[tuple[str, str, datetime | None]]:
+    try:
+        response = get_client().get(url, timeout=timeout, stream=True)
+    except requests.RequestException as e:
+        logger.error(f"Error fetching {url}: {e}")
+        return
+    try:
+        if response.status_code != 200:
+            logger.error(f"Error fetching {url}: {response.status_code}")
+            return
+        yield from parse_sitemap(iter_xml(response))
+    except ElementTree.ParseError as e:
+        logger.error(f"Error parsing {url}: {e}")
+    except requests.RequestException as e:
+        # The entries read so far are kept.
+        logger.error(f"Error reading {url}: {e}")
+    finally:
+        response.close()
+
+
+def discover_sitemaps(url: str, robots: RobotsCache | None = None) -> list[str]:
+    """Sitemaps of the site of `url`, from robots.txt or at /sitemap.xml."""
+    parts = urlsplit(url)
+    return (robots or RobotsCache()).sitemaps(url) or [
+        f"{parts.scheme}://{parts.netloc}/sitemap.xml"
+    ]
+
+
+def iter_sitemap_urls(
+    sitemaps: Iterable[str], max_files: int | None = None
+) -> Iterator[tuple[str, datetime | None]]:
+    """Yield `(url, lastmod)` from `sitemaps`, following sitemap indexes."""
+    max_files = max_files or settings.SCRAPER_SITEMAP_MAX_FILES
+    queue = deque(dict.fromkeys(sitemaps))
+    seen = set(queue)
+    fetched = 0
+    while queue and fetched < max_files:
+        fetched += 1
+        for tag, loc, lastmod in read_sitemap(queue.popleft()):
+            if tag == "url":
+                yield loc, lastmod
+            elif loc not in seen:
+                seen.add(loc)
+                queue.append(loc)
+    if queue:
+        logger.warning(f"Skipped {len(queue)} sitemaps after {max_files}")
+
+
+def ingest_sitemaps(
+    urls: Iterable[str], user: User, batch_size: int | None = None
+) -> Counter:
+    """Queue scrape jobs for the pages listed in sitemaps.
+
+    `urls` are sitemaps, or sites whose sitemaps are discovered through
+    robots.txt. Stored pages are only re-scraped when their `<lastmod>` is
+    newer than their last scrape, by making them due for the scheduler. URLs
+    listed more than once are handled once, and URLs with a queued or
+    running job are not queued again. Returns counts of `queued`, `pending`
+    (already queued), `due`, `unchanged` and `invalid` URLs.
+    """
+    batch_size = batch_size or settings.SCRAPER_BULK_BATCH_SIZE
+    robots = RobotsCache()
+    sitemaps = []
+    for url in urls:
+        if urlsplit(url).path.strip("/"):
+            sitemaps.append(url)
+        else:
+            sitemaps.extend(discover_sitemaps(url, robots))
+
+    counts = Counter()
+    seen = set()
+    for batch in batched(iter_sitemap_urls(sitemaps), batch_size):
+        lastmods = {url: lastmod for url, lastmod in batch if url not in seen}
+        seen.update(lastmods)
+        valid, invalid = clean_urls(lastmods)
+        counts["invalid"] += len(invalid)
+
+        stored = {}
+        pending = set()
+        for chunk in batched(valid, LOOKUP_CHUNK_SIZE):
+            stored.update(
+                (url, (page_id, scraped_at))
+                for url, page_id, scraped_at in Page.objects.filter(
+                    url__in=chunk
+                ).values_list("url", "id", "scraped_at")
+            )
+            pending.update(
+                ScrapeJob.objects.filter(
+                    url__in=chunk, status__in=OPEN_JOB_STATUSES
+                ).values_list("url", flat=True)
+            )
+        new = [url for url in valid if url not in stored and url not in pending]
+        changed = [
+            page_id
+            for url, (page_id, scraped_at) in stored.items()
+            if lastmods[url] and (scraped_at is None or lastmods[url] > scraped_at)
+        ]
+        enqueue_scrape(new, user)
+        Page.objects.filter(pk__in=changed).update(next_crawl_at=django_timezone.now())
+        counts["queued"] += len(new)
+        counts["pending"] += len(pending - stored.keys())
+        counts["due"] += len(changed)
+        counts["unchanged"] += len(stored) - len(changed)
+    return counts
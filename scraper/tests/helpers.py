@@ -0,0 +1,83 @@
+import io
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+class BrokenBody(io.BytesIO):
+    """Raw body raising `error` once `body` has been read, as a dropped connection."""
+
+    def __init__(self, body: bytes, error: Exception):
+        super().__init__(body)
+        self.error = error
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if not data:
+            raise self.error
+        return data
+
+
+def make_response(
+    url: str = "https://www.example.com/",
+    body: bytes = b"<a href='/a'>A</a>",
+    status: int = 200,
+    headers: dict | None = None,
+    error: Exception | None = None,
+) -> requests.Response:
+    """A `requests` response whose body is streamed from `raw`, not read yet.
+
+    With `error`, reading past `body` raises it instead of ending the body.
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.reason = HTTPStatus(status).phrase
+    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    response.headers["Content-Length"] = str(len(body))
+    response.headers.update(headers or {})
+    response.request = requests.Request("GET", url).prepare()
+    response.raw = io.BytesIO(body) if error is None else BrokenBody(body, error)
+    return response
+
+
+class StallingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"<title>Stalled</title>" + b"<a href='/a'>A</a>" * 100
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body) * 2))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.server.released.wait(5)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StallingServer(ThreadingHTTPServer):
+    """Local server sending half of every body, then nothing until it is closed."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StallingHandler)
+        self.released = threading.Event()
+
+    def url(self, path: str = "/") -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.released.set()
+        self.shutdown()
+        self.server_close()
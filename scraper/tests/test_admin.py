@@ -0,0 +1,191 @@
+from datetime import timedelta
+from html.parser import HTMLParser
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+
+from scraper.models import LinkChange, Page
+
+
+class PageAdminQueriesTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User", is_superuser=True, is_staff=True)
+        self.client.force_login(self.user)
+
+    def make_page(self, links):
+        page = baker.make("scraper.Page", created_by=self.user, link_count=links)
+        if links:
+            baker.make("scraper.Link", page=page, _quantity=links)
+        return page
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_queries(self):
+        self.make_page(3)
+        url = reverse("admin:scraper_page_changelist")
+        self.client.get(url)
+        queries = self.count_queries(url)
+        for _ in range(15):
+            self.make_page(3)
+        self.assertEqual(self.count_queries(url), queries)
+
+    def test_change_view_queries(self):
+        small = self.make_page(2)
+        large = self.make_page(30)
+        # Warm up per-session queries that only run on the first request.
+        self.client.get(reverse("admin:scraper_page_change", args=[small.pk]))
+        self.assertEqual(
+            self.count_queries(reverse("admin:scraper_page_change", args=[large.pk])),
+            self.count_queries(reverse("admin:scraper_page_change", args=[small.pk])),
+        )
+
+    def test_changelist_total_links(self):
+        self.make_page(3)
+        response = self.client.get(reverse("admin:scraper_page_changelist"))
+        self.assertContains(response, '<td class="field-total_links">3</td>', html=True)
+
+    def test_changelist_order_and_filter(self):
+        few = self.make_page(1)
+        many = self.make_page(12)
+        none = self.make_page(0)
+        url = reverse("admin:scraper_page_changelist")
+        response = self.client.get(url, {"o": "-3"})
+        self.assertEqual(list(response.context["cl"].result_list), [many, few, none])
+        response = self.client.get(url, {"links": "11-100"})
+        self.assertEqual(list(response.context["cl"].result_list), [many])
+        response = self.client.get(url, {"links": "0"})
+        self.assertEqual(list(response.context["cl"].result_list), [none])
+
+    def test_change_priority_reschedules(self):
+        page = baker.make(
+            "scraper.Page",
+            created_by=self.user,
+            scraped_at=timezone.now(),
+            crawl_interval=8 * 3600,
+        )
+        response = self.client.post(
+            reverse("admin:scraper_page_change", args=[page.pk]), {"priority": 2}
+        )
+        self.assertEqual(response.status_code, 302)
+        page.refresh_from_db()
+        self.assertEqual(page.priority, 2)
+        self.assertEqual(page.crawl_interval, 8 * 3600)
+        self.assertEqual(page.next_crawl_at, page.scraped_at + timedelta(hours=2))
+
+
+class LinkAdminTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User", is_superuser=True, is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_delete_updates_link_count(self):
+        page = baker.make("scraper.Page", link_count=2)
+        first, _ = baker.make("scraper.Link", page=page, _quantity=2)
+        self.client.post(
+            reverse("admin:scraper_link_changelist"),
+            {
+                "action": "delete_selected",
+                "_selected_action": [first.pk],
+                "post": "yes",
+            },
+        )
+        self.assertEqual(Page.objects.get().link_count, 1)
+        self.assertEqual(
+            list(LinkChange.objects.values_list("page_id", "target_id", "kind")),
+            [(page.pk, first.target_id, "removed")],
+        )
+
+
+class FormParser(HTMLParser):
+    """Ids of the forms, each with the ids of the forms it is inside."""
+
+    def __init__(self):
+        super().__init__()
+        self.open = []
+        self.forms = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "form":
+            form_id = dict(attrs).get("id")
+            self.forms[form_id] = list(self.open)
+            self.open.append(form_id)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self.open.pop()
+
+
+class PageChangeViewLinksTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User", is_superuser=True, is_staff=True)
+        self.client.force_login(self.user)
+        self.page = baker.make("scraper.Page", created_by=self.user)
+        self.url = reverse("admin:scraper_page_change", args=[self.page.pk])
+
+    def test_keyset_pagination(self):
+        links = baker.make("scraper.Link", page=self.page, _quantity=15)
+        response = self.client.get(self.url)
+        self.assertEqual(list(response.context["links"]), links[:10])
+        self.assertContains(response, f"after={links[9].pk}")
+        response = self.client.get(self.url, {"after": links[9].pk})
+        self.assertEqual(list(response.context["links"]), links[10:])
+        self.assertContains(response, f"before={links[10].pk}")
+
+    def test_search(self):
+        example = baker.make(
+            "scraper.Link",
+            page=self.page,
+            name="Example",
+            target__host="www.example.com",
+        )
+        google = baker.make(
+            "scraper.Link", page=self.page, name="Google", target__host="www.google.com"
+        )
+        response = self.client.get(self.url, {"q": "Exa"})
+        self.assertEqual(list(response.context["links"]), [example])
+        response = self.client.get(self.url, {"domain": "www.google.com"})
+        self.assertEqual(list(response.context["links"]), [google])
+        response = self.client.get(self.url, {"domain": "google.com"})
+        self.assertEqual(list(response.context["links"]), [])
+
+    def test_search_form_not_nested(self):
+        response = self.client.get(self.url)
+        parser = FormParser()
+        parser.feed(response.content.decode())
+        self.assertEqual(parser.forms["page_form"], [])
+        self.assertEqual(parser.forms["link-search"], [])
+        self.assertContains(
+            response,
+            'name="q" value="" placeholder="Name starts with" form="link-search"',
+        )
+
+    def test_status_filter(self):
+        now = timezone.now()
+        targets = {
+            "ok": baker.make("scraper.Url", status_code=200, checked_at=now),
+            "redirected": baker.make(
+                "scraper.Url",
+                status_code=200,
+                final_url="https://www.example.com/moved",
+                checked_at=now,
+            ),
+            "broken": baker.make("scraper.Url", status_code=404, checked_at=now),
+            "unreachable": baker.make("scraper.Url", checked_at=now),
+            "unchecked": baker.make("scraper.Url"),
+        }
+        links = {
+            status: baker.make("scraper.Link", target=target)
+            for status, target in targets.items()
+        }
+        url = reverse("admin:scraper_link_changelist")
+        for status, link in links.items():
+            response = self.client.get(url, {"status": status})
+            self.assertEqual(list(response.context["cl"].result_list), [link])
@@ -0,0 +1,137 @@
+import csv
+import gzip
+import io
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+
+from scraper.models import Page
+from scraper.services import resolve_urls
+
+
+def content(response) -> str:
+    if response.streaming:
+        return b"".join(response.streaming_content).decode()
+    return response.content.decode()
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        self.client.force_login(self.user)
+        self.pages = baker.make(
+            "scraper.Page", created_by=self.user, link_count=2, _quantity=3
+        )
+        self.other = baker.make("scraper.Page")
+        urls = ["https://www.example.com/a", "https://www.example.com/b"]
+        for target_id in resolve_urls(urls).values():
+            baker.make("scraper.Link", page=self.pages[0], target_id=target_id)
+            baker.make("scraper.Link", page=self.other, target_id=target_id)
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(reverse("api:page_list"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_page_list(self):
+        url = reverse("api:page_list")
+        response = self.client.get(url, {"limit": 2})
+        data = response.json()
+        self.assertEqual(
+            [page["id"] for page in data["results"]],
+            [page.pk for page in self.pages[:2]],
+        )
+        self.assertEqual(data["next"], f"{url}?limit=2&after={self.pages[1].pk}")
+        data = self.client.get(data["next"]).json()
+        self.assertEqual([page["id"] for page in data["results"]], [self.pages[2].pk])
+        self.assertIsNone(data["next"])
+
+    def test_superuser_sees_all_pages(self):
+        self.user.is_superuser = True
+        self.user.save()
+        response = self.client.get(reverse("api:page_list"))
+        self.assertEqual(len(response.json()["results"]), 4)
+
+    def test_page_detail(self):
+        page = self.pages[0]
+        response = self.client.get(reverse("api:page_detail", args=[page.pk]))
+        self.assertEqual(response.json()["url"], page.url)
+        response = self.client.get(reverse("api:page_detail", args=[self.other.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_link_list(self):
+        response = self.client.get(reverse("api:link_list", args=[self.pages[0].pk]))
+        self.assertEqual(
+            [link["url"] for link in response.json()["results"]],
+            ["https://www.example.com/a", "https://www.example.com/b"],
+        )
+        response = self.client.get(reverse("api:link_list", args=[self.other.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_export(self):
+        response = self.client.get(reverse("api:page_export"))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content(response).splitlines()]
+        self.assertEqual([row["id"] for row in rows], [page.pk for page in self.pages])
+
+    def test_link_export_csv(self):
+        response = self.client.get(reverse("api:link_export"), {"format": "csv"})
+        rows = list(csv.reader(io.StringIO(content(response))))
+        self.assertEqual(rows[0], ["id", "page", "name", "url"])
+        self.assertEqual(
+            [(row[1], row[3]) for row in rows[1:]],
+            [
+                (str(self.pages[0].pk), "https://www.example.com/a"),
+                (str(self.pages[0].pk), "https://www.example.com/b"),
+            ],
+        )
+        response = self.client.get(
+            reverse("api:link_export"), {"page": self.pages[1].pk}
+        )
+        self.assertEqual(content(response), "")
+
+    def test_gzip(self):
+        response = self.client.get(
+            reverse("api:page_export"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_etag(self):
+        url = reverse("api:page_list")
+        etag = self.client.get(url)["ETag"]
+        # Session and user, then one indexed lookup per part of the ETag.
+        with self.assertNumQueries(5):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Page.objects.filter(pk=self.pages[0].pk).update(scraped_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertNotEqual(self.client.get(url, {"limit": 1})["ETag"], etag)
+
+    def test_etag_link_change(self):
+        url = reverse("api:page_list")
+        etag = self.client.get(url)["ETag"]
+        baker.make("scraper.LinkChange", page=self.pages[0], kind="removed")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_links_etag(self):
+        url = reverse("api:link_export")
+        etag = self.client.get(url)["ETag"]
+        # Scraping a page without link changes keeps the links' ETag.
+        Page.objects.filter(pk=self.pages[1].pk).update(scraped_at=timezone.now())
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        baker.make("scraper.LinkChange", page=self.pages[0], kind="removed")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
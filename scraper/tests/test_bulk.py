@@ -0,0 +1,173 @@
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from model_bakery import baker
+
+from scraper import bulk
+from scraper.models import Link, Page, ScrapeJob
+
+
+class CleanUrlsTest(TestCase):
+    def test_clean_urls(self):
+        valid, invalid = bulk.clean_urls(
+            [
+                "https://a.example.com\n",
+                "",
+                "not a url",
+                "https://b.example.com",
+                "https://a.example.com",
+            ]
+        )
+        self.assertEqual(valid, ["https://a.example.com", "https://b.example.com"])
+        self.assertEqual(invalid, ["not a url"])
+
+
+class ScrapeUrlsTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+
+    def test_existing_urls(self):
+        baker.make("scraper.Page", url="https://a.example.com")
+        with self.assertNumQueries(1):
+            existing = bulk.existing_urls(
+                ["https://a.example.com", "https://b.example.com"]
+            )
+        self.assertEqual(existing, {"https://a.example.com"})
+
+    def test_save_pages(self):
+        results = [
+            (
+                "https://a.example.com",
+                (
+                    "A",
+                    200,
+                    [
+                        ("https://a.example.com/x", "X"),
+                        ("https://a.example.com/x", "X"),
+                    ],
+                ),
+            ),
+            ("https://b.example.com", ("", 200, [("https://b.example.com/y", "")])),
+            ("https://c.example.com", ("Error", 500, [])),
+        ]
+        summary = bulk.save_pages(results, self.user)
+        self.assertEqual(
+            summary,
+            [
+                (
+                    "https://c.example.com",
+                    "Page https://c.example.com bad response",
+                    500,
+                ),
+                (
+                    "https://a.example.com",
+                    "Page https://a.example.com successfully scraped",
+                    200,
+                ),
+                (
+                    "https://b.example.com",
+                    "Page https://b.example.com successfully scraped",
+                    200,
+                ),
+            ],
+        )
+        self.assertEqual(
+            Page.objects.get(url="https://b.example.com").name, "https://b.example.com"
+        )
+        self.assertEqual(Link.objects.count(), 2)
+        self.assertEqual(
+            Link.objects.get(target__url="https://b.example.com/y").name,
+            "https://b.example.com/y",
+        )
+
+    @mock.patch("scraper.bulk.logger.error")
+    def test_save_pages_race(self, p_error):
+        baker.make("scraper.Page", url="https://a.example.com")
+        results = [
+            ("https://a.example.com", ("A", 200, [])),
+            ("https://b.example.com", ("B", 200, [("https://b.example.com/y", "Y")])),
+        ]
+        summary = bulk.save_pages(results, self.user)
+        self.assertEqual(
+            summary[1],
+            (
+                "https://b.example.com",
+                "Page https://b.example.com successfully scraped",
+                200,
+            ),
+        )
+        self.assertEqual(Page.objects.count(), 2)
+        self.assertEqual(Link.objects.count(), 1)
+
+    @mock.patch("scraper.bulk.get_links_many")
+    def test_scrape_urls(self, p_get_links_many):
+        baker.make("scraper.Page", url="https://a.example.com")
+        p_get_links_many.side_effect = lambda urls, **kwargs: [
+            (url, ("Title", 200, [])) for url in urls
+        ]
+        summary = list(
+            bulk.scrape_urls(
+                [
+                    "https://a.example.com",
+                    "https://b.example.com",
+                    "https://c.example.com",
+                ],
+                self.user,
+                batch_size=2,
+            )
+        )
+        self.assertEqual(
+            [url for url, _, _ in summary],
+            ["https://a.example.com", "https://b.example.com", "https://c.example.com"],
+        )
+        self.assertEqual(summary[0][1], "Page https://a.example.com already exists")
+        self.assertEqual(p_get_links_many.call_count, 2)
+        self.assertEqual(Page.objects.count(), 3)
+
+    @mock.patch("scraper.bulk.get_links_many")
+    def test_command(self, p_get_links_many):
+        p_get_links_many.side_effect = lambda urls, **kwargs: [
+            (url, ("Title", 200, [])) for url in urls
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("https://a.example.com\nnope\nhttps://b.example.com\n")
+            f.flush()
+            out = StringIO()
+            call_command("scrape_urls", f.name, user=self.user.username, stdout=out)
+        output = out.getvalue()
+        self.assertIn("invalid\tnope", output)
+        self.assertIn(
+            "200\thttps://a.example.com\tPage https://a.example.com successfully scraped",
+            output,
+        )
+        self.assertIn("Processed 3 URLs (200: 2, invalid: 1)", output)
+
+
+class ScrapeBulkAdminTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User", is_superuser=True, is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_scrape_bulk(self):
+        baker.make("scraper.Page", url="https://a.example.com")
+        response = self.client.post(
+            reverse("admin:scraper_page_scrape_bulk"),
+            {
+                "urls": "https://a.example.com\nhttps://b.example.com\nbad",
+                "file": SimpleUploadedFile("urls.txt", b"https://c.example.com\n"),
+            },
+        )
+        self.assertRedirects(response, reverse("admin:scraper_page_changelist"))
+        self.assertEqual(
+            set(ScrapeJob.objects.values_list("url", flat=True)),
+            {"https://b.example.com", "https://c.example.com"},
+        )
+
+    def test_scrape_bulk_empty(self):
+        self.client.post(reverse("admin:scraper_page_scrape_bulk"), {"urls": ""})
+        self.assertEqual(ScrapeJob.objects.count(), 0)
@@ -0,0 +1,223 @@
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from model_bakery import baker
+
+from scraper import cache, services
+from scraper.tests.helpers import make_response
+from scraper.urlnorm import canonicalize, url_key
+
+
+class FreshnessTest(TestCase):
+    def test_freshness(self):
+        self.assertEqual(cache.freshness({}, 60, 3600), 60)
+        self.assertEqual(
+            cache.freshness({"Cache-Control": "max-age=120"}, 60, 3600), 120
+        )
+        self.assertEqual(
+            cache.freshness({"Cache-Control": "max-age=9999"}, 60, 3600), 3600
+        )
+        self.assertEqual(cache.freshness({"Cache-Control": "no-store"}, 60, 3600), 0)
+        self.assertEqual(
+            cache.freshness({"Cache-Control": "private, no-cache"}, 60, 3600), 0
+        )
+        headers = {
+            "Date": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "Expires": "Wed, 21 Oct 2015 07:38:00 GMT",
+        }
+        self.assertEqual(cache.freshness(headers, 60, 3600), 600)
+        self.assertEqual(cache.freshness({"Expires": "0"}, 60, 3600), 0)
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = cache.ResponseCache(
+            Path(self.directory.name) / "cache.sqlite3",
+            max_size=10_000,
+            default_ttl=60,
+            max_ttl=3600,
+            max_entry_size=100_000,
+        )
+        self.url = "https://www.example.com/"
+        self.key = url_key(canonicalize(self.url))
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.assertTrue(
+            self.cache.put(self.key, self.url, make_response(headers={"ETag": '"a"'}))
+        )
+        response = self.cache.get(self.key)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], '"a"')
+        self.assertEqual(response.text, "<a href='/a'>A</a>")
+        self.assertEqual(b"".join(response.iter_content(4)), b"<a href='/a'>A</a>")
+
+    def test_not_stored(self):
+        self.assertFalse(self.cache.put(self.key, self.url, make_response(status=404)))
+        no_store = make_response(headers={"Cache-Control": "no-store"})
+        self.assertFalse(self.cache.put(self.key, self.url, no_store))
+        # A streamed body of unknown length is not read just to cache it.
+        chunked = make_response()
+        del chunked.headers["Content-Length"]
+        self.assertFalse(self.cache.put(self.key, self.url, chunked, stream=True))
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_bounded_read(self):
+        response = make_response(body=b"x" * 100)
+        del response.headers["Content-Length"]
+        with self.settings(SCRAPER_MAX_BODY_SIZE=10):
+            self.assertFalse(self.cache.put(self.key, self.url, response))
+        # The caller still gets the body, cut off as it would be when streamed.
+        self.assertEqual(response.content, b"x" * 10)
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_expired(self):
+        self.cache.put(self.key, self.url, make_response())
+        with mock.patch("scraper.cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get(self.key))
+
+    def test_fetch(self):
+        get = mock.Mock(return_value=make_response())
+        self.cache.fetch(self.url, get)
+        response = self.cache.fetch("https://WWW.example.com#top", get)
+        get.assert_called_once()
+        self.assertEqual(response.content, b"<a href='/a'>A</a>")
+
+    def test_concurrent_fetch(self):
+        def get():
+            time.sleep(0.05)
+            return make_response()
+
+        get = mock.Mock(side_effect=get)
+        threads = [
+            threading.Thread(target=self.cache.fetch, args=(self.url, get))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        get.assert_called_once()
+
+    def test_hits_and_puts_write_less(self):
+        self.cache.max_size = 1_000_000
+        self.cache.default_ttl = 3600
+        with mock.patch("scraper.cache.time.time", return_value=1000):
+            self.cache.put(self.key, self.url, make_response())
+        statements = []
+        self.cache.connection.set_trace_callback(statements.append)
+        with mock.patch("scraper.cache.time.time", return_value=1010):
+            self.cache.get(self.key)
+            self.cache.get(self.key)
+            for i in range(5):
+                url = f"https://www.example.com/{i}"
+                self.cache.put(url_key(canonicalize(url)), url, make_response())
+        self.assertFalse([sql for sql in statements if sql.startswith("UPDATE")])
+        self.assertFalse([sql for sql in statements if "SUM(size)" in sql])
+
+        statements.clear()
+        with mock.patch("scraper.cache.time.time", return_value=1000 + 60):
+            self.cache.get(self.key)
+        self.assertTrue([sql for sql in statements if sql.startswith("UPDATE")])
+
+    def test_slow_fetch_does_not_block_other_urls(self):
+        release = threading.Event()
+
+        def slow_get():
+            release.wait(5)
+            return make_response()
+
+        slow = threading.Thread(target=self.cache.fetch, args=(self.url, slow_get))
+        slow.start()
+        try:
+            for i in range(100):
+                started = time.monotonic()
+                self.cache.fetch(f"https://www.example.com/{i}", make_response)
+                self.assertLess(time.monotonic() - started, 1)
+        finally:
+            release.set()
+            slow.join()
+
+    def test_lru_eviction(self):
+        body = os.urandom(4096)  # Does not compress.
+        urls = [f"https://www.example.com/{i}" for i in range(3)]
+        keys = [url_key(canonicalize(url)) for url in urls]
+        # Accesses are recorded a minute apart at most.
+        self.cache.default_ttl = 3600
+        with mock.patch("scraper.cache.time.time") as p_time:
+            p_time.return_value = 1000
+            self.cache.put(keys[0], urls[0], make_response(body=body))
+            p_time.return_value = 1100
+            self.cache.put(keys[1], urls[1], make_response(body=body))
+            p_time.return_value = 1200
+            self.cache.get(keys[0])
+            p_time.return_value = 1300
+            self.cache.put(keys[2], urls[2], make_response(body=body))
+            self.assertIsNotNone(self.cache.get(keys[0]))
+            self.assertIsNone(self.cache.get(keys[1]))
+            self.assertIsNotNone(self.cache.get(keys[2]))
+
+
+class CachedFetchTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        settings = override_settings(
+            SCRAPER_CACHE_PATH=Path(self.directory.name) / "cache.sqlite3"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def tearDown(self):
+        cache.get_cache().close()
+        self.directory.cleanup()
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_links_cached(self, p_get):
+        p_get.return_value = make_response()
+        first = services.get_links("https://www.example.com")
+        second = services.get_links("https://www.example.com/")
+        p_get.assert_called_once()
+        self.assertEqual(first, second)
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_unsupported_content_type_not_cached(self, p_get):
+        p_get.return_value = make_response(headers={"Content-Type": "application/pdf"})
+        response, status, _ = services.fetch("https://www.example.com", stream=True)
+        self.assertEqual((response, status), (None, 415))
+        self.assertFalse(p_get.return_value._content_consumed)
+        self.assertEqual(list(cache.get_cache().entries()), [])
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_replay_cache(self, p_get):
+        url = "https://www.example.com"
+        p_get.return_value = make_response()
+        user = baker.make("auth.User")
+        services.create_page(url, user)
+        page = services.Page.objects.get()
+        self.assertEqual(page.link_count, 1)
+
+        with mock.patch(
+            "scraper.services.parse_links",
+            return_value=("New", [("https://www.example.com/b", "B")]),
+        ):
+            out = StringIO()
+            call_command("replay_cache", stdout=out)
+        p_get.assert_called_once()
+        page.refresh_from_db()
+        self.assertEqual(page.name, "New")
+        self.assertEqual(
+            list(page.link_set.values_list("target__url", flat=True)),
+            ["https://www.example.com/b"],
+        )
+        self.assertIn("Replayed 1 pages (200: 1)", out.getvalue())
@@ -0,0 +1,117 @@
+from unittest import mock
+
+import requests
+from django.test import TestCase
+
+from scraper import services
+from scraper.client import CircuitBreaker, CircuitOpenError, FetchClient
+from scraper.tests.helpers import make_response
+
+
+@mock.patch("scraper.client.time.sleep")
+class FetchClientTest(TestCase):
+    def setUp(self):
+        self.client = FetchClient(
+            retries=2,
+            backoff=1,
+            max_backoff=10,
+            breaker=CircuitBreaker(threshold=2, reset_timeout=60),
+        )
+        self.url = "https://www.example.com"
+        patcher = mock.patch.object(self.client.session, "get")
+        self.p_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_with_backoff(self, p_sleep):
+        self.p_get.side_effect = [make_response(status=503), make_response(status=200)]
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.p_get.call_count, 2)
+        self.p_get.assert_called_with(self.url, timeout=5)
+        (delay,), _ = p_sleep.call_args
+        self.assertTrue(0.5 <= delay <= 1)
+
+    def test_retry_after(self, p_sleep):
+        self.p_get.side_effect = [
+            make_response(status=429, headers={"Retry-After": "7"}),
+            make_response(status=200),
+        ]
+        self.client.get(self.url)
+        p_sleep.assert_called_once_with(7.0)
+
+    def test_retry_after_too_long(self, p_sleep):
+        self.p_get.return_value = make_response(
+            status=503, headers={"Retry-After": "3600"}
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.p_get.assert_called_once()
+        p_sleep.assert_not_called()
+
+    def test_retries_exhausted(self, p_sleep):
+        self.p_get.return_value = make_response(status=502)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.p_get.call_count, 3)
+        self.assertEqual(p_sleep.call_count, 2)
+
+    def test_connection_error(self, p_sleep):
+        self.p_get.side_effect = requests.ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            self.client.get(self.url)
+        self.assertEqual(self.p_get.call_count, 3)
+
+    def test_client_error_not_retried(self, p_sleep):
+        self.p_get.return_value = make_response(status=404)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.p_get.assert_called_once()
+
+    @mock.patch("scraper.client.time.monotonic")
+    def test_circuit_breaker(self, p_monotonic, p_sleep):
+        p_monotonic.return_value = 1000
+        self.p_get.return_value = make_response(status=503)
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.p_get.reset_mock()
+        with self.assertRaises(CircuitOpenError):
+            self.client.get(f"{self.url}/other")
+        self.p_get.assert_not_called()
+        # Other hosts are not affected.
+        self.p_get.return_value = make_response(status=200)
+        self.client.get("https://www.google.com")
+
+        # After the reset timeout a single trial request goes through.
+        p_monotonic.return_value = 1061
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @mock.patch("scraper.client.time.monotonic")
+    def test_half_open_failure(self, p_monotonic, p_sleep):
+        p_monotonic.return_value = 1000
+        self.p_get.side_effect = requests.Timeout
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                self.client.get(self.url)
+        p_monotonic.return_value = 1061
+        with self.assertRaises(requests.Timeout):
+            self.client.get(self.url)
+        with self.assertRaises(CircuitOpenError):
+            self.client.get(self.url)
+
+    def test_head(self, p_sleep):
+        with mock.patch.object(self.client.session, "head") as p_head:
+            p_head.side_effect = [make_response(status=503), make_response(status=200)]
+            response = self.client.head(self.url, allow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        p_head.assert_called_with(self.url, timeout=5, allow_redirects=True)
+        self.p_get.assert_not_called()
+
+
+class GetLinksStatusTest(TestCase):
+    @mock.patch("scraper.services.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_http_error_status(self, p_get, p_error):
+        p_get.return_value = make_response(status=503)
+        name, status, links = services.get_links("https://www.example.com")
+        self.assertEqual(status, 503)
+        self.assertEqual(links, [])
@@ -0,0 +1,173 @@
+from unittest import mock
+
+from django.test import TestCase
+from model_bakery import baker
+
+from scraper import crawler
+from scraper.services import resolve_urls
+from scraper.bloom import BloomFilter
+from scraper.models import Crawl, FrontierUrl, Page
+
+
+class BloomFilterTest(TestCase):
+    def test_add(self):
+        bloom = BloomFilter(1000, 0.01)
+        self.assertTrue(bloom.add("https://www.example.com"))
+        self.assertFalse(bloom.add("https://www.example.com"))
+        self.assertIn("https://www.example.com", bloom)
+        self.assertNotIn("https://www.google.com", bloom)
+
+    def test_serialization(self):
+        bloom = BloomFilter(1000, 0.01)
+        bloom.add("https://www.example.com")
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        self.assertEqual((restored.size, restored.hashes), (bloom.size, bloom.hashes))
+        self.assertIn("https://www.example.com", restored)
+
+    def test_error_rate(self):
+        bloom = BloomFilter(5000, 0.01)
+        for i in range(5000):
+            bloom.add(f"https://www.example.com/{i}")
+        false_positives = sum(
+            f"https://www.google.com/{i}" in bloom for i in range(5000)
+        )
+        self.assertLess(false_positives, 100)
+
+
+class AllowAllRobots:
+    def can_fetch(self, url):
+        return "/private" not in url
+
+
+class CrawlTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        self.seed = baker.make(
+            "scraper.Page", url="https://www.example.com", created_by=self.user
+        )
+        for url in (
+            "https://www.example.com/a",
+            "https://www.example.com/private",
+            "https://blog.www.example.com/b",
+            "https://www.google.com",
+            "mailto:someone@example.com",
+        ):
+            baker.make(
+                "scraper.Link", page=self.seed, target_id=resolve_urls([url])[url]
+            )
+
+    def test_in_scope(self):
+        hosts = {"example.com"}
+        self.assertTrue(crawler.in_scope("https://example.com/x", hosts))
+        self.assertTrue(crawler.in_scope("https://www.example.com/x", hosts))
+        self.assertFalse(crawler.in_scope("https://notexample.com/x", hosts))
+        self.assertFalse(crawler.in_scope("ftp://example.com/x", hosts))
+
+    def test_start_crawl(self):
+        crawl = crawler.start_crawl(self.seed, self.user, max_depth=1, rate_limit=0)
+        self.assertEqual(
+            set(FrontierUrl.objects.values_list("url", "depth")),
+            {
+                ("https://www.example.com/a", 1),
+                ("https://www.example.com/private", 1),
+                ("https://blog.www.example.com/b", 1),
+            },
+        )
+        seen = crawler.load_seen(crawl)
+        self.assertIn("https://www.example.com/", seen)
+        self.assertIn("https://www.example.com/a", seen)
+
+    @mock.patch("scraper.crawler.create_page")
+    def test_run_crawl(self, p_create_page):
+        def create_page(url, user):
+            page = baker.make("scraper.Page", url=url, created_by=user)
+            for url, target_id in resolve_urls(
+                ["https://www.example.com/c", "https://www.example.com"]
+            ).items():
+                baker.make("scraper.Link", page=page, target_id=target_id)
+            return "ok", 200
+
+        p_create_page.side_effect = create_page
+        crawl = crawler.start_crawl(self.seed, self.user, max_depth=2, rate_limit=0)
+        processed = crawler.run_crawl(crawl, robots=AllowAllRobots())
+
+        crawl.refresh_from_db()
+        self.assertEqual(crawl.status, Crawl.Status.DONE)
+        self.assertEqual(processed, 4)
+        self.assertEqual(
+            dict(FrontierUrl.objects.values_list("url", "status")),
+            {
+                "https://www.example.com/a": FrontierUrl.Status.DONE,
+                "https://www.example.com/private": FrontierUrl.Status.SKIPPED,
+                "https://blog.www.example.com/b": FrontierUrl.Status.DONE,
+                "https://www.example.com/c": FrontierUrl.Status.DONE,
+            },
+        )
+        # Depth 2 pages are scraped but their links are not followed.
+        self.assertEqual(p_create_page.call_count, 3)
+        self.assertEqual(Page.objects.count(), 4)
+
+    @mock.patch("scraper.crawler.create_page")
+    def test_resume_crawl(self, p_create_page):
+        p_create_page.return_value = "ok", 200
+        crawl = crawler.start_crawl(self.seed, self.user, max_depth=1, rate_limit=0)
+        FrontierUrl.objects.filter(url="https://www.example.com/a").update(
+            status=FrontierUrl.Status.DONE
+        )
+        crawler.run_crawl(crawl, robots=AllowAllRobots())
+        called_urls = {call.args[0] for call in p_create_page.call_args_list}
+        self.assertEqual(called_urls, {"https://blog.www.example.com/b"})
+
+    @mock.patch("scraper.crawler.create_page")
+    def test_run_crawl_interrupted(self, p_create_page):
+        def create_page(url, user):
+            page = baker.make("scraper.Page", url=url, created_by=user)
+            for url, target_id in resolve_urls(["https://www.example.com/c"]).items():
+                baker.make("scraper.Link", page=page, target_id=target_id)
+            return "ok", 200
+
+        p_create_page.side_effect = create_page
+        crawl = crawler.start_crawl(self.seed, self.user, max_depth=2, rate_limit=0)
+        with mock.patch(
+            "scraper.crawler.FrontierUrl.objects.bulk_update",
+            side_effect=RuntimeError("interrupted"),
+        ):
+            with self.assertRaises(RuntimeError):
+                crawler.run_crawl(crawl, robots=AllowAllRobots())
+        # The links found in the batch are not saved without its statuses.
+        self.assertFalse(
+            FrontierUrl.objects.filter(url="https://www.example.com/c").exists()
+        )
+        self.assertFalse(
+            FrontierUrl.objects.exclude(status=FrontierUrl.Status.QUEUED).exists()
+        )
+
+        crawler.run_crawl(crawl, robots=AllowAllRobots())
+        self.assertEqual(
+            FrontierUrl.objects.get(url="https://www.example.com/c").status,
+            FrontierUrl.Status.DONE,
+        )
+
+    def test_load_seen_adds_frontier(self):
+        crawl = crawler.start_crawl(self.seed, self.user, max_depth=1, rate_limit=0)
+        baker.make(FrontierUrl, crawl=crawl, url="https://www.example.com/d")
+        crawl.refresh_from_db()
+        self.assertIn("https://www.example.com/d", crawler.load_seen(crawl))
+
+    def test_politeness_order(self):
+        rows = [
+            FrontierUrl(url="https://a.example.com/1"),
+            FrontierUrl(url="https://a.example.com/2"),
+            FrontierUrl(url="https://b.example.com/1"),
+        ]
+        with mock.patch("scraper.crawler.time.sleep") as p_sleep:
+            ordered = list(crawler._politeness_order(rows, {}, 10))
+        self.assertEqual(
+            [row.url for row in ordered],
+            [
+                "https://a.example.com/1",
+                "https://b.example.com/1",
+                "https://a.example.com/2",
+            ],
+        )
+        p_sleep.assert_called_once()
@@ -0,0 +1,119 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from model_bakery import baker
+
+from scraper import bulk, feed, services
+from scraper.models import FeedCursor, LinkChange
+
+
+def changes() -> list[tuple[str, str]]:
+    return list(LinkChange.objects.order_by("pk").values_list("kind", "target__url"))
+
+
+class LinkChangeLogTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        self.url = "https://www.example.com"
+
+    def test_save_page(self):
+        links = [("https://www.example.com/a", "A"), ("https://www.example.com/b", "B")]
+        services.save_page(self.url, self.user, "Example", 200, links)
+        self.assertEqual(
+            changes(),
+            [
+                ("added", "https://www.example.com/a"),
+                ("added", "https://www.example.com/b"),
+            ],
+        )
+        page = services.Page.objects.get()
+        self.assertEqual(
+            set(LinkChange.objects.values_list("page_id", flat=True)), {page.pk}
+        )
+
+    def test_save_pages(self):
+        results = [
+            ("https://a.example.com", ("A", 200, [("https://a.example.com/x", "X")])),
+            ("https://b.example.com", ("B", 200, [("https://b.example.com/y", "Y")])),
+        ]
+        bulk.save_pages(results, self.user)
+        self.assertEqual(
+            changes(),
+            [
+                ("added", "https://a.example.com/x"),
+                ("added", "https://b.example.com/y"),
+            ],
+        )
+
+    def test_rescrape(self):
+        page = baker.make("scraper.Page", url=self.url)
+        for target_id in services.resolve_urls(
+            ["https://www.example.com/old", "https://www.example.com/kept"]
+        ).values():
+            baker.make("scraper.Link", page=page, target_id=target_id)
+        html = "<a href='/kept'>Kept</a><a href='/new'>New</a>"
+        response = mock.Mock(status_code=200, content=html.encode(), headers={})
+        services.apply_rescrape(page, response)
+        self.assertEqual(
+            changes(),
+            [
+                ("removed", "https://www.example.com/old"),
+                ("added", "https://www.example.com/new"),
+            ],
+        )
+
+        # Nothing changed, nothing logged.
+        services.apply_rescrape(page, response, force=True)
+        self.assertEqual(LinkChange.objects.count(), 2)
+
+    def test_delete_page(self):
+        links = [("https://www.example.com/a", "A"), ("https://www.example.com/b", "B")]
+        services.save_page(self.url, self.user, "Example", 200, links)
+        services.save_page("https://other.example.com", self.user, "Other", 200, [])
+        services.Page.objects.filter(url=self.url).delete()
+        self.assertEqual(
+            changes()[2:],
+            [
+                ("removed", "https://www.example.com/a"),
+                ("removed", "https://www.example.com/b"),
+            ],
+        )
+
+
+class ChangeFeedTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        self.client.force_login(self.user)
+        page = baker.make("scraper.Page", created_by=self.user)
+        other = baker.make("scraper.Page")
+        self.urls = [f"https://www.example.com/{i}" for i in range(3)]
+        for url, target_id in services.resolve_urls(self.urls).items():
+            baker.make("scraper.Link", page=page, target_id=target_id)
+            baker.make("scraper.Link", page=other, target_id=target_id)
+        services.log_new_links([page.pk, other.pk], services.timezone.now())
+
+    def test_change_list(self):
+        url = reverse("api:change_list")
+        data = self.client.get(url, {"limit": 2}).json()
+        self.assertEqual([change["url"] for change in data["results"]], self.urls[:2])
+        self.assertEqual({change["kind"] for change in data["results"]}, {"added"})
+        cursor = data["results"][-1]["seq"]
+        data = self.client.get(url, {"after": cursor}).json()
+        self.assertEqual([change["url"] for change in data["results"]], self.urls[2:])
+        self.assertIsNone(data["next"])
+
+    @mock.patch("pika.BlockingConnection")
+    def test_publish_changes(self, p_connection):
+        channel = p_connection.return_value.channel.return_value
+        self.assertEqual(feed.publish_changes(batch_size=4), 6)
+        self.assertEqual(channel.basic_publish.call_count, 6)
+        message = json.loads(channel.basic_publish.call_args_list[0].kwargs["body"])
+        self.assertEqual(message["url"], self.urls[0])
+        self.assertEqual(message["kind"], "added")
+        cursor = FeedCursor.objects.get()
+        self.assertEqual(cursor.position, LinkChange.objects.latest("pk").pk)
+
+        # Restarted, it carries on after the last published change.
+        self.assertEqual(feed.publish_changes(), 0)
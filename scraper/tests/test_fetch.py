@@ -0,0 +1,185 @@
+import threading
+import time
+from itertools import count, islice
+from unittest import mock
+
+import requests
+from django.test import TestCase, override_settings
+from model_bakery import baker
+
+from scraper import fetch
+from scraper.models import Link, Page
+from scraper.tests.helpers import StallingServer
+
+
+class FakeSession:
+    def __init__(self, pages, delay=0):
+        self.pages = pages
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_active = {}
+        self.errors = {}
+
+    def get(self, url, timeout, stream=False):
+        if url in self.errors:
+            raise self.errors[url]
+        host = fetch.urlsplit(url).netloc
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        time.sleep(self.delay)
+        with self.lock:
+            self.active[host] -= 1
+        response = mock.Mock(status_code=200, headers={"Content-Type": "text/html"})
+        if url not in self.pages or self.pages[url] is None:
+            response.status_code = 404
+            response.raise_for_status.side_effect = requests.HTTPError("404")
+        else:
+            response.iter_content.return_value = [self.pages[url].encode()]
+        return response
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class GetLinksManyTest(TestCase):
+    def test_get_links_many(self):
+        session = FakeSession(
+            {
+                "https://a.example.com": "<title>A</title><a href='/x'>X</a>",
+                "https://b.example.com": "<title>B</title>",
+            }
+        )
+        with mock.patch("scraper.fetch.make_session", return_value=session):
+            results = dict(fetch.get_links_many(list(session.pages)))
+        self.assertEqual(
+            results,
+            {
+                "https://a.example.com": ("A", 200, [("https://a.example.com/x", "X")]),
+                "https://b.example.com": ("B", 200, []),
+            },
+        )
+
+    @mock.patch("scraper.services.logger.error")
+    def test_get_links_many_error(self, p_error):
+        session = FakeSession({"https://a.example.com": None})
+        with mock.patch("scraper.fetch.make_session", return_value=session):
+            results = dict(fetch.get_links_many(["https://a.example.com"]))
+        self.assertEqual(results["https://a.example.com"], ("404", 404, []))
+        p_error.assert_called_once()
+
+    def test_per_host_limit(self):
+        pages = {f"https://a.example.com/{i}": "" for i in range(8)}
+        pages.update({f"https://b.example.com/{i}": "" for i in range(8)})
+        session = FakeSession(pages, delay=0.02)
+        with mock.patch("scraper.fetch.make_session", return_value=session):
+            results = list(fetch.get_links_many(pages, concurrency=8, per_host=2))
+        self.assertEqual(len(results), 16)
+        self.assertEqual(session.max_active, {"a.example.com": 2, "b.example.com": 2})
+
+    @mock.patch("scraper.fetch.logger.exception")
+    def test_unexpected_error(self, p_exception):
+        session = FakeSession({"https://a.example.com": "<title>A</title>"})
+        session.errors["https://b.example.com"] = ValueError("boom")
+        urls = ["https://a.example.com", "https://b.example.com"]
+        for parse_workers in (0, 1):
+            with mock.patch("scraper.fetch.make_session", return_value=session):
+                results = dict(fetch.get_links_many(urls, parse_workers=parse_workers))
+            self.assertEqual(
+                results,
+                {
+                    "https://a.example.com": ("A", 200, []),
+                    "https://b.example.com": ("boom", 500, []),
+                },
+            )
+        self.assertEqual(p_exception.call_count, 2)
+
+    @mock.patch("scraper.services.logger.error")
+    def test_urls_read_lazily(self, p_error):
+        urls = (f"https://a.example.com/{i}" for i in count())
+        with mock.patch("scraper.fetch.make_session", return_value=FakeSession({})):
+            results = list(islice(fetch.get_links_many(urls, concurrency=2), 3))
+        self.assertEqual(len(results), 3)
+
+
+class IterAsyncTest(TestCase):
+    def test_consumer_stops(self):
+        closed = threading.Event()
+
+        async def numbers():
+            try:
+                for i in range(5000):
+                    yield i
+            finally:
+                closed.set()
+
+        items = fetch._iter_async(numbers())
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertTrue(closed.is_set())
+
+    def test_producer_error(self):
+        async def numbers():
+            yield 1
+            raise ValueError("boom")
+
+        items = fetch._iter_async(numbers())
+        self.assertEqual(next(items), 1)
+        with self.assertRaisesMessage(ValueError, "boom"):
+            next(items)
+
+
+@mock.patch("scraper.services.logger.error")
+@override_settings(SCRAPER_FETCH_TIMEOUT=0.2)
+class StalledBodyTest(TestCase):
+    def test_get_links_many(self, p_error):
+        with StallingServer() as server:
+            urls = [server.url("/a"), server.url("/b")]
+            results = dict(fetch.get_links_many(urls))
+            self.assertEqual(
+                {url: (status, links) for url, (_, status, links) in results.items()},
+                {url: (500, []) for url in urls},
+            )
+            results = dict(fetch.get_links_many(urls, parse_workers=1))
+            self.assertEqual(
+                {url: (status, links) for url, (_, status, links) in results.items()},
+                {url: (500, []) for url in urls},
+            )
+
+
+class CreatePagesTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+
+    @mock.patch("scraper.fetch.get_links_many")
+    def test_create_pages(self, p_get_links_many):
+        p_get_links_many.return_value = [
+            ("https://a.example.com", ("A", 200, [("https://a.example.com/x", "X")])),
+            ("https://b.example.com", ("Not Found", 404, [])),
+        ]
+        results = list(
+            fetch.create_pages(
+                ["https://a.example.com", "https://b.example.com"], self.user
+            )
+        )
+        self.assertEqual(
+            results,
+            [
+                (
+                    "https://a.example.com",
+                    "Page https://a.example.com successfully scraped",
+                    200,
+                ),
+                (
+                    "https://b.example.com",
+                    "Page https://b.example.com bad response",
+                    404,
+                ),
+            ],
+        )
+        self.assertEqual(Page.objects.get().name, "A")
+        self.assertEqual(Link.objects.count(), 1)
@@ -0,0 +1,184 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from model_bakery import baker
+
+from scraper import jobs
+from scraper.brokers import DatabaseBroker
+from scraper.models import ScrapeJob
+
+
+class DatabaseBrokerTest(TestCase):
+    def setUp(self):
+        self.broker = DatabaseBroker(worker="node-1", lease=60, max_attempts=2)
+
+    def test_claim(self):
+        first, second = baker.make("scraper.ScrapeJob", _quantity=2)
+        claimed = self.broker.claim(1)
+        self.assertEqual(claimed, [first])
+        self.assertEqual(claimed[0].status, ScrapeJob.Status.RUNNING)
+        self.assertIsNotNone(claimed[0].started_at)
+        self.assertEqual(claimed[0].worker, "node-1")
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertGreater(claimed[0].lease_expires_at, timezone.now())
+        self.assertEqual(self.broker.claim(5), [second])
+        self.assertEqual(self.broker.claim(5), [])
+
+    def test_claim_skip_locked(self):
+        first, second = baker.make("scraper.ScrapeJob", _quantity=2)
+        with mock.patch.object(
+            connection.features, "has_select_for_update_skip_locked", True
+        ):
+            self.assertEqual(self.broker.claim(1), [first])
+            self.assertEqual(self.broker.claim(5), [second])
+            self.assertEqual(self.broker.claim(5), [])
+
+    def test_claim_lost_race(self):
+        first, second = baker.make("scraper.ScrapeJob", _quantity=2)
+        other = DatabaseBroker(worker="node-2")
+        take = self.broker.take
+
+        def race(jobs, now):
+            # node-2 claims the row between our SELECT and UPDATE.
+            if not other.leased:
+                other.claim(1)
+            return take(jobs, now)
+
+        with mock.patch.object(self.broker, "take", side_effect=race):
+            self.assertEqual(self.broker.claim(1), [second])
+        self.assertEqual(other.leased, {first.pk})
+
+    def test_claim_skips_finished_jobs(self):
+        baker.make("scraper.ScrapeJob", status=ScrapeJob.Status.DONE)
+        self.assertEqual(self.broker.claim(5), [])
+
+    def test_claim_skips_leased_jobs(self):
+        baker.make(
+            "scraper.ScrapeJob",
+            status=ScrapeJob.Status.RUNNING,
+            worker="node-2",
+            attempts=1,
+            lease_expires_at=timezone.now() + timedelta(seconds=60),
+        )
+        self.assertEqual(self.broker.claim(5), [])
+
+    def test_reclaim_expired_lease(self):
+        job = baker.make(
+            "scraper.ScrapeJob",
+            status=ScrapeJob.Status.RUNNING,
+            worker="node-2",
+            attempts=1,
+            lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        (claimed,) = self.broker.claim(5)
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.worker, "node-1")
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_fail_abandoned_jobs(self):
+        job = baker.make(
+            "scraper.ScrapeJob",
+            status=ScrapeJob.Status.RUNNING,
+            attempts=2,
+            lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.broker.claim(5), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScrapeJob.Status.FAILED)
+        self.assertEqual(job.message, "Lease expired 2 times")
+
+    def test_heartbeat_renews_leases(self):
+        baker.make("scraper.ScrapeJob")
+        (job,) = self.broker.claim(1)
+        ScrapeJob.objects.update(lease_expires_at=timezone.now())
+        self.broker.renewed_at -= 60
+        self.broker.heartbeat()
+        job.refresh_from_db()
+        self.assertGreater(job.lease_expires_at, timezone.now() + timedelta(seconds=50))
+
+        self.broker.ack(job)
+        self.assertEqual(self.broker.leased, set())
+
+
+class RunJobTest(TestCase):
+    def setUp(self):
+        self.job = baker.make("scraper.ScrapeJob", url="https://www.example.com")
+
+    @mock.patch("scraper.jobs.create_page")
+    def test_run_job(self, p_create_page):
+        p_create_page.return_value = "Page scraped", 200
+        jobs.run_job(self.job)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ScrapeJob.Status.DONE)
+        self.assertEqual(self.job.status_code, 200)
+        self.assertEqual(self.job.message, "Page scraped")
+        self.assertIsNotNone(self.job.finished_at)
+        p_create_page.assert_called_once_with(self.job.url, self.job.created_by)
+
+    @mock.patch("scraper.jobs.create_page")
+    def test_run_job_bad_response(self, p_create_page):
+        p_create_page.return_value = "Page bad response", 404
+        jobs.run_job(self.job)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ScrapeJob.Status.FAILED)
+        self.assertEqual(self.job.status_code, 404)
+
+    @mock.patch("scraper.jobs.logger.exception")
+    @mock.patch("scraper.jobs.create_page")
+    def test_run_job_exception(self, p_create_page, p_exception):
+        p_create_page.side_effect = ValueError("boom")
+        jobs.run_job(self.job)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ScrapeJob.Status.FAILED)
+        self.assertEqual(self.job.message, "boom")
+        p_exception.assert_called_once()
+
+    @mock.patch("scraper.jobs.logger.warning")
+    @mock.patch("scraper.jobs.create_page")
+    def test_run_job_reclaimed(self, p_create_page, p_warning):
+        p_create_page.return_value = "Page scraped", 200
+        # Another worker claimed the job again after this lease expired.
+        ScrapeJob.objects.filter(pk=self.job.pk).update(
+            status=ScrapeJob.Status.RUNNING, attempts=2
+        )
+        self.job.attempts = 1
+        jobs.run_job(self.job)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ScrapeJob.Status.RUNNING)
+        self.assertEqual(self.job.message, "")
+        p_warning.assert_called_once()
+
+
+class ScrapeAdminTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User", is_superuser=True, is_staff=True)
+        self.client.force_login(self.user)
+
+    @mock.patch("scraper.jobs.create_page")
+    def test_scrape_enqueues_job(self, p_create_page):
+        url = "https://www.example.com"
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("admin:scraper_page_scrape"), {"url": url}
+            )
+        self.assertRedirects(response, reverse("admin:scraper_page_changelist"))
+        job = ScrapeJob.objects.get()
+        self.assertEqual(job.url, url)
+        self.assertEqual(job.created_by, self.user)
+        self.assertEqual(job.status, ScrapeJob.Status.QUEUED)
+        p_create_page.assert_not_called()
+
+    def test_changelist_shows_jobs(self):
+        baker.make(
+            "scraper.ScrapeJob",
+            url="https://www.example.com",
+            created_by=self.user,
+            status=ScrapeJob.Status.FAILED,
+        )
+        response = self.client.get(reverse("admin:scraper_page_changelist"))
+        self.assertContains(response, "Recent scrape jobs")
+        self.assertContains(response, "Failed")
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.test import TestCase
+from django.utils import timezone
+from model_bakery import baker
+
+from scraper import linkcheck
+from scraper.models import Url
+from scraper.services import resolve_urls
+from scraper.tests.helpers import make_response
+
+
+class CheckUrlTest(TestCase):
+    def setUp(self):
+        self.session = mock.Mock()
+        self.url = "https://www.example.com/a"
+
+    def test_redirect(self):
+        self.session.head.return_value = make_response("https://www.example.com/b")
+        self.assertEqual(
+            linkcheck.check_url(self.session, self.url, 5),
+            (200, "https://www.example.com/b"),
+        )
+        self.session.head.assert_called_once_with(
+            self.url, timeout=5, allow_redirects=True
+        )
+        self.session.get.assert_not_called()
+
+    def test_head_refused(self):
+        self.session.head.return_value = make_response(self.url, status=405)
+        self.session.get.return_value = make_response(self.url, status=206)
+        self.assertEqual(linkcheck.check_url(self.session, self.url, 5), (206, ""))
+        self.assertEqual(
+            self.session.get.call_args.kwargs["headers"], {"Range": "bytes=0-0"}
+        )
+        self.assertTrue(self.session.get.return_value.raw.closed)
+
+    def test_unreachable(self):
+        self.session.head.side_effect = requests.ConnectionError("refused")
+        self.assertEqual(linkcheck.check_url(self.session, self.url, 5), (None, ""))
+
+
+class CheckLinksTest(TestCase):
+    def setUp(self):
+        urls = resolve_urls(
+            [
+                "https://www.example.com/ok",
+                "https://www.example.com/dead",
+                "https://other.example.com/ok",
+            ]
+        )
+        self.ids = list(urls.values())
+        for page in baker.make("scraper.Page", _quantity=2):
+            for target_id in self.ids:
+                baker.make("scraper.Link", page=page, target_id=target_id)
+        # Not linked from any page, never checked.
+        baker.make("scraper.Url", url="https://www.example.com/orphan")
+
+    @mock.patch("scraper.client.FetchClient.head")
+    def test_check_links(self, p_head):
+        p_head.side_effect = lambda url, **kwargs: make_response(
+            url, status=404 if "dead" in url else 200
+        )
+        results = dict(linkcheck.check_links(batch_size=2))
+        # Each URL once, though two pages link to it.
+        self.assertEqual(p_head.call_count, 3)
+        self.assertEqual(results["https://www.example.com/dead"], (404, ""))
+        statuses = dict(Url.objects.values_list("url", "status_code"))
+        self.assertEqual(
+            statuses,
+            {
+                "https://www.example.com/ok": 200,
+                "https://www.example.com/dead": 404,
+                "https://other.example.com/ok": 200,
+                "https://www.example.com/orphan": None,
+            },
+        )
+        self.assertEqual(Url.objects.filter(checked_at__isnull=False).count(), 3)
+
+        # Checked recently, skipped.
+        results = list(linkcheck.check_links(older_than=timedelta(hours=1)))
+        self.assertEqual(results, [])
+        Url.objects.filter(pk=self.ids[0]).update(
+            checked_at=timezone.now() - timedelta(hours=2)
+        )
+        results = list(linkcheck.check_links(older_than=timedelta(hours=1)))
+        self.assertEqual(results, [("https://www.example.com/ok", (200, ""))])
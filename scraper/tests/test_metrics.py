@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from model_bakery import baker
+from prometheus_client import REGISTRY
+
+from scraper import services
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTest(TestCase):
+    def test_metrics_view(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "scraper_fetch_seconds_bucket")
+        self.assertContains(response, "scraper_links_extracted_total")
+
+    @mock.patch("scraper.services.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_links_metrics(self, p_get, p_error):
+        responses = sample("scraper_responses_total", status="200")
+        fetches = sample("scraper_fetch_seconds_count")
+        parses = sample("scraper_parse_seconds_count")
+        links = sample("scraper_links_extracted_total")
+        p_get.return_value.headers = {"Content-Type": "text/html"}
+        p_get.return_value.iter_content.return_value = [
+            b"<a href='/a'>A</a><a href='/b'>B</a>"
+        ]
+        p_get.return_value.status_code = 200
+        services.get_links("https://www.example.com")
+        self.assertEqual(sample("scraper_responses_total", status="200"), responses + 1)
+        self.assertEqual(sample("scraper_fetch_seconds_count"), fetches + 1)
+        self.assertEqual(sample("scraper_parse_seconds_count"), parses + 1)
+        self.assertEqual(sample("scraper_links_extracted_total"), links + 2)
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_create_page_metrics(self, p_get):
+        parses = sample("scraper_parse_seconds_count")
+        inserts = sample("scraper_db_seconds_count", operation="create_page")
+        links = sample("scraper_links_extracted_total")
+        p_get.return_value.headers = {"Content-Type": "text/html"}
+        p_get.return_value.iter_content.return_value = [
+            b"<a href='/a'>A</a><a href='/b'>B</a>"
+        ]
+        p_get.return_value.status_code = 200
+        services.create_page("https://www.example.com", baker.make("auth.User"))
+        self.assertEqual(sample("scraper_parse_seconds_count"), parses + 1)
+        self.assertEqual(
+            sample("scraper_db_seconds_count", operation="create_page"), inserts + 1
+        )
+        # Counted once, when parsed, not again when stored.
+        self.assertEqual(sample("scraper_links_extracted_total"), links + 2)
+
+    @mock.patch("scraper.services.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_links_error_status(self, p_get, p_error):
+        errors = sample("scraper_responses_total", status="404")
+        p_get.return_value.status_code = 404
+        p_get.return_value.raise_for_status.side_effect = services.requests.HTTPError(
+            "404"
+        )
+        name, status, links = services.get_links("https://www.example.com")
+        self.assertEqual(status, 404)
+        self.assertEqual(sample("scraper_responses_total", status="404"), errors + 1)
+
+    @mock.patch("scraper.services.logger.error")
+    def test_save_page_metrics(self, p_error):
+        user = baker.make("auth.User")
+        duplicates = sample("scraper_duplicate_links_total")
+        inserts = sample("scraper_db_seconds_count", operation="create_page")
+        integrity_errors = sample("scraper_integrity_errors_total", operation="page")
+        links = [("https://www.example.com/a", "A"), ("https://www.example.com/a", "A")]
+        services.save_page("https://www.example.com", user, "", 200, links)
+        self.assertEqual(sample("scraper_duplicate_links_total"), duplicates + 1)
+        self.assertEqual(
+            sample("scraper_db_seconds_count", operation="create_page"), inserts + 1
+        )
+        with mock.patch(
+            "scraper.services.Page.objects.get_or_create",
+            side_effect=services.IntegrityError("duplicate key"),
+        ):
+            services.save_page("https://www.example.com/b", user, "", 200, [])
+        self.assertEqual(
+            sample("scraper_integrity_errors_total", operation="page"),
+            integrity_errors + 1,
+        )
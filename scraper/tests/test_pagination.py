@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase
+from model_bakery import baker
+
+from scraper.models import Link
+from scraper.pagination import KeysetPage, parse_cursor, prefix_filter
+
+
+class KeysetPageTest(TestCase):
+    def setUp(self):
+        self.page = baker.make("scraper.Page")
+        self.links = baker.make("scraper.Link", page=self.page, _quantity=25)
+        self.queryset = self.page.link_set.all()
+
+    def test_first_page(self):
+        page = KeysetPage(self.queryset, per_page=10)
+        self.assertEqual(list(page), self.links[:10])
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+        self.assertEqual(page.next_cursor, self.links[9].pk)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_after(self):
+        page = KeysetPage(self.queryset, per_page=10, after=self.links[19].pk)
+        self.assertEqual(list(page), self.links[20:])
+        self.assertTrue(page.has_previous)
+        self.assertFalse(page.has_next)
+        self.assertEqual(page.previous_cursor, self.links[20].pk)
+        self.assertIsNone(page.next_cursor)
+
+    def test_before(self):
+        page = KeysetPage(self.queryset, per_page=10, before=self.links[20].pk)
+        self.assertEqual(list(page), self.links[10:20])
+        self.assertTrue(page.has_previous)
+        self.assertTrue(page.has_next)
+        page = KeysetPage(self.queryset, per_page=10, before=self.links[10].pk)
+        self.assertEqual(list(page), self.links[:10])
+        self.assertFalse(page.has_previous)
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            KeysetPage(self.queryset, per_page=10, after=self.links[5].pk).has_next
+
+    def test_parse_cursor(self):
+        self.assertEqual(parse_cursor("12"), 12)
+        self.assertIsNone(parse_cursor("x"))
+        self.assertIsNone(parse_cursor(None))
+
+    def test_prefix_filter(self):
+        baker.make("scraper.Link", page=self.page, name="Example")
+        baker.make("scraper.Link", page=self.page, name="Examples")
+        baker.make("scraper.Link", page=self.page, name="Exampl")
+        names = Link.objects.filter(**prefix_filter("name", "Example")).values_list(
+            "name", flat=True
+        )
+        self.assertEqual(sorted(names), ["Example", "Examples"])
+
+    def test_index_used(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+        queries = [
+            self.queryset.filter(pk__gt=100).order_by("pk")[:11],
+            self.queryset.filter(**prefix_filter("name", "Ex")),
+            Link.objects.filter(target__host="www.example.com"),
+        ]
+        for queryset in queries:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = " ".join(row[-1] for row in cursor.fetchall())
+            self.assertIn("USING INDEX", plan)
+            self.assertNotIn("SCAN scraper_link", plan.replace("USING INDEX", ""))
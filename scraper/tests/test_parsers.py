@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from scraper import parsers, services
+
+HTML = (
+    "<html><head><title>Example &amp; Title</title></head><body>"
+    "<a href='/relative'>Relative</a>"
+    "<a href='https://www.google.com'>  <b>Google</b> search </a>"
+    "<a href='https://www.example.com/empty'></a>"
+    "<a name='anchor'>No href</a>"
+    "<a href>Empty href</a>"
+    "<a href='/long'>" + "x" * 200 + "</a>"
+    "<!-- <a href='/commented'>Commented</a> -->"
+    "<a href='/unclosed'>Unclosed"
+    "</body></html>"
+)
+
+
+def parse(parser_class, chunks):
+    parser = parser_class("https://www.example.com/page")
+    links = list(parser.iter_links(chunks))
+    return parser.title, links
+
+
+class LinkParserTest(TestCase):
+    def test_parsers_agree(self):
+        expected = parse(parsers.SoupLinkParser, [HTML])
+        self.assertEqual(expected[0], "Example & Title")
+        self.assertEqual(
+            [url for url, _ in expected[1]],
+            [
+                "https://www.example.com/relative",
+                "https://www.google.com",
+                "https://www.example.com/page",
+                "https://www.example.com/long",
+                "https://www.example.com/unclosed",
+            ],
+        )
+        self.assertEqual(parse(parsers.StreamingLinkParser, [HTML]), expected)
+
+    def test_streaming_parser_chunks(self):
+        expected = parse(parsers.SoupLinkParser, [HTML])
+        for size in (1, 3, 7, 64):
+            chunks = [HTML[i : i + size] for i in range(0, len(HTML), size)]
+            self.assertEqual(parse(parsers.StreamingLinkParser, chunks), expected)
+
+    def test_streaming_parser_yields_incrementally(self):
+        parser = parsers.StreamingLinkParser("https://www.example.com")
+        self.assertEqual(
+            parser.feed("<a href='/a'>A</a><a href='/b'>"),
+            [("https://www.example.com/a", "A")],
+        )
+        self.assertEqual(parser.feed("B</a>"), [("https://www.example.com/b", "B")])
+        self.assertEqual(parser.close(), [])
+
+    def test_title_with_children(self):
+        html = "<title>Example <b>Title</b></title>"
+        self.assertEqual(parse(parsers.SoupLinkParser, [html])[0], "")
+        self.assertEqual(parse(parsers.StreamingLinkParser, [html])[0], "")
+
+    def test_iter_text(self):
+        response = mock.Mock(headers={"Content-Type": "text/html; charset=utf-8"})
+        data = "¿Qué tal? ñandú".encode()
+        response.iter_content.return_value = [data[i : i + 1] for i in range(len(data))]
+        self.assertEqual("".join(parsers.iter_text(response)), "¿Qué tal? ñandú")
+
+    def test_iter_text_unknown_encoding(self):
+        response = mock.Mock(headers={"Content-Type": "text/html; charset=nope"})
+        response.iter_content.return_value = [b"abc"]
+        self.assertEqual("".join(parsers.iter_text(response)), "abc")
+
+    def test_iter_text_detects_encoding(self):
+        response = mock.Mock(headers={"Content-Type": "text/html"})
+        data = "<p>Привет, как дела? Это проверка кодировки страницы.</p>" * 20
+        response.iter_content.return_value = [data.encode("cp1251")]
+        self.assertEqual("".join(parsers.iter_text(response)), data)
+
+    def test_detect_encoding(self):
+        detect = parsers.detect_encoding
+        self.assertEqual(detect("text/html; charset=ISO-8859-1", b"abc"), "iso8859-1")
+        self.assertEqual(detect("text/html; charset=utf-8", b"\xff\xfea\x00"), "utf-16")
+        self.assertEqual(detect("text/html", b"\xef\xbb\xbfabc"), "utf-8-sig")
+        self.assertEqual(
+            detect("text/html", b'<head><meta charset="windows-1252">'), "cp1252"
+        )
+        self.assertEqual(
+            detect(
+                "text/html",
+                b'<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">',
+            ),
+            "koi8-r",
+        )
+        # A multi-byte character cut at the end of the prefix is still utf-8.
+        self.assertEqual(detect("", "ñandú".encode()[:-1]), "utf-8")
+        self.assertEqual(detect("text/html; charset=nope", b"abc"), "utf-8")
+
+    def test_title_parser(self):
+        parser = parsers.TitleParser("https://www.example.com")
+        chunks = iter(["<title>T</title><a href='/a'>A</a>", "<a href='/b'>B</a>"])
+        self.assertEqual(list(parser.iter_links(chunks)), [])
+        self.assertEqual(parser.title, "T")
+        self.assertEqual(list(chunks), ["<a href='/b'>B</a>"])
+
+
+@override_settings(SCRAPER_PARSER="scraper.parsers.StreamingLinkParser")
+class StreamingGetLinksTest(TestCase):
+    @mock.patch("scraper.services.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_links(self, p_get, p_error):
+        p_get.return_value.headers = {"Content-Type": "text/html"}
+        p_get.return_value.iter_content.return_value = [
+            b"<html><head><title>Example Title</title></head><body>",
+            b"<a href='https://www.example.com'>Example</a></body></html>",
+        ]
+        p_get.return_value.status_code = 200
+        name, status, links = services.get_links("https://www.example.com")
+        self.assertEqual(name, "Example Title")
+        self.assertEqual(links, [("https://www.example.com", "Example")])
+        p_get.assert_called_once_with("https://www.example.com", timeout=5, stream=True)
+        p_error.assert_not_called()
@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from scraper import fetch, pool
+
+
+class ParseManyTest(TestCase):
+    def test_parse_body(self):
+        url, title, links, seconds = pool.parse_body(
+            "scraper.parsers.SoupLinkParser",
+            "https://www.example.com",
+            "<title>Café</title><a href='/a'>Ñ</a>".encode("latin-1"),
+            "latin-1",
+        )
+        self.assertEqual(url, "https://www.example.com")
+        self.assertEqual(title, "Café")
+        self.assertEqual(links, [("https://www.example.com/a", "Ñ")])
+        self.assertIs(type(title), str)
+
+    def test_parse_many(self):
+        items = [
+            (f"https://www.example.com/{i}", f"<title>{i}</title>".encode(), None)
+            for i in range(10)
+        ]
+        results = list(pool.parse_many(items, workers=2))
+        self.assertEqual(
+            sorted(results),
+            sorted((url, url.rsplit("/", 1)[1], []) for url, _, _ in items),
+        )
+
+
+class ParallelGetLinksManyTest(TestCase):
+    @mock.patch("scraper.services.logger.error")
+    def test_get_links_many_parse_workers(self, p_error):
+        def fetcher(session, url, timeout):
+            if url.endswith("missing"):
+                return "404", 404, None, None
+            return "", 200, b"<title>T</title><a href='/a'>A</a>", "utf-8"
+
+        async_get_links = fetch.async_get_links
+
+        def patched(urls, **kwargs):
+            kwargs["fetcher"] = fetcher
+            return async_get_links(urls, **kwargs)
+
+        with mock.patch("scraper.fetch.async_get_links", side_effect=patched):
+            results = dict(
+                fetch.get_links_many(
+                    ["https://www.example.com", "https://www.example.com/missing"],
+                    parse_workers=2,
+                )
+            )
+        self.assertEqual(
+            results,
+            {
+                "https://www.example.com": (
+                    "T",
+                    200,
+                    [("https://www.example.com/a", "A")],
+                ),
+                "https://www.example.com/missing": ("404", 404, []),
+            },
+        )
@@ -0,0 +1,50 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from model_bakery import baker
+
+from scraper import scheduler
+from scraper.models import Page
+
+
+class ClaimDuePagesTest(TestCase):
+    def test_claim_due_pages(self):
+        now = timezone.now()
+        later = baker.make("scraper.Page", next_crawl_at=now - timedelta(hours=1))
+        first = baker.make("scraper.Page", next_crawl_at=now - timedelta(hours=2))
+        baker.make("scraper.Page", next_crawl_at=now + timedelta(hours=1))
+        baker.make("scraper.Page", next_crawl_at=None)
+
+        with self.assertNumQueries(4):
+            self.assertEqual(scheduler.claim_due_pages(5, now), [first, later])
+        # Leased, another scheduler does not see them until the lease expires.
+        self.assertEqual(scheduler.claim_due_pages(5, now), [])
+        lease_expired = now + timedelta(seconds=301)
+        self.assertCountEqual(
+            scheduler.claim_due_pages(5, lease_expired), [first, later]
+        )
+
+
+class RunSchedulerTest(TestCase):
+    @mock.patch("scraper.scheduler.time.sleep")
+    @mock.patch("scraper.scheduler.conditional_get")
+    def test_run_scheduler(self, p_get, p_sleep):
+        p_get.return_value = mock.Mock(status_code=304)
+        now = timezone.now()
+        pages = baker.make(
+            "scraper.Page",
+            next_crawl_at=now - timedelta(minutes=1),
+            crawl_interval=3600,
+            _quantity=3,
+        )
+        results = list(scheduler.run_scheduler(rate=1, batch_size=2, once=True))
+        self.assertEqual([status for _, _, status in results], [304] * 3)
+        self.assertEqual(p_get.call_count, 3)
+        # Two batches of 2 and 1 pages at 1 page per second.
+        self.assertEqual(len(p_sleep.call_args_list), 2)
+        self.assertGreater(p_sleep.call_args_list[0].args[0], 1.5)
+        for page in Page.objects.filter(pk__in=[page.pk for page in pages]):
+            self.assertEqual(page.crawl_interval, 5400)
+            self.assertGreater(page.next_crawl_at, now + timedelta(minutes=89))
@@ -0,0 +1,149 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from model_bakery import baker
+
+from scraper import bulk, search, services
+from scraper.models import Link, Page
+
+
+def install_search():
+    # Tests run without migrations, install the index the migration adds.
+    search.install(connection.schema_editor())
+
+
+def indexed(table: str, query: str) -> list[int]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s",
+            [search.fts5_query(search.query_words(query))],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        # Stored before the index exists, added by the backfill.
+        self.python = baker.make(
+            "scraper.Page", url="https://www.python.org/", name="Python"
+        )
+        install_search()
+        services.save_page(
+            "https://docs.example.com/tutorial",
+            self.user,
+            "Python tutorial and other programming guides",
+            200,
+            [
+                ("https://docs.example.com/install", "Installing Python"),
+                ("https://www.djangoproject.com/", "Web framework"),
+            ],
+        )
+        self.tutorial = Page.objects.get(url="https://docs.example.com/tutorial")
+
+    def test_search_pages(self):
+        # Ranked, the shorter title matches best.
+        self.assertEqual(
+            search.search(Page.objects.all(), "python"), [self.python, self.tutorial]
+        )
+        # Words are prefixes, all of them in the name or all in the URL.
+        self.assertEqual(
+            search.search(Page.objects.all(), "Prog TUTOR"), [self.tutorial]
+        )
+        self.assertEqual(
+            search.search(Page.objects.all(), "docs example"), [self.tutorial]
+        )
+        self.assertEqual(search.search(Page.objects.all(), "python docs"), [])
+        self.assertEqual(
+            search.search(Page.objects.all(), "python", limit=1), [self.python]
+        )
+        self.assertEqual(search.search(Page.objects.all(), "!!"), [])
+        self.assertEqual(
+            list(
+                search.search_filter(
+                    Page.objects.filter(created_by=self.user), "python"
+                )
+            ),
+            [self.tutorial],
+        )
+
+    def test_search_links(self):
+        links = Link.objects.select_related("target")
+        self.assertEqual(
+            [link.url for link in search.search(links, "installing")],
+            ["https://docs.example.com/install"],
+        )
+        self.assertEqual(
+            [link.url for link in search.search(links, "djangoproject")],
+            ["https://www.djangoproject.com/"],
+        )
+
+    def test_index_follows_changes(self):
+        self.tutorial.name = "Guides"
+        self.tutorial.save()
+        self.assertEqual(search.search(Page.objects.all(), "tutorial"), [self.tutorial])
+        self.assertEqual(search.search(Page.objects.all(), "programming"), [])
+        self.assertEqual(search.search(Page.objects.all(), "guides"), [self.tutorial])
+
+        Link.objects.filter(name="Web framework").delete()
+        self.assertEqual(indexed("scraper_link", "framework"), [])
+        self.python.delete()
+        self.assertEqual(indexed("scraper_page", "python"), [])
+
+    def test_bulk_insert(self):
+        bulk.save_pages(
+            [
+                (
+                    "https://blog.example.com/",
+                    ("Rust weekly", 200, [("https://blog.example.com/1", "Ownership")]),
+                )
+            ],
+            self.user,
+        )
+        self.assertEqual(
+            search.search(Page.objects.all(), "rust"),
+            [Page.objects.get(url="https://blog.example.com/")],
+        )
+        self.assertEqual(
+            [link.name for link in search.search(Link.objects.all(), "owner")],
+            ["Ownership"],
+        )
+
+    def test_admin_search(self):
+        admin = baker.make("auth.User", is_superuser=True, is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:scraper_page_changelist"), {"q": "tutorial"}
+        )
+        self.assertEqual(list(response.context["cl"].result_list), [self.tutorial])
+        response = self.client.get(
+            reverse("admin:scraper_link_changelist"), {"q": "framework"}
+        )
+        self.assertEqual(
+            [link.name for link in response.context["cl"].result_list],
+            ["Web framework"],
+        )
+
+    def test_api_search(self):
+        self.client.force_login(self.user)
+        data = self.client.get(reverse("api:page_search"), {"q": "python"}).json()
+        # Only the user's own pages.
+        self.assertEqual([page["id"] for page in data["results"]], [self.tutorial.pk])
+        data = self.client.get(reverse("api:link_search"), {"q": "web"}).json()
+        self.assertEqual(
+            [link["url"] for link in data["results"]],
+            ["https://www.djangoproject.com/"],
+        )
+
+
+class PostgresQueryTest(TestCase):
+    @mock.patch("scraper.search.connection")
+    def test_link_matches_union(self, p_connection):
+        p_connection.vendor = "postgresql"
+        sql, params = search._matches_sql("scraper_link", "python:*")
+        # One index-backed select per table, an OR across them is a seq scan.
+        self.assertIn(" UNION ", sql)
+        self.assertNotIn(" OR ", sql)
+        self.assertEqual(len(params), sql.count("%s"))
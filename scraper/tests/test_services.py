@@ -1,10 +1,21 @@
+import io
+import tracemalloc
+from datetime import datetime, timedelta, timezone
 from unittest import mock
 
-from django.db import IntegrityError
-from django.test import TestCase
+import requests
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
 from model_bakery import baker
 
 from scraper import services
+from scraper.tests.helpers import StallingServer, make_response
+
+
+def mock_response(p_get, html, content_type="text/html; charset=utf-8"):
+    p_get.return_value.status_code = 200
+    p_get.return_value.headers = {"Content-Type": content_type}
+    p_get.return_value.iter_content.return_value = [html.encode()]
 
 
 class GetLinksTest(TestCase):
@@ -12,41 +23,80 @@ class GetLinksTest(TestCase):
         self.url = "https://www.example.com"
 
     @mock.patch("scraper.services.logger.error")
-    @mock.patch("scraper.services.requests.get")
+    @mock.patch("scraper.client.FetchClient.get")
     def test_get_links(self, p_get, p_error):
-        p_get.return_value.text = "<html><head><title>Example Title</title></head><body><a href='https://www.example.com'>Example</a></body></html>"
-        p_get.return_value.status_code = 200
+        mock_response(
+            p_get,
+            "<html><head><title>Example Title</title></head>"
+            "<body><a href='https://www.example.com'>Example</a></body></html>",
+        )
         name, status, links = services.get_links(self.url)
         self.assertEqual(name, "Example Title")
         self.assertEqual(links, [("https://www.example.com", "Example")])
         p_error.assert_not_called()
 
     @mock.patch("scraper.services.logger.error")
-    @mock.patch("scraper.services.requests.get")
+    @mock.patch("scraper.client.FetchClient.get")
     def test_get_links_no_title(self, p_get, p_error):
-        p_get.return_value.text = (
-            "<html><body><a href='https://www.example.com'>Example</a></body></html>"
+        mock_response(
+            p_get,
+            "<html><body><a href='https://www.example.com'>Example</a></body></html>",
         )
-        p_get.return_value.status_code = 200
         name, status, links = services.get_links(self.url)
         self.assertEqual(name, "")
         self.assertEqual(links, [("https://www.example.com", "Example")])
         p_error.assert_not_called()
 
     @mock.patch("scraper.services.logger.error")
-    @mock.patch("scraper.services.requests.get")
+    @mock.patch("scraper.client.FetchClient.get")
     def test_get_links_no_text(self, p_get, p_error):
-        p_get.return_value.text = (
-            "<html><body><a href='https://www.example.com'></a></body></html>"
+        mock_response(
+            p_get, "<html><body><a href='https://www.example.com'></a></body></html>"
         )
-        p_get.return_value.status_code = 200
         name, status, links = services.get_links(self.url)
         self.assertEqual(name, "")
         self.assertEqual(links, [])
         p_error.assert_not_called()
 
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_links_unsupported_content_type(self, p_get):
+        mock_response(p_get, "%PDF-1.4", content_type="application/pdf")
+        name, status, links = services.get_links(self.url)
+        self.assertEqual(
+            (name, status, links), ("Unsupported content type application/pdf", 415, [])
+        )
+        p_get.return_value.iter_content.assert_not_called()
+        p_get.return_value.close.assert_called_once()
+
+    @mock.patch("scraper.parsers.logger.warning")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_links_max_body_size(self, p_get, p_warning):
+        mock_response(p_get, "")
+        p_get.return_value.iter_content.return_value = iter(
+            [b"<a href='/a'>A</a>", b"<a href='/b'>B</a>", b"<a href='/c'>C</a>"]
+        )
+        with self.settings(SCRAPER_MAX_BODY_SIZE=30):
+            name, status, links = services.get_links(self.url)
+        self.assertEqual(links, [("https://www.example.com/a", "A")])
+        p_warning.assert_called_once()
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_get_title_stops_early(self, p_get):
+        mock_response(p_get, "")
+        chunks = iter(
+            [
+                b"<html><head><title>Example Title</title>",
+                b"</head><body>",
+                b"<a href='/a'>A</a>" * 1000,
+            ]
+        )
+        p_get.return_value.iter_content.return_value = chunks
+        self.assertEqual(services.get_title(self.url), ("Example Title", 200))
+        self.assertEqual(next(chunks), b"</head><body>")
+        p_get.return_value.close.assert_called_once()
+
     @mock.patch("scraper.services.logger.error")
-    @mock.patch("scraper.services.requests.get")
+    @mock.patch("scraper.client.FetchClient.get")
     def test_get_links_request_error(self, p_get, p_error):
         p_get.side_effect = services.requests.RequestException
         p_get.return_value.status_code = 500
@@ -74,6 +124,80 @@ class CreatePageTest(TestCase):
         self.assertEqual(services.Link.objects.count(), 1)
         p_error.assert_not_called()
 
+    @mock.patch("scraper.services.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_create_page_streamed(self, p_get, p_error):
+        mock_response(
+            p_get,
+            "<html><head><title>Example Title</title></head>"
+            "<body><a href='https://www.example.com'>Example</a></body></html>",
+        )
+        message, status = services.create_page(self.url, self.user)
+        self.assertEqual(message, f"Page {self.url} successfully scraped")
+        p_get.assert_called_once_with(self.url, timeout=5, stream=True)
+        page = services.Page.objects.get()
+        self.assertEqual(page.name, "Example Title")
+        self.assertEqual(page.link_count, 1)
+        self.assertEqual(page.target.url, "https://www.example.com/")
+        p_get.return_value.close.assert_called_once()
+        p_error.assert_not_called()
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_create_page_stores_validators(self, p_get):
+        html = "<title>Example</title><a href='/a'>A</a>"
+        mock_response(p_get, html)
+        p_get.return_value.headers.update(
+            {"ETag": '"abc"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        )
+        services.create_page(self.url, self.user)
+        page = services.Page.objects.get()
+        self.assertEqual(page.etag, '"abc"')
+        self.assertEqual(page.last_modified, "Wed, 21 Oct 2015 07:28:00 GMT")
+        content = html.encode()
+        self.assertEqual(
+            page.content_hash, services.hashlib.sha256(content).hexdigest()
+        )
+
+        response = mock.Mock(status_code=200, content=content)
+        message, status = services.apply_rescrape(page, response)
+        self.assertEqual(message, f"Page {self.url} unchanged")
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_create_page_reads_body_outside_transaction(self, p_get):
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def iter_content(chunk_size):
+            depths.append(len(connection.savepoint_ids))
+            yield b"<a href='/a'>A</a>"
+
+        mock_response(p_get, "")
+        p_get.return_value.iter_content.side_effect = iter_content
+        services.create_page(self.url, self.user)
+        self.assertEqual(depths, [depth])
+        self.assertEqual(services.Page.objects.get().link_count, 1)
+
+    @mock.patch("scraper.services.logger.warning")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_create_page_peak_memory(self, p_get, p_warning):
+        # The links are parsed into a list, bounded by the body read, not by
+        # the page length.
+        max_size = 8 * 1024
+        peaks = []
+        for i, links in enumerate((max_size // 20, 20_000)):
+            url = f"{self.url}/{i}"
+            p_get.return_value = make_response(
+                url, b"".join(b"<a href='/%d'>%d</a>" % (j, j) for j in range(links))
+            )
+            with override_settings(SCRAPER_MAX_BODY_SIZE=max_size):
+                tracemalloc.start()
+                try:
+                    services.create_page(url, self.user)
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                finally:
+                    tracemalloc.stop()
+        self.assertLess(peaks[1], 2 * peaks[0])
+
     @mock.patch("scraper.services.logger.error")
     @mock.patch("scraper.services.get_links")
     def test_create_page_no_title(self, p_get_links, p_error):
@@ -110,9 +234,27 @@ class CreatePageTest(TestCase):
         message, status = services.create_page(self.url, self.user)
         self.assertEqual(message, f"Page {self.url} successfully scraped")
         self.assertEqual(services.Page.objects.count(), 1)
+        self.assertEqual(services.Page.objects.get().link_count, 2)
         self.assertEqual(services.Link.objects.count(), 2)
         p_error.assert_not_called()
 
+    @mock.patch("scraper.services.settings.SCRAPER_LINK_BATCH_SIZE", 2)
+    def test_save_page_duplicates_across_batches(self):
+        links = ((f"https://www.example.com/{i % 3}", f"Link {i}") for i in range(7))
+        with mock.patch(
+            "scraper.services.insert_links", wraps=services.insert_links
+        ) as p_insert_links:
+            message, status = services.save_page(
+                self.url, self.user, "Example Title", 200, links
+            )
+        self.assertEqual(message, f"Page {self.url} successfully scraped")
+        self.assertEqual(p_insert_links.call_count, 4)
+        self.assertEqual(services.Page.objects.get().link_count, 3)
+        self.assertEqual(
+            set(services.Link.objects.values_list("name", flat=True)),
+            {"Link 0", "Link 1", "Link 2"},
+        )
+
     @mock.patch("scraper.services.logger.error")
     @mock.patch("scraper.services.Link.objects.bulk_create")
     @mock.patch("scraper.services.get_links")
@@ -127,8 +269,10 @@ class CreatePageTest(TestCase):
             ],
         )
         message, status = services.create_page(self.url, self.user)
-        self.assertEqual(message, f"Error scraping {self.url}")
-        p_get_links.assert_called_once_with(self.url)
+        self.assertEqual(
+            message, f"Error {IntegrityError()} creating the page {self.url}"
+        )
+        p_get_links.assert_called_once_with(self.url, validators={})
         p_bulk_create.assert_called_once()
         p_error.assert_called_once()
 
@@ -144,11 +288,10 @@ class CreatePageTest(TestCase):
         )
         baker.make("scraper.Page", url=self.url)
         message, status = services.create_page(self.url, self.user)
-        self.assertEqual(
-            message,
-            f"Error UNIQUE constraint failed: scraper_page.url creating the page {self.url}",
-        )
-        p_error.assert_called_once()
+        # Another user (or worker) got there first, nothing to redo.
+        self.assertEqual(message, f"Page {self.url} already exists")
+        self.assertEqual(services.Link.objects.count(), 0)
+        p_error.assert_not_called()
 
     @mock.patch("scraper.services.logger.error")
     @mock.patch("scraper.services.get_links")
@@ -159,3 +302,158 @@ class CreatePageTest(TestCase):
         p_error.assert_not_called()  # The error is logged in get_links
         self.assertEqual(services.Page.objects.count(), 0)
         self.assertEqual(services.Link.objects.count(), 0)
+
+
+@mock.patch("scraper.services.logger.error")
+@override_settings(SCRAPER_FETCH_TIMEOUT=0.2)
+class StalledBodyTest(TestCase):
+    def setUp(self):
+        self.server = StallingServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def test_get_links(self, p_error):
+        name, status, links = services.get_links(self.server.url())
+        self.assertEqual((status, links), (500, []))
+        self.assertIn("timed out", name)
+        p_error.assert_called_once()
+
+    def test_get_title(self, p_error):
+        with mock.patch("scraper.services.TitleParser.done", False):
+            _, status = services.get_title(self.server.url())
+        self.assertEqual(status, 500)
+
+    def test_create_page(self, p_error):
+        user = baker.make("auth.User")
+        message, status = services.create_page(self.server.url(), user)
+        self.assertEqual(
+            (message, status), (f"Page {self.server.url()} bad response", 500)
+        )
+        self.assertFalse(services.Page.objects.exists())
+        self.assertFalse(services.Link.objects.exists())
+
+
+class CopyLineTest(TestCase):
+    def test_escaping(self):
+        self.assertEqual(
+            services._copy_line((1, 2, "a\tb\\c\n")), "1\t2\ta\\tb\\\\c\\n\n"
+        )
+
+
+class RescrapePageTest(TestCase):
+    def setUp(self):
+        self.url = "https://www.example.com"
+        self.page = baker.make(
+            "scraper.Page",
+            url=self.url,
+            etag='"abc"',
+            last_modified="Wed, 21 Oct 2015 07:28:00 GMT",
+        )
+        for target_id in services.resolve_urls(
+            ["https://www.example.com/old", "https://www.example.com/kept"]
+        ).values():
+            baker.make("scraper.Link", page=self.page, target_id=target_id)
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_conditional_headers(self, p_get):
+        services.conditional_get(self.page)
+        p_get.assert_called_once_with(
+            self.url,
+            headers={
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+            },
+            timeout=5,
+            stream=True,
+        )
+
+    @mock.patch("scraper.services.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_conditional_get_reads_body(self, p_get, p_error):
+        mock_response(p_get, "%PDF", content_type="application/pdf")
+        self.assertIsNone(services.conditional_get(self.page))
+        p_get.return_value.close.assert_called_once_with()
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "text/html"
+        response.raw = io.BytesIO(b"<title>New</title>")
+        p_get.return_value = response
+        with self.settings(SCRAPER_MAX_BODY_SIZE=10):
+            response = services.conditional_get(self.page)
+        self.assertEqual(response.content, b"<title>New")
+
+    def test_not_modified(self):
+        response = mock.Mock(status_code=304)
+        with self.assertNumQueries(0):
+            message, status = services.apply_rescrape(self.page, response)
+        self.assertEqual(message, f"Page {self.url} not modified")
+        self.assertEqual(status, 304)
+        # Scheduled in memory, the caller saves it with the rest of the batch.
+        self.assertEqual(self.page.crawl_interval, 36 * 3600)
+        self.assertIsNotNone(self.page.next_crawl_at)
+
+    def test_unchanged_content(self):
+        content = b"<html></html>"
+        self.page.content_hash = services.hashlib.sha256(content).hexdigest()
+        response = mock.Mock(status_code=200, content=content)
+        with self.assertNumQueries(0):
+            message, status = services.apply_rescrape(self.page, response)
+        self.assertEqual(message, f"Page {self.url} unchanged")
+
+    def test_changed_content(self):
+        html = (
+            "<title>New</title>"
+            "<a href='/kept'>Kept</a><a href='/new'>New</a><a href='/new'>New</a>"
+        )
+        response = mock.Mock(
+            status_code=200,
+            content=html.encode(),
+            headers={"ETag": '"def"'},
+        )
+        message, status = services.apply_rescrape(self.page, response)
+        self.assertEqual(message, f"Page {self.url} updated, 1 links added, 1 removed")
+        self.assertEqual(
+            set(self.page.link_set.values_list("target__url", flat=True)),
+            {"https://www.example.com/kept", "https://www.example.com/new"},
+        )
+        self.assertEqual(
+            self.page.link_set.get(target__url="https://www.example.com/kept").name,
+            "Kept",
+        )
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.name, "New")
+        self.assertEqual(self.page.etag, '"def"')
+        self.assertEqual(self.page.last_modified, "")
+        self.assertEqual(self.page.crawl_interval, 12 * 3600)
+        self.assertEqual(
+            self.page.content_hash, services.hashlib.sha256(html.encode()).hexdigest()
+        )
+        self.assertIsNotNone(self.page.scraped_at)
+
+    @mock.patch("scraper.services.timezone.now")
+    def test_schedule_next(self, p_now):
+        now = p_now.return_value = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        services.schedule_next(self.page, None)
+        self.assertEqual(self.page.crawl_interval, 24 * 3600)
+        self.assertEqual(self.page.next_crawl_at, now + timedelta(days=1))
+
+        self.page.priority = 1
+        services.schedule_next(self.page, True)
+        self.assertEqual(self.page.crawl_interval, 12 * 3600)
+        self.assertEqual(self.page.next_crawl_at, now + timedelta(hours=6))
+
+        self.page.priority = 0
+        for _ in range(20):
+            services.schedule_next(self.page, True)
+        self.assertEqual(self.page.crawl_interval, 3600)
+        for _ in range(20):
+            services.schedule_next(self.page, False)
+        self.assertEqual(self.page.crawl_interval, 30 * 24 * 3600)
+
+    def test_bad_response(self):
+        message, status = services.apply_rescrape(self.page, None)
+        self.assertEqual((message, status), (f"Page {self.url} bad response", 500))
+        response = mock.Mock(status_code=404)
+        message, status = services.apply_rescrape(self.page, response)
+        self.assertEqual(status, 404)
+        self.assertEqual(self.page.link_set.count(), 2)
@@ -0,0 +1,170 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from model_bakery import baker
+
+from scraper import bulk, services, simhash
+from scraper.models import Link, Page
+
+
+def make_links(host, count=40, start=0):
+    return [
+        (f"https://{host}/item/{i}", f"Item number {i}") for i in range(start, count)
+    ]
+
+
+def fingerprint(url, links, title="Catalogue"):
+    value = simhash.SimHash(url)
+    for link, name in links:
+        value.update_link(link, name)
+    value.update_text(title)
+    return value.digest()
+
+
+class SimHashTest(TestCase):
+    def test_distance(self):
+        links = make_links("a.example.com")
+        value = fingerprint("https://a.example.com/", links)
+        # Same path on a mirror, links on the page's own host match.
+        mirror = fingerprint("https://b.example.com/", make_links("b.example.com"))
+        self.assertEqual(value, mirror)
+        # One link out of forty changed.
+        near = fingerprint("https://a.example.com/", links[:-1] + [("/new", "New")])
+        self.assertLessEqual(simhash.distance(value, near), 8)
+        other = fingerprint(
+            "https://a.example.com/", make_links("a.example.com", 80, 40)
+        )
+        self.assertGreater(simhash.distance(value, other), 16)
+        self.assertIsNone(simhash.SimHash("https://a.example.com/").digest())
+
+    def test_set_fingerprint(self):
+        page = Page()
+        value = (1 << 63) | 0x1234
+        simhash.set_fingerprint(page, value)
+        self.assertLess(page.simhash, 0)
+        self.assertEqual(simhash.distance(page.simhash, value), 0)
+        self.assertEqual(
+            [page.simhash_band0, page.simhash_band1, page.simhash_band3],
+            [0x1234, 0, 0x8000],
+        )
+
+    def test_find_duplicates(self):
+        value = 0x0123_4567_89AB_CDEF
+        stored = baker.make("scraper.Page")
+        simhash.set_fingerprint(stored, value)
+        stored.save()
+        # Three bits off, one in each of three bands.
+        near = value ^ (1 | 1 << 20 | 1 << 40)
+        # Four bits off, one in each band: not found by band, and too far.
+        far = value ^ (1 | 1 << 20 | 1 << 40 | 1 << 60)
+        other = value ^ (1 << 64) - 1
+        with (
+            self.assertNumQueries(1),
+            mock.patch(
+                "scraper.simhash.distance", wraps=simhash.distance
+            ) as p_distance,
+        ):
+            duplicates = simhash.find_duplicates(
+                {"near": near, "far": far, "other": other}
+            )
+        self.assertEqual(duplicates, {"near": stored.pk})
+        # Only compared with the fingerprint sharing one of its bands.
+        p_distance.assert_called_once_with(near, value)
+        self.assertEqual(
+            simhash.find_duplicates({"near": near}, exclude=[stored.pk]), {}
+        )
+
+
+class DuplicatePagesTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        services.save_page(
+            "https://a.example.com/",
+            self.user,
+            "Catalogue",
+            200,
+            make_links("a.example.com"),
+        )
+        self.original = Page.objects.get()
+
+    def test_flag_duplicates(self):
+        message, _ = services.save_page(
+            "https://b.example.com/",
+            self.user,
+            "Catalogue",
+            200,
+            make_links("b.example.com"),
+        )
+        self.assertEqual(message, "Page https://b.example.com/ successfully scraped")
+        page = Page.objects.get(url="https://b.example.com/")
+        self.assertEqual(page.duplicate_of, self.original)
+        self.assertEqual(page.link_count, 40)
+        self.assertIsNone(self.original.duplicate_of)
+
+    @override_settings(SCRAPER_SKIP_DUPLICATES=True)
+    def test_skip_duplicates(self):
+        message, _ = services.save_page(
+            "https://b.example.com/",
+            self.user,
+            "Catalogue",
+            200,
+            make_links("b.example.com"),
+        )
+        self.assertEqual(
+            message,
+            f"Page https://b.example.com/ duplicates page {self.original.pk}, links skipped",
+        )
+        page = Page.objects.get(url="https://b.example.com/")
+        self.assertEqual(page.duplicate_of, self.original)
+        self.assertEqual(page.link_set.count(), 0)
+        self.assertEqual(page.crawl_interval, 30 * 24 * 3600)
+        self.assertEqual(page.next_crawl_at - page.scraped_at, timedelta(days=30))
+
+        services.save_page(
+            "https://c.example.com/",
+            self.user,
+            "Other",
+            200,
+            make_links("c.example.com", 80, 40),
+        )
+        self.assertIsNone(Page.objects.get(url="https://c.example.com/").duplicate_of)
+        self.assertEqual(Link.objects.count(), 80)
+
+    @override_settings(SCRAPER_SKIP_DUPLICATES=True)
+    def test_skip_duplicates_bulk(self):
+        results = [
+            ("https://b.example.com/", ("Catalogue", 200, make_links("b.example.com"))),
+            (
+                "https://c.example.com/",
+                ("Other", 200, make_links("c.example.com", 80, 40)),
+            ),
+        ]
+        summary = bulk.save_pages(results, self.user)
+        self.assertEqual(
+            summary[0][1],
+            f"Page https://b.example.com/ duplicates page {self.original.pk}, links skipped",
+        )
+        page = Page.objects.get(url="https://b.example.com/")
+        self.assertEqual(page.duplicate_of, self.original)
+        self.assertEqual(page.crawl_interval, 30 * 24 * 3600)
+        self.assertEqual(page.next_crawl_at - page.scraped_at, timedelta(days=30))
+        self.assertEqual(Link.objects.count(), 80)
+
+    @override_settings(SCRAPER_SKIP_DUPLICATES=True)
+    def test_skip_link_diff(self):
+        page = baker.make("scraper.Page", url="https://b.example.com/", etag='"abc"')
+        baker.make("scraper.Link", page=page, _quantity=2)
+        html = "<title>Catalogue</title>" + "".join(
+            f"<a href='{url}'>{name}</a>" for url, name in make_links("b.example.com")
+        )
+        response = mock.Mock(status_code=200, content=html.encode(), headers={})
+        message, _ = services.apply_rescrape(page, response)
+        self.assertIn("links skipped", message)
+        page.refresh_from_db()
+        self.assertEqual(page.duplicate_of, self.original)
+        self.assertEqual(page.link_set.count(), 2)
+        # Downloaded and matched again on the next re-scrape.
+        self.assertEqual(page.etag, "")
+        self.assertEqual(page.content_hash, "")
+        self.assertEqual(page.crawl_interval, 30 * 24 * 3600)
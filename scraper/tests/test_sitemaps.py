@@ -0,0 +1,187 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import requests
+from django.test import TestCase
+from django.utils import timezone as django_timezone
+from model_bakery import baker
+
+from scraper import sitemaps
+from scraper.models import Page, ScrapeJob
+from scraper.tests.helpers import make_response
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.example.com/new</loc></url>
+  <url>
+    <loc>https://www.example.com/changed</loc>
+    <lastmod>2024-05-02T10:00:00+00:00</lastmod>
+  </url>
+  <url>
+    <loc>https://www.example.com/unchanged</loc>
+    <lastmod>2024-04-01</lastmod>
+  </url>
+  <url><loc>https://www.example.com/new</loc></url>
+  <url><loc>not a url</loc></url>
+</urlset>
+"""
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://www.example.com/pages.xml.gz</loc></sitemap>
+  <sitemap><loc>https://www.example.com/sitemap.xml</loc></sitemap>
+</sitemapindex>
+"""
+
+ROBOTS = b"User-agent: *\nDisallow:\nSitemap: https://www.example.com/sitemap.xml\n"
+
+
+def serve(files: dict[str, bytes]):
+    def get(url, **kwargs):
+        if url in files:
+            return make_response(url, files[url])
+        return make_response(url, b"", status=404)
+
+    return get
+
+
+class ParseSitemapTest(TestCase):
+    def test_parse_sitemap(self):
+        chunks = [URLSET[i : i + 7] for i in range(0, len(URLSET), 7)]
+        entries = list(sitemaps.parse_sitemap(chunks))
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(entries[0], ("url", "https://www.example.com/new", None))
+        self.assertEqual(entries[1][2], datetime(2024, 5, 2, 10, tzinfo=timezone.utc))
+        self.assertEqual(entries[2][2], datetime(2024, 4, 1, tzinfo=timezone.utc))
+
+    def test_parse_sitemap_index(self):
+        entries = list(sitemaps.parse_sitemap([INDEX]))
+        self.assertEqual(
+            [(tag, loc) for tag, loc, _ in entries],
+            [
+                ("sitemap", "https://www.example.com/pages.xml.gz"),
+                ("sitemap", "https://www.example.com/sitemap.xml"),
+            ],
+        )
+
+    def test_iter_xml_gzip(self):
+        url = "https://www.example.com/pages.xml.gz"
+        response = make_response(url, gzip.compress(URLSET))
+        self.assertEqual(b"".join(sitemaps.iter_xml(response)), URLSET)
+        # Bounded by the uncompressed size, not the compressed one.
+        response = make_response(url, gzip.compress(b" " * 10**6))
+        body = b"".join(sitemaps.iter_xml(response, max_size=1000))
+        self.assertEqual(body, b" " * 1000)
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_read_sitemap_invalid_xml(self, p_get):
+        p_get.side_effect = serve({"https://www.example.com/a.xml": URLSET[:200]})
+        entries = list(sitemaps.read_sitemap("https://www.example.com/a.xml"))
+        self.assertEqual(entries, [("url", "https://www.example.com/new", None)])
+
+    @mock.patch("scraper.sitemaps.logger.error")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_read_sitemap_connection_error(self, p_get, p_error):
+        url = "https://www.example.com/a.xml"
+        p_get.return_value = make_response(
+            url, URLSET[:200], error=requests.ConnectionError("Read timed out")
+        )
+        entries = list(sitemaps.read_sitemap(url))
+        self.assertEqual(entries, [("url", "https://www.example.com/new", None)])
+        p_error.assert_called_once()
+
+
+class IngestSitemapsTest(TestCase):
+    def setUp(self):
+        self.user = baker.make("auth.User")
+        scraped_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        self.later = django_timezone.now() + timedelta(days=30)
+        self.changed = baker.make(
+            "scraper.Page",
+            url="https://www.example.com/changed",
+            scraped_at=scraped_at,
+            next_crawl_at=self.later,
+        )
+        self.unchanged = baker.make(
+            "scraper.Page",
+            url="https://www.example.com/unchanged",
+            scraped_at=scraped_at,
+            next_crawl_at=self.later,
+        )
+
+    @mock.patch("scraper.jobs._publish")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_ingest_sitemaps(self, p_get, p_publish):
+        p_get.side_effect = serve(
+            {
+                "https://www.example.com/robots.txt": ROBOTS,
+                "https://www.example.com/sitemap.xml": INDEX,
+                "https://www.example.com/pages.xml.gz": gzip.compress(URLSET),
+            }
+        )
+        counts = sitemaps.ingest_sitemaps(["https://www.example.com"], self.user)
+        self.assertEqual(
+            counts,
+            {"queued": 1, "pending": 0, "due": 1, "unchanged": 1, "invalid": 1},
+        )
+        # The index listing itself is not fetched twice.
+        self.assertEqual(p_get.call_count, 3)
+        self.assertEqual(
+            list(ScrapeJob.objects.values_list("url", flat=True)),
+            ["https://www.example.com/new"],
+        )
+        self.assertLess(Page.objects.get(pk=self.changed.pk).next_crawl_at, self.later)
+        self.assertEqual(
+            Page.objects.get(pk=self.unchanged.pk).next_crawl_at, self.later
+        )
+
+    @mock.patch("scraper.jobs._publish")
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_ingest_once(self, p_get, p_publish):
+        other = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.example.com/new</loc></url>
+  <url><loc>https://www.example.com/queued</loc></url>
+  <url><loc>https://www.example.com/other</loc></url>
+</urlset>
+"""
+        p_get.side_effect = serve(
+            {
+                "https://www.example.com/pages.xml": URLSET,
+                "https://www.example.com/other.xml": other,
+            }
+        )
+        baker.make("scraper.ScrapeJob", url="https://www.example.com/queued")
+        baker.make(
+            "scraper.ScrapeJob",
+            url="https://www.example.com/other",
+            status=ScrapeJob.Status.DONE,
+        )
+        counts = sitemaps.ingest_sitemaps(
+            ["https://www.example.com/pages.xml", "https://www.example.com/other.xml"],
+            self.user,
+            batch_size=2,
+        )
+        self.assertEqual(counts["queued"], 2)
+        self.assertEqual(counts["pending"], 1)
+        self.assertEqual(
+            sorted(
+                ScrapeJob.objects.filter(status=ScrapeJob.Status.QUEUED).values_list(
+                    "url", flat=True
+                )
+            ),
+            [
+                "https://www.example.com/new",
+                "https://www.example.com/other",
+                "https://www.example.com/queued",
+            ],
+        )
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_discover_sitemaps_fallback(self, p_get):
+        p_get.side_effect = serve({})
+        self.assertEqual(
+            sitemaps.discover_sitemaps("https://www.example.com/"),
+            ["https://www.example.com/sitemap.xml"],
+        )
@@ -0,0 +1,63 @@
+from django.test import TestCase
+from model_bakery import baker
+
+from scraper.models import Link, Url
+from scraper.services import resolve_urls
+from scraper.urlnorm import canonicalize, url_host, url_key
+
+
+class CanonicalizeTest(TestCase):
+    def test_canonicalize(self):
+        self.assertEqual(
+            canonicalize("HTTPS://User:pw@WWW.Example.com:443?b=2&a=1#top"),
+            "https://www.example.com/?a=1&b=2",
+        )
+        self.assertEqual(
+            canonicalize("http://www.example.com:8080/Path"),
+            "http://www.example.com:8080/Path",
+        )
+        self.assertEqual(
+            canonicalize("mailto:someone@example.com"), "mailto:someone@example.com"
+        )
+
+    def test_url_key(self):
+        self.assertEqual(len(url_key("https://www.example.com/")), 32)
+        self.assertNotEqual(
+            url_key("https://www.example.com/"), url_key("https://www.example.com/a")
+        )
+        self.assertEqual(url_host("https://www.example.com/a"), "www.example.com")
+
+
+class ResolveUrlsTest(TestCase):
+    def test_resolve_urls(self):
+        existing = resolve_urls(["https://www.example.com/a"])
+        with self.assertNumQueries(3):
+            ids = resolve_urls(
+                [
+                    "https://www.example.com/a#top",
+                    "https://WWW.example.com/a",
+                    "https://www.example.com/b",
+                ]
+            )
+        self.assertEqual(Url.objects.count(), 2)
+        self.assertEqual(
+            ids["https://www.example.com/a#top"], existing["https://www.example.com/a"]
+        )
+        self.assertEqual(
+            ids["https://WWW.example.com/a"], existing["https://www.example.com/a"]
+        )
+
+    def test_shared_across_pages(self):
+        url = "https://www.example.com/a"
+        pages = baker.make("scraper.Page", _quantity=3)
+        for page in pages:
+            baker.make("scraper.Link", page=page, target_id=resolve_urls([url])[url])
+        self.assertEqual(Url.objects.count(), 1)
+        self.assertEqual(
+            set(
+                Link.objects.filter(target__key=url_key(canonicalize(url))).values_list(
+                    "page", flat=True
+                )
+            ),
+            {page.pk for page in pages},
+        )
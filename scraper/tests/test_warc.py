@@ -0,0 +1,129 @@
+import gzip
+import os
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from model_bakery import baker
+
+from scraper import cache, services, warc
+from scraper.models import ArchiveRecord
+from scraper.tests.helpers import make_response
+from scraper.urlnorm import canonicalize, url_key
+
+
+def make_gzip_response(url, body=b"<a href='/a'>A</a>"):
+    # As received, requests has already decoded the body.
+    return make_response(url, body, headers={"Content-Encoding": "gzip"})
+
+
+class WarcWriterTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.writer = warc.WarcWriter(self.directory.name, max_size=1000)
+        self.addCleanup(self.writer.close)
+
+    def test_write_and_read(self):
+        url = "https://www.example.com/a"
+        filename, offset, length = self.writer.write(make_gzip_response(url))
+        data = (Path(self.directory.name) / filename).read_bytes()
+        # A warcinfo record, then the response and its request.
+        self.assertGreater(offset, 0)
+        record = gzip.decompress(data[offset : offset + length])
+        self.assertIn(b"WARC-Type: response", record)
+        self.assertIn(b"GET /a HTTP/1.1", gzip.decompress(data[offset + length :]))
+
+        with warc.ArchiveReader(self.directory.name) as reader:
+            response = reader.read(filename, offset, length)
+        self.assertEqual(response.url, url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"<a href='/a'>A</a>")
+        self.assertEqual(response.headers["Content-Type"], "text/html; charset=utf-8")
+        # The body is stored decoded.
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_rotate_and_index(self):
+        body = os.urandom(800)
+        locations = [
+            self.writer.write(make_gzip_response(f"https://www.example.com/{i}", body))
+            for i in range(3)
+        ]
+        self.assertEqual(len({filename for filename, _, _ in locations}), 3)
+        self.writer.close()
+
+        self.assertEqual(warc.index_archives(self.directory.name), 3)
+        self.assertEqual(warc.index_archives(self.directory.name), 3)
+        self.assertEqual(ArchiveRecord.objects.count(), 3)
+        record = ArchiveRecord.objects.get(
+            key=url_key(canonicalize("https://www.example.com/1"))
+        )
+        self.assertEqual((record.filename, record.offset, record.length), locations[1])
+        self.assertEqual(record.status_code, 200)
+
+    def test_redirect_indexed_by_requested_url(self):
+        response = make_gzip_response("https://www.example.com/new")
+        response.history = [make_response("https://www.example.com/old", status=301)]
+        filename, offset, _ = self.writer.write(response)
+        self.writer.close()
+
+        warc.index_archives(self.directory.name)
+        record = ArchiveRecord.objects.get()
+        self.assertEqual(
+            record.key, url_key(canonicalize("https://www.example.com/old"))
+        )
+        with warc.ArchiveReader(self.directory.name) as reader:
+            archived = reader.read(filename, offset, record.length)
+        self.assertEqual(archived.url, "https://www.example.com/new")
+
+
+class ArchivedFetchTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        settings = override_settings(SCRAPER_ARCHIVE_PATH=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def tearDown(self):
+        warc.get_archive().close()
+        self.directory.cleanup()
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_replay_archives(self, p_get):
+        url = "https://www.example.com"
+        p_get.return_value = make_response(url)
+        user = baker.make("auth.User")
+        services.create_page(url, user)
+        page = services.Page.objects.get()
+        self.assertEqual(page.link_count, 1)
+
+        with mock.patch(
+            "scraper.services.parse_links",
+            return_value=("New", [("https://www.example.com/b", "B")]),
+        ):
+            out = StringIO()
+            call_command("replay_archives", stdout=out)
+        p_get.assert_called_once()
+        page.refresh_from_db()
+        self.assertEqual(page.name, "New")
+        self.assertEqual(
+            list(page.link_set.values_list("target__url", flat=True)),
+            ["https://www.example.com/b"],
+        )
+        self.assertIn("Replayed 1 pages (200: 1)", out.getvalue())
+
+    @mock.patch("scraper.client.FetchClient.get")
+    def test_cache_hit_not_archived(self, p_get):
+        url = "https://www.example.com"
+        p_get.return_value = make_response(url)
+        with tempfile.TemporaryDirectory() as cache_directory, override_settings(
+            SCRAPER_CACHE_PATH=Path(cache_directory) / "cache.sqlite3"
+        ):
+            services.get_links(url)
+            services.get_links(url)
+            cache.get_cache().close()
+        p_get.assert_called_once()
+        self.assertEqual(warc.index_archives(self.directory.name), 1)
@@ -0,0 +1,38 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize(url: str) -> str:
+    """Canonical form used to deduplicate URLs.
+
+    Scheme and host are lowercased, default ports, credentials and the
+    fragment are dropped, an empty path becomes "/" and query parameters are
+    sorted. Percent-encoding is left as is.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if netloc:
+        host = (parts.hostname or "").lower()
+        if ":" in host:
+            host = f"[{host}]"
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and DEFAULT_PORTS.get(scheme) != port:
+            host = f"{host}:{port}"
+        netloc = host
+    path = parts.path or ("/" if netloc else "")
+    query = "&".join(sorted(param for param in parts.query.split("&") if param))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_key(canonical_url: str) -> str:
+    return hashlib.blake2b(canonical_url.encode(), digest_size=16).hexdigest()
+
+
+def url_host(canonical_url: str) -> str:
+    return (urlsplit(canonical_url).hostname or "")[:255]
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from scraper import views
+
+app_name = "api"
+
+urlpatterns = [
+    path("pages/", views.page_list, name="page_list"),
+    path("pages/export/", views.page_export, name="page_export"),
+    path("pages/search/", views.page_search, name="page_search"),
+    path("pages/<int:pk>/", views.page_detail, name="page_detail"),
+    path("pages/<int:pk>/links/", views.link_list, name="link_list"),
+    path("links/export/", views.link_export, name="link_export"),
+    path("links/search/", views.link_search, name="link_search"),
+    path("changes/", views.change_list, name="change_list"),
+]
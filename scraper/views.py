@@ -0,0 +1,236 @@
+import csv
+import hashlib
+import json
+from collections.abc import Iterable, Iterator
+from functools import wraps
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, QuerySet
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
+
+from scraper import metrics as scraper_metrics
+from scraper.feed import serialize_change
+from scraper.models import Link, LinkChange, Page
+from scraper.pagination import KeysetPage, parse_cursor
+from scraper.search import search
+
+PAGE_FIELDS = ("id", "url", "name", "link_count", "scraped_at")
+LINK_FIELDS = ("id", "page_id", "name", "target__url")
+LINK_KEYS = ("id", "page", "name", "url")
+EXPORT_CHUNK_SIZE = 2000
+MAX_LIMIT = 1000
+
+
+def metrics(request):
+    data, content_type = scraper_metrics.render()
+    return HttpResponse(data, content_type=content_type)
+
+
+def visible_pages(user: User) -> QuerySet:
+    """Pages `user` may see, the same scoping as the admin."""
+    if user.is_superuser:
+        return Page.objects.all()
+    return Page.objects.filter(created_by=user)
+
+
+def api_view(etag_func):
+    """Logged in GET/HEAD only, gzipped, with an ETag from `etag_func`.
+
+    `etag_func` gets the request and the URL arguments and should be much
+    cheaper than the view, a matching If-None-Match answers 304 without
+    running the view.
+    """
+
+    def decorator(view):
+        conditional = condition(etag_func=etag_func)(view)
+
+        @gzip_page
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({"detail": "Authentication required"}, status=401)
+            return conditional(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def make_etag(request, *parts) -> str:
+    # The query string and the user change the content as much as the data.
+    key = json.dumps(
+        [request.user.pk, request.get_full_path(), *parts], cls=DjangoJSONEncoder
+    )
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def latest_change() -> int | None:
+    # Every link added or removed is logged, the log's primary key is indexed.
+    return LinkChange.objects.aggregate(Max("id"))["id__max"]
+
+
+def pages_etag(request, *args, **kwargs) -> str:
+    # Pages only change when scraped, added, deleted or when their links do.
+    # One aggregate per query, so that each is a lookup on an index rather
+    # than a scan of all the visible pages. The cursor is in the full path.
+    pages = visible_pages(request.user)
+    return make_etag(
+        request,
+        pages.aggregate(Max("id"))["id__max"],
+        pages.aggregate(Max("scraped_at"))["scraped_at__max"],
+        latest_change(),
+    )
+
+
+def links_etag(request, *args, **kwargs) -> str:
+    return make_etag(request, latest_change())
+
+
+def page_etag(request, pk: int) -> str | None:
+    page = visible_pages(request.user).filter(pk=pk)
+    state = page.values_list("name", "scraped_at", "link_count").first()
+    return make_etag(request, state) if state else None
+
+
+def limit_param(request) -> int:
+    try:
+        return max(1, min(int(request.GET.get("limit", 100)), MAX_LIMIT))
+    except ValueError:
+        return 100
+
+
+def keyset_response(request, rows: QuerySet, serialize) -> JsonResponse:
+    page = KeysetPage(
+        rows,
+        per_page=limit_param(request),
+        after=parse_cursor(request.GET.get("after")),
+    )
+    next_url = None
+    if page.next_cursor is not None:
+        query = request.GET.copy()
+        query["after"] = page.next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+    return JsonResponse({"results": [serialize(row) for row in page], "next": next_url})
+
+
+def serialize_page(page: Page) -> dict:
+    return {field: getattr(page, field) for field in PAGE_FIELDS}
+
+
+def serialize_link(link: Link) -> dict:
+    return {"id": link.pk, "page": link.page_id, "name": link.name, "url": link.url}
+
+
+@api_view(pages_etag)
+def page_list(request):
+    return keyset_response(
+        request, visible_pages(request.user).only(*PAGE_FIELDS), serialize_page
+    )
+
+
+@api_view(page_etag)
+def page_detail(request, pk: int):
+    page = get_object_or_404(visible_pages(request.user), pk=pk)
+    return JsonResponse(serialize_page(page))
+
+
+@api_view(page_etag)
+def link_list(request, pk: int):
+    page = get_object_or_404(visible_pages(request.user), pk=pk)
+    links = page.link_set.select_related("target")
+    return keyset_response(request, links, serialize_link)
+
+
+@api_view(pages_etag)
+def page_search(request):
+    pages = search(
+        visible_pages(request.user).only(*PAGE_FIELDS),
+        request.GET.get("q", ""),
+        limit_param(request),
+    )
+    return JsonResponse({"results": [serialize_page(page) for page in pages]})
+
+
+@api_view(links_etag)
+def link_search(request):
+    links = Link.objects.select_related("target")
+    if not request.user.is_superuser:
+        links = links.filter(page__created_by=request.user)
+    links = search(links, request.GET.get("q", ""), limit_param(request))
+    return JsonResponse({"results": [serialize_link(link) for link in links]})
+
+
+def changes_etag(request) -> str:
+    return make_etag(request, latest_change())
+
+
+@api_view(changes_etag)
+def change_list(request):
+    changes = LinkChange.objects.select_related("target")
+    if not request.user.is_superuser:
+        changes = changes.filter(page__created_by=request.user)
+    return keyset_response(request, changes, serialize_change)
+
+
+class Echo:
+    """File-like object that returns what is written, for `csv.writer`."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(keys: tuple[str, ...], rows: Iterable[tuple]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(keys, row))) + "\n"
+
+
+def iter_csv(keys: tuple[str, ...], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(keys)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_response(
+    request, keys: tuple[str, ...], rows: QuerySet, filename: str
+) -> StreamingHttpResponse:
+    """Stream `rows` (a `values_list` queryset) as NDJSON, or CSV with `?format=csv`.
+
+    Rows are fetched `EXPORT_CHUNK_SIZE` at a time and sent in chunks of as
+    many lines, memory use does not depend on the number of rows.
+    """
+    if request.GET.get("format") == "csv":
+        lines = iter_csv(keys, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+        content_type = "text/csv; charset=utf-8"
+        filename += ".csv"
+    else:
+        lines = iter_ndjson(keys, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+        content_type = "application/x-ndjson"
+        filename += ".ndjson"
+    chunks = iter(lambda: "".join(islice(lines, EXPORT_CHUNK_SIZE)), "")
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(pages_etag)
+def page_export(request):
+    pages = visible_pages(request.user).order_by("id").values_list(*PAGE_FIELDS)
+    return export_response(request, PAGE_FIELDS, pages, "pages")
+
+
+@api_view(links_etag)
+def link_export(request):
+    links = Link.objects.order_by("id").values_list(*LINK_FIELDS)
+    if not request.user.is_superuser:
+        links = links.filter(page__created_by=request.user)
+    if page_id := parse_cursor(request.GET.get("page")):
+        links = links.filter(page_id=page_id)
+    return export_response(request, LINK_KEYS, links, "links")
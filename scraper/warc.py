@@ -0,0 +1,280 @@
+import base64
+import gzip
+import hashlib
+import logging
+import mmap
+import os
+import threading
+import uuid
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+from scraper.models import ArchiveRecord
+from scraper.parsers import read_body
+from scraper.urlnorm import canonicalize, url_key
+
+logger = logging.getLogger(__name__)
+
+# The body is stored decoded, these would no longer describe it.
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+def warc_date(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def warc_record(headers: dict[str, str], block: bytes) -> bytes:
+    """One WARC/1.1 record, gzipped on its own so it can be read at its offset."""
+    headers = {
+        "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+        **headers,
+        "Content-Length": str(len(block)),
+    }
+    head = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    return gzip.compress(
+        b"WARC/1.1\r\n" + head.encode() + b"\r\n" + block + b"\r\n\r\n",
+        compresslevel=6,
+    )
+
+
+def requested_url(response: requests.Response) -> str:
+    # Pages are stored under the URL asked for, before any redirect.
+    return response.history[0].url if response.history else response.url
+
+
+def http_response_block(response: requests.Response) -> bytes:
+    version = getattr(response.raw, "version", 11)
+    lines = [
+        f"HTTP/{version // 10}.{version % 10} {response.status_code} {response.reason or ''}"
+    ]
+    lines.extend(
+        f"{name}: {value}"
+        for name, value in response.headers.items()
+        if name.lower() not in DROPPED_HEADERS
+    )
+    lines.append(f"Content-Length: {len(response.content)}")
+    return "\r\n".join(lines).encode("latin-1") + b"\r\n\r\n" + response.content
+
+
+def http_request_block(request: requests.PreparedRequest) -> bytes:
+    lines = [f"{request.method} {request.path_url} HTTP/1.1"]
+    lines.extend(f"{name}: {value}" for name, value in request.headers.items())
+    return "\r\n".join(lines).encode("latin-1") + b"\r\n\r\n"
+
+
+class WarcWriter:
+    """Append fetched responses to rotating `.warc.gz` files in `path`.
+
+    Each file is closed once it goes over `max_size` bytes. Next to it, a
+    `.cdx` file has one line per response, `key offset length status date
+    url`, where `key` is the `Url.key` of the requested URL and `url` the
+    final one after redirects; `index_archives`
+    loads these into `ArchiveRecord`. File names carry the process id, so
+    several processes can write to the same directory.
+    """
+
+    def __init__(self, path: str, max_size: int, prefix: str = "scraper"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.file = None
+        self.index = None
+        self.serial = 0
+
+    def open(self) -> None:
+        self.close()
+        self.serial += 1
+        now = datetime.now(timezone.utc)
+        name = f"{self.prefix}-{now:%Y%m%d%H%M%S}-{os.getpid()}-{self.serial:05d}"
+        self.file = open(self.path / f"{name}.warc.gz", "ab")
+        self.index = open(self.path / f"{name}.cdx", "a")
+        info = "software: webscraper\r\nformat: WARC File Format 1.1\r\n"
+        self.file.write(
+            warc_record(
+                {
+                    "WARC-Type": "warcinfo",
+                    "WARC-Date": warc_date(now),
+                    "WARC-Filename": f"{name}.warc.gz",
+                    "Content-Type": "application/warc-fields",
+                },
+                info.encode(),
+            )
+        )
+
+    def write(self, response: requests.Response) -> tuple[str, int, int]:
+        """Archive `response` and its request, returning `(file, offset, length)`."""
+        now = datetime.now(timezone.utc)
+        digest = base64.b32encode(hashlib.sha1(response.content).digest()).decode()
+        response_record = warc_record(
+            {
+                "WARC-Type": "response",
+                "WARC-Target-URI": response.url,
+                "WARC-Date": warc_date(now),
+                "WARC-Payload-Digest": f"sha1:{digest}",
+                "Content-Type": "application/http; msgtype=response",
+            },
+            http_response_block(response),
+        )
+        request_record = None
+        if response.request is not None:
+            request_record = warc_record(
+                {
+                    "WARC-Type": "request",
+                    "WARC-Target-URI": response.url,
+                    "WARC-Date": warc_date(now),
+                    "Content-Type": "application/http; msgtype=request",
+                },
+                http_request_block(response.request),
+            )
+
+        key = url_key(canonicalize(requested_url(response)))
+        with self.lock:
+            if self.file is None or self.file.tell() >= self.max_size:
+                self.open()
+            offset = self.file.tell()
+            self.file.write(response_record)
+            if request_record:
+                self.file.write(request_record)
+            self.file.flush()
+            self.index.write(
+                f"{key} {offset} {len(response_record)} {response.status_code} "
+                f"{warc_date(now)} {response.url}\n"
+            )
+            self.index.flush()
+            return Path(self.file.name).name, offset, len(response_record)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.index.close()
+            self.file = self.index = None
+
+
+def parse_fields(lines: list[bytes]) -> CaseInsensitiveDict:
+    fields = CaseInsensitiveDict()
+    for line in lines:
+        name, _, value = line.decode("latin-1").partition(":")
+        fields[name.strip()] = value.strip()
+    return fields
+
+
+def parse_record(data: bytes) -> requests.Response:
+    """Rebuild the `requests` response stored in a WARC response record."""
+    head, _, block = data.partition(b"\r\n\r\n")
+    warc_headers = parse_fields(head.split(b"\r\n")[1:])
+    block = block[: int(warc_headers["Content-Length"])]
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    status_line, *header_lines = http_head.split(b"\r\n")
+    _, status, *reason = status_line.decode("latin-1").split(" ", 2)
+
+    response = requests.Response()
+    response.url = warc_headers["WARC-Target-URI"]
+    response.status_code = int(status)
+    response.reason = reason[0] if reason else ""
+    response.headers = parse_fields(header_lines)
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+class ArchiveReader:
+    """Read responses back from the archives, each file memory-mapped once."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.maps = {}
+
+    def read(self, filename: str, offset: int, length: int) -> requests.Response:
+        if filename not in self.maps:
+            with open(self.path / filename, "rb") as f:
+                self.maps[filename] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = gzip.decompress(self.maps[filename][offset : offset + length])
+        return parse_record(data)
+
+    def close(self) -> None:
+        for archive in self.maps.values():
+            archive.close()
+        self.maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def iter_index(path: str) -> Iterator[ArchiveRecord]:
+    for index in sorted(Path(path).glob("*.cdx")):
+        filename = index.name.removesuffix(".cdx") + ".warc.gz"
+        with open(index) as f:
+            for line in f:
+                key, offset, length, status, date, _ = line.split(" ", 5)
+                yield ArchiveRecord(
+                    key=key,
+                    filename=filename,
+                    offset=int(offset),
+                    length=int(length),
+                    status_code=int(status),
+                    fetched_at=datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ").replace(
+                        tzinfo=timezone.utc
+                    ),
+                )
+
+
+def index_archives(path: str | None = None, batch_size: int = 1000) -> int:
+    """Load the `.cdx` files of the archives into `ArchiveRecord`.
+
+    Records already loaded are skipped, this can run again at any time.
+    Returns the number of index lines read.
+    """
+    path = path or settings.SCRAPER_ARCHIVE_PATH
+    records = 0
+    lines = iter_index(path)
+    while batch := list(islice(lines, batch_size)):
+        ArchiveRecord.objects.bulk_create(batch, ignore_conflicts=True)
+        records += len(batch)
+    return records
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> WarcWriter | None:
+    """The writer configured by `SCRAPER_ARCHIVE_PATH`, or None when it is disabled."""
+    global _archive
+    path = settings.SCRAPER_ARCHIVE_PATH
+    if not path:
+        return None
+    with _archive_lock:
+        if _archive is None or _archive.path != Path(path):
+            if _archive is not None:
+                _archive.close()
+            _archive = WarcWriter(path, settings.SCRAPER_ARCHIVE_MAX_SIZE)
+        return _archive
+
+
+def archive_response(response: requests.Response) -> None:
+    """Write `response` to the archives when they are enabled, reading its body.
+
+    Responses served from the cache were archived when first fetched.
+    """
+    archive = get_archive()
+    if archive is None or getattr(response, "from_cache", False):
+        return
+    if not response._content_consumed:
+        response._content = read_body(response)
+        response._content_consumed = True
+    try:
+        archive.write(response)
+    except OSError as e:
+        # Losing the archive copy must not lose the scrape.
+        logger.error(f"Error archiving {response.url}: {e}")